@@ -1,4 +1,6 @@
-from djitellopy import Tello
+from queue import Empty, Queue
+
+from src.models import Tello
 
 # create and connect
 # 创建Tello对象并连接
@@ -12,7 +14,13 @@ tello.set_mission_pad_detection_direction(1)  # forward detection only  只识
 
 tello.takeoff()
 
-pad = tello.get_mission_pad_id()
+# get notified when a pad is detected instead of polling the state
+# 识别到挑战卡时收到通知, 不必反复查询状态
+tracker = tello.get_mission_pad_tracker()
+events = Queue()
+tracker.add_listener(events.put)
+
+pad = tracker.pad
 
 # detect and react to pads until we see pad #1
 # 发现并识别挑战卡直到看见1号挑战卡
@@ -25,7 +33,15 @@ while pad != 1:
         tello.move_up(30)
         tello.flip_forward()
 
-    pad = tello.get_mission_pad_id()
+    # wait for the next pad event, look again after a second when the drone stays over the same pad
+    # 等待下一个挑战卡事件, 如果一直停在同一张卡上, 一秒后重新查看
+    try:
+        events.get(timeout=1)
+    except Empty:
+        pass
+    pad = tracker.pad
+
+tracker.remove_listener(events.put)
 
 # graceful termination
 # 安全结束程序
@@ -1,10 +1,13 @@
 import logging
+import time
 
-from flask import Flask
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 from flask_socketio import SocketIO
 
 from src.utils.Logger import Logger
+from src.utils.metrics import registry as metrics, render_prometheus
+from src.utils.tracing import tracer
 
 SUPPORTED_ORIGINS = [
     # Avoid 5000, on Mac, it used by AirTunes/800.74.5
@@ -35,12 +38,66 @@ socketio = SocketIO(
     cors_credentials=True
 )
 
+http_request_duration_seconds = metrics.histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests", ("method", "route", "status"))
+
+
+TRACE_HEADER = "X-Trace-Id"
+
+
+@app.before_request
+def start_request_instrumentation():
+    g.request_started_at = time.perf_counter()
+
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.trace = tracer.start(f"{request.method} {route}", request.headers.get(TRACE_HEADER))
+    g.trace.mark("request_received")
+
+
+@app.after_request
+def finish_request_instrumentation(response):
+    started_at = g.pop('request_started_at', None)
+    if started_at is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        http_request_duration_seconds.observe(time.perf_counter() - started_at,
+                                              method=request.method,
+                                              route=route,
+                                              status=response.status_code)
+
+    trace = g.pop('trace', None)
+    if trace is not None:
+        trace.mark("response_serialized")
+        tracer.finish(trace, status=response.status_code)
+        response.headers[TRACE_HEADER] = trace.trace_id
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(render_prometheus(metrics), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/traces", methods=["GET"])
+def traces():
+    limit = request.args.get("limit", default=50, type=int)
+    return jsonify({"traces": tracer.export(limit=limit, name=request.args.get("name"))})
+
+
+@app.route("/traces/summary", methods=["GET"])
+def traces_summary():
+    return jsonify({"summary": tracer.summary()})
+
+
 # Import routes after initializing app to avoid circular imports
 from src.routes.http.tello import tello_bp
+import src.routes.socket.tello  # noqa: F401, registers the Socket.IO handlers of the /tello namespace
 
 app.register_blueprint(tello_bp)
 
 if __name__ == '__main__':
+    # The socket routes register their handlers on src.main.socketio, not on the one of __main__
+    from src.main import app, socketio
+
     try:
         socketio.run(
             app,
@@ -1 +1,4 @@
-from .tello import Tello, TelloException, BackgroundFrameRead
+from .broadcaster import BroadcastFrame, FrameBroadcaster, FrameSubscriber
+from .geofence import SafetyEnvelope
+from .tello import Tello, TelloException, CommandCancelled, GeofenceViolation, BackgroundFrameRead
+from .video import VideoManager
@@ -0,0 +1,193 @@
+"""Bounded multi-consumer frame broadcasting.
+
+A single producer publishes frames into a shared ring buffer. Every subscriber
+has its own cursor over that ring, so several consumers (recorder, viewer
+stream, CV pipeline, ...) see the same frames without copying them.
+"""
+
+import time
+import weakref
+from threading import Condition
+from typing import Optional
+
+
+class BroadcastFrame:
+    """A frame published by a FrameBroadcaster.
+
+    The image is shared between all subscribers, do not modify it in place.
+    """
+    __slots__ = ('seq', 'timestamp', 'image', 'metadata')
+
+    def __init__(self, seq: int, timestamp: float, image, metadata: Optional[dict] = None):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.image = image
+        self.metadata = metadata if metadata is not None else {}
+
+    def age(self) -> float:
+        """Seconds elapsed since the frame was published
+        """
+        return time.time() - self.timestamp
+
+
+class FrameBroadcaster:
+    """Ring buffer of the last `maxsize` frames, readable by any number of subscribers.
+    """
+
+    def __init__(self, maxsize: int = 32, on_consume=None):
+        """
+        Arguments:
+            maxsize: number of frames kept in the ring
+            on_consume: optional callback called with every frame a subscriber reads
+        """
+        self.maxsize = maxsize
+        self.on_consume = on_consume
+        self._ring = [None] * maxsize
+        self._next_seq = 0
+        self._closed = False
+        self._condition = Condition()
+        self._subscribers = weakref.WeakSet()
+
+    @property
+    def next_seq(self) -> int:
+        """Sequence number the next published frame will get
+        """
+        return self._next_seq
+
+    @property
+    def oldest_seq(self) -> int:
+        """Sequence number of the oldest frame still held in the ring
+        """
+        return max(0, self._next_seq - self.maxsize)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def publish(self, image, timestamp: Optional[float] = None, metadata: Optional[dict] = None) -> BroadcastFrame:
+        """Add a frame to the ring and wake up every waiting subscriber.
+        The oldest frame is overwritten once the ring is full.
+        """
+        with self._condition:
+            frame = BroadcastFrame(self._next_seq, timestamp or time.time(), image, metadata)
+            self._ring[frame.seq % self.maxsize] = frame
+            self._next_seq += 1
+            self._condition.notify_all()
+
+        return frame
+
+    def get(self, seq: int) -> Optional[BroadcastFrame]:
+        """Get the frame with the given sequence number, None if it was not
+        published yet or was already overwritten.
+        """
+        with self._condition:
+            if seq < self.oldest_seq or seq >= self._next_seq:
+                return None
+            return self._ring[seq % self.maxsize]
+
+    def latest(self) -> Optional[BroadcastFrame]:
+        """Get the most recently published frame
+        """
+        return self.get(self._next_seq - 1)
+
+    def subscribe(self, from_latest: bool = True) -> 'FrameSubscriber':
+        """Create a new subscriber.
+        Arguments:
+            from_latest: start with the next published frame instead of the oldest frame in the ring
+        """
+        with self._condition:
+            start = self._next_seq if from_latest else self.oldest_seq
+            subscriber = FrameSubscriber(self, start)
+            self._subscribers.add(subscriber)
+
+        return subscriber
+
+    def unsubscribe(self, subscriber: 'FrameSubscriber'):
+        with self._condition:
+            self._subscribers.discard(subscriber)
+
+    def subscribers(self) -> list:
+        return list(self._subscribers)
+
+    def has_subscribers(self) -> bool:
+        return len(self._subscribers) > 0
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def close(self):
+        """Wake up every waiting subscriber, no more frames will be published
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class FrameSubscriber:
+    """Cursor over the ring of a FrameBroadcaster.
+
+    `dropped` counts the frames that were overwritten before this subscriber
+    could read them, `received` counts the frames it did read.
+    """
+
+    def __init__(self, broadcaster: FrameBroadcaster, cursor: int):
+        self.broadcaster = broadcaster
+        self.cursor = cursor
+        self.received = 0
+        self.dropped = 0
+
+    def _take(self) -> Optional[BroadcastFrame]:
+        """Take the frame under the cursor. Must be called while holding the broadcaster condition.
+        """
+        broadcaster = self.broadcaster
+        if self.cursor >= broadcaster.next_seq:
+            return None
+
+        oldest = broadcaster.oldest_seq
+        if self.cursor < oldest:
+            self.dropped += oldest - self.cursor
+            self.cursor = oldest
+
+        frame = broadcaster._ring[self.cursor % broadcaster.maxsize]
+        self.cursor += 1
+        self.received += 1
+        if broadcaster.on_consume is not None:
+            broadcaster.on_consume(frame)
+        return frame
+
+    def pending(self) -> int:
+        """Number of published frames this subscriber has not read yet
+        """
+        return max(0, self.broadcaster.next_seq - max(self.cursor, self.broadcaster.oldest_seq))
+
+    def poll(self) -> Optional[BroadcastFrame]:
+        """Get the next frame without blocking, None if there is no new frame
+        """
+        with self.broadcaster._condition:
+            return self._take()
+
+    def wait_for_next(self, timeout: Optional[float] = None) -> Optional[BroadcastFrame]:
+        """Block until the next frame is available.
+        Returns:
+            BroadcastFrame, or None on timeout or when the broadcaster was closed
+        """
+        condition = self.broadcaster._condition
+        with condition:
+            condition.wait_for(lambda: self.cursor < self.broadcaster.next_seq or self.broadcaster.closed,
+                               timeout=timeout)
+            return self._take()
+
+    def latest(self) -> Optional[BroadcastFrame]:
+        """Skip to the most recent frame, counting the skipped frames as dropped.
+        Returns None if there is no new frame.
+        """
+        with self.broadcaster._condition:
+            newest = self.broadcaster.next_seq - 1
+            if self.cursor > newest:
+                return None
+            self.dropped += newest - self.cursor
+            self.cursor = newest
+            return self._take()
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
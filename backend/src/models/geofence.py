@@ -0,0 +1,275 @@
+"""Geofence and safety envelope of a drone.
+
+A SafetyEnvelope is the space a drone may fly in: a box or a polygon on the
+ground plus height limits, in the frame of the pose estimate (x forward, y left,
+z up in cm from the takeoff point, see pose.PoseEstimator), and a minimum
+battery level. Polygons are rasterized into a grid once, so every check is a
+constant number of comparisons and one lookup, whatever the polygon.
+
+A Geofence applies an envelope to one drone: motion commands are checked
+against the position they would lead to before they are sent, rc commands that
+would leave the envelope are turned into a hover, and every state packet is
+checked by the watchdog, which sends stop (or land) through the priority lane
+when the drone is out.
+"""
+
+import math
+from typing import Optional, Sequence
+
+from ..utils.Logger import Logger
+from ..utils.metrics import registry as metrics
+
+geofence_rejections = metrics.counter(
+    "tello_geofence_rejections_total", "Commands not sent because they would leave the safety envelope",
+    ("host", "verb"))
+geofence_breaches = metrics.counter(
+    "tello_geofence_breaches_total", "Times the watchdog found a drone outside its safety envelope",
+    ("host", "reason"))
+
+TAKEOFF_HEIGHT = 80  # in cm
+RC_SPEED = 1.0  # cm/s per unit of an rc channel, about 100 cm/s at full stick
+
+# direction: (forward, left, up) unit vector in the drone frame
+MOVE_DIRECTIONS = {
+    'forward': (1, 0, 0), 'back': (-1, 0, 0),
+    'left': (0, 1, 0), 'right': (0, -1, 0),
+    'up': (0, 0, 1), 'down': (0, 0, -1),
+}
+# Commands that never take the drone anywhere it could be harmed
+ALWAYS_ALLOWED = ('land', 'emergency', 'stop')
+# Commands that turn the drone on the spot
+IN_PLACE = ('cw', 'ccw', 'flip')
+
+ACTION_STOP = 'stop'
+ACTION_LAND = 'land'
+
+
+def offset(position: tuple, heading: float, forward: float, left: float, up: float) -> tuple:
+    """Position after moving by a vector of the drone frame, heading in degrees clockwise
+    """
+    radians = math.radians(heading)
+    cos, sin = math.cos(radians), math.sin(radians)
+    x, y, z = position
+    return x + forward * cos + left * sin, y - forward * sin + left * cos, z + up
+
+
+class SafetyEnvelope:
+    """Box or polygon with height limits and a minimum battery level.
+    """
+
+    def __init__(self, box: Optional[Sequence[float]] = None, polygon: Optional[Sequence[Sequence[float]]] = None,
+                 min_height: float = 0, max_height: float = 300, min_battery: int = 15, cell_size: float = 10):
+        """
+        Arguments:
+            box: (x_min, y_min, x_max, y_max) in cm
+            polygon: [(x, y), ...] corners in cm, takes precedence over box
+            min_height: lowest height in cm while flying
+            max_height: highest height in cm
+            min_battery: lowest battery level in % to take off and keep flying
+            cell_size: grid resolution in cm the polygon is rasterized with
+        """
+        if box is None and polygon is None:
+            raise ValueError('A safety envelope needs a box or a polygon')
+        if min_height >= max_height:
+            raise ValueError('min_height must be below max_height')
+
+        self.polygon = [tuple(map(float, corner)) for corner in polygon] if polygon is not None else None
+        if self.polygon is not None:
+            if len(self.polygon) < 3:
+                raise ValueError('A polygon needs at least 3 corners')
+            xs, ys = zip(*self.polygon)
+            self.box = (min(xs), min(ys), max(xs), max(ys))
+        else:
+            x_min, y_min, x_max, y_max = map(float, box)
+            if x_min >= x_max or y_min >= y_max:
+                raise ValueError('The box must be given as (x_min, y_min, x_max, y_max)')
+            self.box = (x_min, y_min, x_max, y_max)
+
+        self.min_height = min_height
+        self.max_height = max_height
+        self.min_battery = min_battery
+        self.cell_size = cell_size
+        self.columns = self.rows = 0
+        self.grid = None
+        if self.polygon is not None:
+            self.rasterize()
+
+    def rasterize(self):
+        """Mark the grid cells whose center lies in the polygon, once.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        x_min, y_min, x_max, y_max = self.box
+        self.columns = max(1, math.ceil((x_max - x_min) / self.cell_size))
+        self.rows = max(1, math.ceil((y_max - y_min) / self.cell_size))
+        self.grid = bytearray(self.columns * self.rows)
+        edges = list(zip(self.polygon, self.polygon[1:] + self.polygon[:1]))
+        for row in range(self.rows):
+            y = y_min + (row + 0.5) * self.cell_size
+            # Even-odd rule along the row: the x of every edge crossing it
+            crossings = sorted(x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+                               for (x1, y1), (x2, y2) in edges if (y1 <= y) != (y2 <= y))
+            for start, end in zip(crossings[::2], crossings[1::2]):
+                first = max(0, math.ceil((start - x_min) / self.cell_size - 0.5))
+                last = min(self.columns - 1, math.floor((end - x_min) / self.cell_size - 0.5))
+                for column in range(first, last + 1):
+                    self.grid[row * self.columns + column] = 1
+
+    def contains_ground(self, x: float, y: float) -> bool:
+        x_min, y_min, x_max, y_max = self.box
+        if not (x_min <= x <= x_max and y_min <= y <= y_max):
+            return False
+        if self.grid is None:
+            return True
+        column = min(int((x - x_min) / self.cell_size), self.columns - 1)
+        row = min(int((y - y_min) / self.cell_size), self.rows - 1)
+        return self.grid[row * self.columns + column] == 1
+
+    def violation(self, position: tuple, battery=None, flying: bool = True) -> Optional[str]:
+        """Get why a position (and battery level) is not allowed
+        Returns:
+            str: the reason, None when inside the envelope
+        """
+        x, y, z = position
+        if battery is not None and battery < self.min_battery:
+            return 'battery {}% below {}%'.format(battery, self.min_battery)
+        if z > self.max_height:
+            return 'height {:.0f} cm above {} cm'.format(z, self.max_height)
+        if flying and z < self.min_height:
+            return 'height {:.0f} cm below {} cm'.format(z, self.min_height)
+        if not self.contains_ground(x, y):
+            return 'position ({:.0f}, {:.0f}) outside the geofence'.format(x, y)
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            'box': list(self.box) if self.polygon is None else None,
+            'polygon': [list(corner) for corner in self.polygon] if self.polygon is not None else None,
+            'min_height': self.min_height,
+            'max_height': self.max_height,
+            'min_battery': self.min_battery,
+        }
+
+
+class Geofence:
+    """Enforces a SafetyEnvelope on one drone, see the module documentation.
+    """
+    logger = Logger.get_logger(name="Geofence")
+
+    def __init__(self, tello, envelope: SafetyEnvelope, action: str = ACTION_STOP, rc_lookahead: float = 0.5):
+        """
+        Arguments:
+            tello: the drone, the watchdog sends its action through it
+            envelope: where the drone may fly
+            action: stop or land, sent by the watchdog when the drone is outside
+            rc_lookahead: seconds of rc movement checked before sending an rc command
+        """
+        if action not in (ACTION_STOP, ACTION_LAND):
+            raise ValueError('Unknown geofence action: {}'.format(action))
+        self.tello = tello
+        self.host = tello.address[0]
+        self.envelope = envelope
+        self.action = action
+        self.rc_lookahead = rc_lookahead
+        self.breach: Optional[str] = None
+        # Action sent for the current breach, it is not sent again until the drone is back inside
+        self.breach_action: Optional[str] = None
+
+    def target(self, command: str, position: tuple, heading: float) -> Optional[list]:
+        """Positions a motion command goes through, None when it can't be predicted
+        Internal method, you normally wouldn't call this yourself.
+        """
+        words = command.split()
+        verb = words[0]
+        try:
+            if verb in MOVE_DIRECTIONS:
+                distance = int(words[1])
+                return [offset(position, heading, *(distance * unit for unit in MOVE_DIRECTIONS[verb]))]
+            if verb == 'go' and len(words) == 5:
+                x, y, z = map(int, words[1:4])
+                return [offset(position, heading, x, y, z)]
+            if verb == 'curve' and len(words) == 8:
+                x1, y1, z1, x2, y2, z2 = map(int, words[1:7])
+                return [offset(position, heading, x1, y1, z1), offset(position, heading, x2, y2, z2)]
+        except (IndexError, ValueError):
+            return None
+        if verb == 'takeoff':
+            return [(position[0], position[1], TAKEOFF_HEIGHT)]
+        if verb in IN_PLACE:
+            return [position]
+        # Mission pad relative go, curve and jump, throwfly
+        return None
+
+    def check_command(self, command: str, position: tuple, heading: float, battery=None) -> Optional[str]:
+        """Check a motion command before it is sent
+        Returns:
+            str: why it may not be sent, None when it may
+        """
+        verb = command.split(' ', 1)[0]
+        if verb in ALWAYS_ALLOWED:
+            return None
+
+        points = self.target(command, position, heading)
+        if battery is not None and battery < self.envelope.min_battery:
+            reason = 'battery {}% below {}%'.format(battery, self.envelope.min_battery)
+        elif points is None:
+            reason = "its target can't be predicted"
+        else:
+            reason = None
+            for point in points:
+                reason = self.envelope.violation(point)
+                if reason is not None:
+                    break
+
+        if reason is not None:
+            geofence_rejections.inc(host=self.host, verb=verb)
+        return reason
+
+    def filter_rc(self, position: tuple, heading: float, left_right: int, forward_backward: int, up_down: int,
+                  yaw: int) -> tuple:
+        """Hold the position instead of following rc sticks that would leave the envelope
+        within rc_lookahead seconds. Sticks are followed when the drone is already outside.
+        Returns:
+            tuple: the rc channels to send
+        """
+        if self.envelope.violation(position) is not None:
+            return left_right, forward_backward, up_down, yaw
+
+        scale = RC_SPEED * self.rc_lookahead
+        ahead = offset(position, heading, forward_backward * scale, -left_right * scale, up_down * scale)
+        if self.envelope.violation(ahead) is None:
+            return left_right, forward_backward, up_down, yaw
+
+        geofence_rejections.inc(host=self.host, verb='rc')
+        return 0, 0, 0, yaw
+
+    def watch(self, position: tuple, battery=None):
+        """Check the newest pose, called from the state receiver for every packet.
+        Sends the action once when the drone is found flying outside the envelope,
+        so that it can be flown back in, and land if its battery runs low meanwhile.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        if position[2] <= 0:
+            self.breach = self.breach_action = None  # on the ground
+            return
+
+        reason = self.envelope.violation(position, battery)
+        if reason is None:
+            if self.breach is not None:
+                self.logger.info("Drone {} is back inside its geofence".format(self.host))
+            self.breach = self.breach_action = None
+            return
+
+        # A low battery always lands, stopping would only drain it further
+        action = ACTION_LAND if reason.startswith('battery') else self.action
+        if self.breach_action is None or (action == ACTION_LAND and self.breach_action != ACTION_LAND):
+            self.logger.warning("Drone {} breached its geofence ({}), sending {}".format(self.host, reason, action))
+            geofence_breaches.inc(host=self.host, reason=reason.split(' ', 1)[0])
+            self.breach_action = action
+            try:
+                self.tello.send_priority_command(action)
+            except Exception:
+                self.logger.error("Geofence action failed", exc_info=True)
+        self.breach = reason
+
+    def to_dict(self) -> dict:
+        return dict(self.envelope.to_dict(), action=self.action, breach=self.breach)
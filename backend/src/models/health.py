@@ -0,0 +1,233 @@
+"""Connection health of Tello drones.
+
+A drone sends about ten state packets per second, so a missing state packet is
+the earliest sign of a broken link: the link is considered lost after half a
+second of silence instead of after a command timed out. Packet loss, jitter of
+the inter-arrival times and the command round trip time are combined into a
+link quality score between 0 and 100.
+"""
+
+import time
+from collections import deque
+from threading import Event, Lock, Thread
+from typing import Callable, List, Optional
+
+from ..utils.Logger import Logger
+from ..utils.metrics import registry as metrics
+
+link_quality = metrics.gauge(
+    "tello_link_quality", "Link quality score between 0 and 100", ("host",))
+link_events = metrics.counter(
+    "tello_link_events_total", "Link status changes", ("host", "event"))
+keepalives_sent = metrics.counter(
+    "tello_keepalives_total", "Keepalive commands sent to idle drones", ("host",))
+
+STATUS_UNKNOWN = 'unknown'
+STATUS_GOOD = 'good'
+STATUS_DEGRADED = 'degraded'
+STATUS_LOST = 'lost'
+
+EVENT_DEGRADED = 'degraded'
+EVENT_LOST = 'lost'
+EVENT_RECOVERED = 'recovered'
+
+
+class LinkHealth:
+    """State packet arrival statistics of one drone.
+    """
+    EXPECTED_STATE_INTERVAL = 0.1  # in seconds
+    LOST_AFTER = 0.5  # in seconds without state packets
+    DEGRADED_SCORE = 60
+    WINDOW = 100  # number of state packets loss is computed over
+    JITTER_GAIN = 1 / 16  # as in RFC 3550
+
+    def __init__(self):
+        self.interval = self.EXPECTED_STATE_INTERVAL
+        self.jitter = 0.0
+        self.last_state_at: Optional[float] = None
+        self.last_command_at: Optional[float] = None
+        self.received = 0
+        # Number of packets missed before each of the last WINDOW packets
+        self.missed = deque([], self.WINDOW)
+        self._lock = Lock()
+
+    def record_state(self, now: Optional[float] = None):
+        """Record the arrival of a state packet
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.last_state_at is not None:
+                gap = now - self.last_state_at
+                missed = max(int(round(gap / self.interval)) - 1, 0)
+                self.missed.append(missed)
+                if not missed:
+                    # Only regular gaps update the interval, a burst of loss must not stretch it
+                    self.interval += (gap - self.interval) / 8
+                    self.jitter += (abs(gap - self.interval) - self.jitter) * self.JITTER_GAIN
+            self.last_state_at = now
+            self.received += 1
+
+    def record_command(self, now: Optional[float] = None):
+        """Record that a command was sent, the drone is not idle anymore
+        """
+        self.last_command_at = time.time() if now is None else now
+
+    @property
+    def loss(self) -> float:
+        """Share of state packets lost over the window
+        """
+        with self._lock:
+            missed = sum(self.missed)
+            expected = len(self.missed) + missed
+        return missed / expected if expected else 0.0
+
+    def silence(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds since the last state packet, None before the first one
+        """
+        if self.last_state_at is None:
+            return None
+        return (time.time() if now is None else now) - self.last_state_at
+
+    def score(self, rtt=None, now: Optional[float] = None) -> int:
+        """Link quality between 0 (lost) and 100
+        Arguments:
+            rtt: smoothed command round trip time in seconds, if known
+        """
+        silence = self.silence(now)
+        if silence is None or silence > self.LOST_AFTER:
+            return 0
+
+        penalty = min(self.loss * 200, 60) + min(self.jitter * 200, 20)
+        if rtt is not None:
+            penalty += min(rtt * 20, 20)
+        return max(int(round(100 - penalty)), 0)
+
+    def status(self, rtt=None, now: Optional[float] = None) -> str:
+        silence = self.silence(now)
+        if silence is None:
+            return STATUS_UNKNOWN
+        if silence > self.LOST_AFTER:
+            return STATUS_LOST
+        if self.score(rtt, now) < self.DEGRADED_SCORE:
+            return STATUS_DEGRADED
+        return STATUS_GOOD
+
+    def to_dict(self, rtt=None, now: Optional[float] = None) -> dict:
+        return {
+            'status': self.status(rtt, now),
+            'score': self.score(rtt, now),
+            'loss': self.loss,
+            'jitter': self.jitter,
+            'state_interval': self.interval,
+            'rtt': rtt,
+            'silence': self.silence(now),
+            'received': self.received,
+            'last_command_at': self.last_command_at,
+        }
+
+
+class HealthMonitor:
+    """Background thread watching the link of one drone. It sends a keepalive
+    when no command was sent for `keepalive_idle` seconds, so the drone does
+    not land on its own after 15 seconds, and calls the listeners with
+    (host, event, health) whenever the link degrades, is lost or recovers.
+    """
+    logger = Logger.get_logger(name="HealthMonitor")
+
+    def __init__(self, tello, check_interval: float = 0.1, keepalive_idle: float = 5.0):
+        self.tello = tello
+        self.host = tello.address[0]
+        self.check_interval = check_interval
+        self.keepalive_idle = keepalive_idle
+        self.status = STATUS_UNKNOWN
+        self.listeners: List[Callable[[str, str, dict], None]] = []
+        self._keepalive_thread: Optional[Thread] = None
+        self._stopped = Event()
+        self._worker = Thread(target=self.run, daemon=True, name="tello-health-{}".format(self.host))
+
+    def add_listener(self, listener: Callable[[str, str, dict], None]):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, str, dict], None]):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def start(self):
+        self._worker.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    @property
+    def running(self) -> bool:
+        return self._worker.is_alive() and not self._stopped.is_set()
+
+    def run(self):
+        """Thread worker function, checks the link every `check_interval` seconds.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        while not self._stopped.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception:
+                self.logger.error("Health check of {} failed".format(self.host), exc_info=True)
+
+    def check(self, now: Optional[float] = None):
+        """Update the link status, notify the listeners and keep an idle drone alive.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        now = time.time() if now is None else now
+        health = self.tello.get_link_health(now)
+        link_quality.set(health['score'], host=self.host)
+
+        event = self.transition(self.status, health['status'])
+        self.status = health['status']
+        if event is not None:
+            self.notify(event, health)
+
+        last_command_at = health['last_command_at']
+        idle = last_command_at is None or now - last_command_at >= self.keepalive_idle
+        if idle and self.status != STATUS_LOST:
+            self.send_keepalive()
+
+    @staticmethod
+    def transition(previous: str, current: str) -> Optional[str]:
+        """Get the event of a status change, None when nothing worth reporting happened
+        """
+        if current == previous or current == STATUS_UNKNOWN:
+            return None
+        if current == STATUS_LOST:
+            return EVENT_LOST
+        if current == STATUS_DEGRADED:
+            return EVENT_DEGRADED
+        if previous in (STATUS_DEGRADED, STATUS_LOST):
+            return EVENT_RECOVERED
+        return None
+
+    def notify(self, event: str, health: dict):
+        link_events.inc(host=self.host, event=event)
+        log = self.logger.info if event == EVENT_RECOVERED else self.logger.warning
+        log("Link to {} {} (score: {}, loss: {:.0%})".format(self.host, event, health['score'], health['loss']))
+
+        for listener in list(self.listeners):
+            try:
+                listener(self.host, event, health)
+            except Exception:
+                self.logger.error("Link event listener failed", exc_info=True)
+
+    def send_keepalive(self):
+        """Send a keepalive on its own thread, so a slow response does not delay loss detection.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        if self._keepalive_thread is not None and self._keepalive_thread.is_alive():
+            return
+
+        def keepalive():
+            try:
+                self.tello.send_keepalive()
+                keepalives_sent.inc(host=self.host)
+            except Exception as e:
+                self.logger.warning("Keepalive to {} failed: {}".format(self.host, e))
+
+        self._keepalive_thread = Thread(target=keepalive, daemon=True)
+        self._keepalive_thread.start()
@@ -0,0 +1,525 @@
+"""Declarative missions.
+
+A mission is a JSON (or YAML) document listing the steps of a flight:
+
+    {"name": "square", "speed": 50, "steps": [
+        {"action": "takeoff"},
+        {"action": "move", "direction": "forward", "distance": 100},
+        {"action": "rotate", "direction": "cw", "angle": 90},
+        {"action": "hover", "seconds": 2},
+        {"action": "waypoints", "points": [[100, 0, 0], [200, 50, 0], [200, 50, 60]]},
+        {"action": "land"}]}
+
+compile_mission validates every step against the ranges of the Tello SDK,
+dead reckons the path, estimates the flight time and the battery it needs, and
+turns the steps into a plan of ready to send SDK commands. Waypoint steps are
+first turned into go/curve commands by path.optimize_path. All errors are
+reported at once, before takeoff. A MissionRunner then sends the plan one
+command after the other, reporting progress, until it is done or aborted.
+"""
+
+import itertools
+import json
+import math
+import time
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, List, Optional
+
+from .path import optimize_path
+from .tello import CommandCancelled, TelloException
+from ..utils.Logger import Logger
+from ..utils.lazy_import import lazy_import
+
+yaml = lazy_import('yaml')
+
+TAKEOFF_HEIGHT = 80  # in cm
+TAKEOFF_SECONDS = 5.0
+LAND_SECONDS = 5.0
+FLIP_SECONDS = 3.0
+ROTATION_SPEED = 90.0  # in degrees per second
+COMMAND_OVERHEAD = 0.5  # in seconds per command
+BATTERY_PER_MINUTE = 8.0  # in %, a Tello flies about 12 minutes
+BATTERY_RESERVE = 15  # in %
+DEFAULT_SPEED = 50  # in cm/s
+# A Tello lands on its own after 15 seconds without a command
+HOVER_KEEPALIVE_INTERVAL = 5.0  # in seconds
+
+MOVE_DIRECTIONS = {
+    # direction: (forward, left, up) unit vector in the drone frame
+    'forward': (1, 0, 0), 'back': (-1, 0, 0),
+    'left': (0, 1, 0), 'right': (0, -1, 0),
+    'up': (0, 0, 1), 'down': (0, 0, -1),
+}
+FLIP_DIRECTIONS = ('l', 'r', 'f', 'b')
+ROTATE_DIRECTIONS = ('cw', 'ccw')
+
+
+class MissionError(TelloException):
+    """A mission that can not be flown. `errors` lists every problem found.
+    """
+
+    def __init__(self, errors: List[str]):
+        super().__init__('Invalid mission: ' + '; '.join(errors))
+        self.errors = errors
+
+
+class PlanStep:
+    """One step of a compiled mission: an SDK command, or a pause when command is None
+    """
+    __slots__ = ('index', 'action', 'command', 'seconds', 'position', 'heading')
+
+    def __init__(self, index: int, action: str, command: Optional[str], seconds: float, position: tuple,
+                 heading: float):
+        self.index = index
+        self.action = action
+        self.command = command
+        self.seconds = seconds
+        self.position = position
+        self.heading = heading
+
+    def to_dict(self) -> dict:
+        return {
+            'index': self.index,
+            'action': self.action,
+            'command': self.command,
+            'seconds': round(self.seconds, 2),
+            'position': [round(value) for value in self.position],
+            'heading': round(self.heading),
+        }
+
+
+class MissionPlan:
+    """Validated mission ready to be flown
+    """
+
+    def __init__(self, name: str, steps: List[PlanStep]):
+        self.name = name
+        self.steps = steps
+        self.duration = sum(step.seconds for step in steps)
+        self.battery = math.ceil(self.duration / 60 * BATTERY_PER_MINUTE)
+        self.required_battery = self.battery + BATTERY_RESERVE
+
+    def path(self) -> list:
+        """Dead reckoned positions (x forward, y left, z up in cm from the takeoff point) after every step
+        """
+        return [step.position for step in self.steps]
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'duration': round(self.duration, 1),
+            'battery': self.battery,
+            'required_battery': self.required_battery,
+            'steps': [step.to_dict() for step in self.steps],
+        }
+
+
+def load_mission(text: str) -> dict:
+    """Parse a mission document, JSON or YAML (needs PyYAML)
+    Raises:
+        MissionError: the text is neither, or it is not JSON and PyYAML is not installed
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    try:
+        return yaml.safe_load(text)
+    except ImportError:
+        raise MissionError(['mission: not valid JSON, and PyYAML is not installed to read YAML'])
+    except yaml.YAMLError as e:
+        mark = getattr(e, 'problem_mark', None)
+        where = ' at line {}, column {}'.format(mark.line + 1, mark.column + 1) if mark is not None else ''
+        raise MissionError(['mission: not valid JSON or YAML, {}{}'.format(getattr(e, 'problem', None) or e, where)])
+
+
+class _Compiler:
+    """Walks the steps once, keeping the dead reckoned position and heading
+    """
+
+    def __init__(self, mission: dict):
+        self.mission = mission
+        self.errors: List[str] = []
+        self.steps: List[PlanStep] = []
+        self.position = (0.0, 0.0, 0.0)
+        self.heading = 0.0
+        self.flying = False
+        self.speed = mission.get('speed', DEFAULT_SPEED)
+
+    def error(self, index, message):
+        self.errors.append('step {}: {}'.format(index, message))
+
+    def number(self, index, step, key, low, high, default=None, integer=True):
+        value = step.get(key, default)
+        if isinstance(value, bool) or not isinstance(value, int if integer else (int, float)):
+            self.error(index, "'{}' must be {}".format(key, 'an integer' if integer else 'a number'))
+            return None
+        if not low <= value <= high:
+            self.error(index, "'{}' must be within {} and {}, got {}".format(key, low, high, value))
+            return None
+        return value
+
+    def add(self, index, action, command, seconds, position=None, heading=None):
+        if position is not None:
+            self.position = position
+        if heading is not None:
+            self.heading = heading % 360
+        self.steps.append(PlanStep(index, action, command, seconds + (COMMAND_OVERHEAD if command else 0),
+                                   self.position, self.heading))
+
+    def offset(self, forward, left, up):
+        """Position after moving by a vector of the drone frame
+        """
+        heading = math.radians(self.heading)
+        x, y, z = self.position
+        return (x + forward * math.cos(heading) + left * math.sin(heading),
+                y - forward * math.sin(heading) + left * math.cos(heading),
+                z + up)
+
+    def require_flying(self, index, action):
+        if not self.flying:
+            self.error(index, "'{}' needs the drone to be flying".format(action))
+
+    def check_xyz(self, index, step, keys, speed_range):
+        values = [self.number(index, step, key, -500, 500) for key in keys]
+        speed = self.number(index, step, 'speed', *speed_range, default=self.speed)
+        if None in values or speed is None:
+            return None, None
+        for first in range(0, len(values), 3):
+            if all(-20 <= value <= 20 for value in values[first:first + 3]):
+                self.error(index, "{} can't all be within -20 and 20".format('/'.join(keys[first:first + 3])))
+        return values, speed
+
+    def compile(self) -> MissionPlan:
+        if not isinstance(self.speed, int) or not 10 <= self.speed <= 100:
+            self.errors.append("mission: 'speed' must be an integer within 10 and 100")
+            self.speed = DEFAULT_SPEED
+        else:
+            self.add(0, 'speed', 'speed {}'.format(self.speed), 0)
+
+        steps = self.mission.get('steps')
+        if not isinstance(steps, list) or not steps:
+            self.errors.append("mission: 'steps' must be a non empty list")
+            steps = []
+
+        for index, step in enumerate(steps, 1):
+            action = step.get('action') if isinstance(step, dict) else None
+            handler = getattr(self, 'compile_' + str(action), None)
+            if handler is None:
+                self.error(index, 'unknown action {!r}'.format(action))
+                continue
+            handler(index, step)
+
+        if self.flying:
+            self.errors.append('mission: the last step must land the drone')
+        if self.errors:
+            raise MissionError(self.errors)
+        return MissionPlan(self.mission.get('name', 'mission'), self.steps)
+
+    def compile_takeoff(self, index, step):
+        if self.flying:
+            self.error(index, 'the drone is already flying')
+        self.flying = True
+        x, y, _ = self.position
+        self.add(index, 'takeoff', 'takeoff', TAKEOFF_SECONDS, (x, y, TAKEOFF_HEIGHT))
+
+    def compile_land(self, index, step):
+        self.require_flying(index, 'land')
+        self.flying = False
+        x, y, _ = self.position
+        self.add(index, 'land', 'land', LAND_SECONDS, (x, y, 0))
+
+    def compile_move(self, index, step):
+        self.require_flying(index, 'move')
+        direction = step.get('direction')
+        distance = self.number(index, step, 'distance', 20, 500)
+        if direction not in MOVE_DIRECTIONS:
+            self.error(index, 'unknown move direction {!r}'.format(direction))
+            return
+        if distance is None:
+            return
+
+        position = self.offset(*(distance * unit for unit in MOVE_DIRECTIONS[direction]))
+        if position[2] < 0:
+            self.error(index, 'the drone would end up below the takeoff point')
+        self.add(index, 'move', '{} {}'.format(direction, distance), distance / self.speed, position)
+
+    def compile_rotate(self, index, step):
+        self.require_flying(index, 'rotate')
+        direction = step.get('direction')
+        angle = self.number(index, step, 'angle', 1, 360)
+        if direction not in ROTATE_DIRECTIONS:
+            self.error(index, 'unknown rotation direction {!r}'.format(direction))
+            return
+        if angle is None:
+            return
+
+        heading = self.heading + (angle if direction == 'cw' else -angle)
+        self.add(index, 'rotate', '{} {}'.format(direction, angle), angle / ROTATION_SPEED, heading=heading)
+
+    def compile_flip(self, index, step):
+        self.require_flying(index, 'flip')
+        direction = step.get('direction')
+        if direction not in FLIP_DIRECTIONS:
+            self.error(index, 'unknown flip direction {!r}'.format(direction))
+            return
+        self.add(index, 'flip', 'flip {}'.format(direction), FLIP_SECONDS)
+
+    def compile_hover(self, index, step):
+        self.require_flying(index, 'hover')
+        seconds = self.number(index, step, 'seconds', 0, 60, integer=False)
+        if seconds is not None:
+            self.add(index, 'hover', None, seconds)
+
+    def compile_go(self, index, step):
+        self.require_flying(index, 'go')
+        values, speed = self.check_xyz(index, step, ('x', 'y', 'z'), (10, 100))
+        if values is None:
+            return
+
+        x, y, z = values
+        mid = step.get('mid')
+        if mid is not None:
+            if mid not in range(1, 9):
+                self.error(index, "'mid' must be within 1 and 8")
+                return
+            # Relative to the pad, the position can't be dead reckoned anymore
+            command = 'go {} {} {} {} m{}'.format(x, y, z, speed, mid)
+            self.add(index, 'go', command, math.dist((0, 0, 0), values) / speed)
+            return
+
+        position = self.offset(x, y, z)
+        if position[2] < 0:
+            self.error(index, 'the drone would end up below the takeoff point')
+        self.add(index, 'go', 'go {} {} {} {}'.format(x, y, z, speed), math.dist((0, 0, 0), values) / speed,
+                 position)
+
+    def compile_curve(self, index, step):
+        self.require_flying(index, 'curve')
+        values, speed = self.check_xyz(index, step, ('x1', 'y1', 'z1', 'x2', 'y2', 'z2'), (10, 60))
+        if values is None:
+            return
+
+        via, end = values[:3], values[3:]
+        length = math.dist((0, 0, 0), via) + math.dist(via, end)
+        command = 'curve {} {} {} {} {} {} {}'.format(*values, speed)
+        position = self.offset(*end)
+        if position[2] < 0:
+            self.error(index, 'the drone would end up below the takeoff point')
+        self.add(index, 'curve', command, length / speed, position)
+
+    def compile_waypoints(self, index, step):
+        self.require_flying(index, 'waypoints')
+        points = step.get('points')
+        if not isinstance(points, list) or not points or not all(
+                isinstance(point, (list, tuple)) and len(point) == 3 and
+                all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in point) for point in points):
+            self.error(index, "'points' must be a non empty list of [x, y, z]")
+            return
+        speed = self.number(index, step, 'speed', 10, 100, default=self.speed)
+        max_turn = self.number(index, step, 'max_turn', 0, 180, default=60, integer=False)
+        if speed is None or max_turn is None:
+            return
+
+        path = optimize_path(points, speed, max_turn=max_turn, curves=bool(step.get('curves', True)))
+        for command in path.commands:
+            getattr(self, 'compile_' + command.action)(index, command.to_step())
+
+
+def compile_mission(mission) -> MissionPlan:
+    """Validate a mission and compile it into a plan.
+    Arguments:
+        mission: dict, or the JSON/YAML text of the mission
+    Raises:
+        MissionError: listing every problem of the mission
+    """
+    if isinstance(mission, str):
+        mission = load_mission(mission)
+    if not isinstance(mission, dict):
+        raise MissionError(['mission: must be an object'])
+    return _Compiler(mission).compile()
+
+
+EVENT_STEP_STARTED = 'step_started'
+EVENT_STEP_DONE = 'step_done'
+EVENT_MISSION_DONE = 'mission_done'
+EVENT_MISSION_FAILED = 'mission_failed'
+EVENT_MISSION_ABORTED = 'mission_aborted'
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_ABORTED = 'aborted'
+
+
+class MissionRunner:
+    """Flies a MissionPlan in the background. Listeners are called with every
+    progress event. abort() stops after the current step and lands the drone.
+    """
+    logger = Logger.get_logger(name="MissionRunner")
+
+    ids = itertools.count(1)
+
+    def __init__(self, tello, plan: MissionPlan, check_battery: bool = True):
+        self.id = str(next(MissionRunner.ids))
+        self.tello = tello
+        self.plan = plan
+        self.check_battery = check_battery
+        self.status = STATUS_PENDING
+        self.current_step: Optional[int] = None
+        self.error: Optional[str] = None
+        self.listeners: List[Callable[[dict], None]] = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._aborted = Event()
+        self._land_on_abort = True
+        self.worker = Thread(target=self.run, daemon=True, name="tello-mission-{}".format(self.id))
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        self.listeners.append(listener)
+
+    def emit(self, event: str, **data):
+        record = dict(data, event=event, mission=self.id, timestamp=time.time())
+        for listener in list(self.listeners):
+            try:
+                listener(record)
+            except Exception:
+                self.logger.error("Mission listener failed", exc_info=True)
+
+    def start(self):
+        self.worker.start()
+
+    def abort(self, land: bool = True):
+        """Stop after the current step, landing the drone unless land is False
+        """
+        self._land_on_abort = land
+        self._aborted.set()
+
+    def run(self):
+        """Thread worker function, sends the commands of the plan in order.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        self.status = STATUS_RUNNING
+        self.started_at = time.time()
+        flying = False
+        try:
+            if self.check_battery:
+                battery = self.tello.get_battery()
+                if battery < self.plan.required_battery:
+                    raise TelloException('Battery at {}%, the mission needs {}%'.format(
+                        battery, self.plan.required_battery))
+
+            for position, step in enumerate(self.plan.steps):
+                if self._aborted.is_set():
+                    break
+
+                self.current_step = position
+                self.emit(EVENT_STEP_STARTED, step=step.to_dict())
+                if step.command is None:
+                    self.hover(step.seconds)
+                elif step.action == 'takeoff':
+                    # Set first, the drone may be in the air even when the takeoff times out
+                    flying = True
+                    self.tello.takeoff()
+                elif step.action == 'land':
+                    self.tello.land()
+                    flying = False
+                else:
+                    self.tello.send_control_command(step.command)
+                self.emit(EVENT_STEP_DONE, step=step.to_dict(), progress=(position + 1) / len(self.plan.steps))
+
+            if self._aborted.is_set():
+                self.status = STATUS_ABORTED
+                if flying and self._land_on_abort:
+                    self.tello.land()
+                self.emit(EVENT_MISSION_ABORTED, step=self.current_step)
+            else:
+                self.status = STATUS_DONE
+                self.emit(EVENT_MISSION_DONE)
+        except CommandCancelled:
+            # A priority command (emergency, stop, land) took over the drone
+            self.logger.warning("Mission {} cancelled by a priority command".format(self.id))
+            self.status = STATUS_ABORTED
+            self.emit(EVENT_MISSION_ABORTED, step=self.current_step)
+        except Exception as e:
+            self.logger.error("Mission {} failed".format(self.id), exc_info=True)
+            self.status = STATUS_FAILED
+            self.error = str(e)
+            self.emit(EVENT_MISSION_FAILED, error=self.error, step=self.current_step)
+            if flying:
+                self.land_after_failure()
+        finally:
+            self.finished_at = time.time()
+
+    def hover(self, seconds: float):
+        """Wait seconds or until aborted, sending keepalives so the drone does not land on its own.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        deadline = time.time() + seconds
+        while not self._aborted.wait(min(max(deadline - time.time(), 0), HOVER_KEEPALIVE_INTERVAL)):
+            if time.time() >= deadline:
+                return
+            self.tello.send_keepalive()
+
+    def land_after_failure(self):
+        """Bring the drone down after a step failed in the air, with the priority
+        lane when landing the normal way fails too.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        try:
+            self.tello.land()
+            return
+        except Exception:
+            self.logger.error("Landing after mission {} failed".format(self.id), exc_info=True)
+        try:
+            self.tello.send_priority_command('land')
+        except Exception:
+            self.logger.error("Priority landing after mission {} failed".format(self.id), exc_info=True)
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'name': self.plan.name,
+            'status': self.status,
+            'current_step': self.current_step,
+            'steps': len(self.plan.steps),
+            'error': self.error,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'estimated_duration': round(self.plan.duration, 1),
+        }
+
+
+MAX_MISSIONS = 10
+
+# Most recent mission runners by id
+missions: Dict[str, MissionRunner] = {}
+missions_lock = Lock()
+
+
+def abort_missions(land: bool = True, host: Optional[str] = None):
+    """Abort every mission that is still running, only those of the drone at host when given
+    """
+    with missions_lock:
+        for runner in missions.values():
+            if runner.status in (STATUS_PENDING, STATUS_RUNNING) and \
+                    (host is None or runner.tello.address[0] == host):
+                runner.abort(land)
+
+
+def start_mission(tello, plan: MissionPlan) -> MissionRunner:
+    """Start flying a plan, only one mission may run at a time
+    """
+    with missions_lock:
+        if any(runner.status in (STATUS_PENDING, STATUS_RUNNING) for runner in missions.values()):
+            raise TelloException('A mission is already running')
+
+        runner = MissionRunner(tello, plan)
+        missions[runner.id] = runner
+        while len(missions) > MAX_MISSIONS:
+            del missions[next(iter(missions))]
+
+    runner.start()
+    return runner
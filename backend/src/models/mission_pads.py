@@ -0,0 +1,135 @@
+"""Mission pad detection events.
+
+The state packets of a Tello EDU carry the id of the detected mission pad
+(`mid`, 1 to 8, -1 for none and -2 when detection is off) and the position relative to it (`x`, `y`, `z`). A
+MissionPadTracker turns that level signal into events: the detected pad only
+changes after the new id was seen in `debounce` consecutive packets, so a
+single misread packet does not fire anything, and position updates are only
+reported when the position actually moved.
+"""
+
+import time
+from collections import deque
+from threading import Condition
+from typing import Callable, List, Optional
+
+from ..utils.Logger import Logger
+
+EVENT_PAD_DETECTED = 'pad_detected'
+EVENT_PAD_LOST = 'pad_lost'
+EVENT_PAD_POSITION = 'pad_position'
+
+NO_PAD = -1
+PAD_IDS = range(1, 9)
+
+
+class MissionPadTracker:
+    """Debounced mission pad state of one drone.
+    """
+    logger = Logger.get_logger(name="MissionPadTracker")
+
+    def __init__(self, debounce: int = 3, position_threshold: int = 1, max_events: int = 100):
+        """
+        Arguments:
+            debounce: number of consecutive packets a new pad id must be seen in
+            position_threshold: minimum change in cm of x, y or z reported as a position update
+            max_events: number of events kept for events_since
+        """
+        self.debounce = debounce
+        self.position_threshold = position_threshold
+        self.pad = NO_PAD
+        self.position = None
+        self.listeners: List[Callable[[dict], None]] = []
+        self.events = deque([], max_events)
+        self.sequence = 0
+        self._candidate = NO_PAD
+        self._candidate_count = 0
+        self._condition = Condition()
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Call listener with every event, from the state receiver thread. Keep it short.
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[dict], None]):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def update(self, state: dict):
+        """Feed a parsed state packet.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        mid = state.get('mid')
+        if not isinstance(mid, int):
+            return
+        if mid not in PAD_IDS:
+            mid = NO_PAD
+
+        if mid == self._candidate:
+            self._candidate_count += 1
+        else:
+            self._candidate, self._candidate_count = mid, 1
+
+        if mid != self.pad and self._candidate_count >= self.debounce:
+            previous, self.pad = self.pad, mid
+            if mid == NO_PAD:
+                self.position = None
+                self.emit(EVENT_PAD_LOST, pad=previous)
+            else:
+                self.position = self.read_position(state)
+                self.emit(EVENT_PAD_DETECTED, pad=mid, previous=previous, position=self.position)
+            return
+
+        if self.pad != NO_PAD and mid == self.pad:
+            position = self.read_position(state)
+            if self.position is None or any(abs(new - old) >= self.position_threshold
+                                             for new, old in zip(position, self.position)):
+                self.position = position
+                self.emit(EVENT_PAD_POSITION, pad=self.pad, position=position)
+
+    @staticmethod
+    def read_position(state: dict) -> tuple:
+        return state.get('x', 0), state.get('y', 0), state.get('z', 0)
+
+    def emit(self, event: str, **data):
+        """Record an event, wake up waiting threads and call the listeners.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        with self._condition:
+            self.sequence += 1
+            record = dict(data, event=event, seq=self.sequence, timestamp=time.time())
+            self.events.append(record)
+            self._condition.notify_all()
+
+        for listener in list(self.listeners):
+            try:
+                listener(record)
+            except Exception:
+                self.logger.error("Mission pad listener failed", exc_info=True)
+
+    def events_since(self, sequence: int) -> list:
+        """Get the recorded events newer than sequence, oldest first
+        """
+        with self._condition:
+            return [event for event in self.events if event['seq'] > sequence]
+
+    def wait_for_pad(self, pad_id: Optional[int] = None, timeout: Optional[float] = None) -> Optional[int]:
+        """Block until a pad (or the pad with pad_id) is detected, without polling.
+        Returns immediately when it is already detected.
+        Returns:
+            int: the detected pad id, None on timeout
+        """
+        def detected():
+            return self.pad != NO_PAD and (pad_id is None or self.pad == pad_id)
+
+        with self._condition:
+            if self._condition.wait_for(detected, timeout):
+                return self.pad
+            return None
+
+    def to_dict(self) -> dict:
+        return {
+            'pad': self.pad,
+            'position': self.position,
+            'sequence': self.sequence,
+        }
@@ -0,0 +1,165 @@
+"""UDP sockets shared by all Tello drones of the ground station.
+
+Every drone answers commands on the single control socket and sends its state
+packets to a state port, which several drones may share. Incoming packets are
+routed to the drone they came from with a dict lookup on the sender's host.
+"""
+
+import socket
+from threading import RLock, Thread
+from typing import Callable, Dict, Optional
+
+from ..utils.Logger import Logger
+
+
+class TelloNetwork:
+    """Owns the control socket, the state sockets and the routing table of the drones.
+    """
+    logger = Logger.get_logger(name="TelloNetwork")
+
+    def __init__(self, control_port: int = 8889, bind_host: str = "", buffer_size: int = 1024):
+        self.control_port = control_port
+        self.bind_host = bind_host
+        self.buffer_size = buffer_size
+
+        # Routing table: drone entry by host
+        self.drones: Dict[str, dict] = {}
+        # Number of Tello instances using each entry, see acquire and release
+        self.references: Dict[str, int] = {}
+        self.control_socket: Optional[socket.socket] = None
+        self.state_sockets: Dict[int, socket.socket] = {}
+        self.started = False
+
+        self.on_response: Optional[Callable[[str, dict, bytes], None]] = None
+        self.on_state: Optional[Callable[[str, dict, bytes], None]] = None
+        # Reentrant: garbage collecting a Tello releases its entry, which may happen while the lock is held
+        self._lock = RLock()
+
+    def start(self, on_response: Callable[[str, dict, bytes], None], on_state: Callable[[str, dict, bytes], None]):
+        """Bind the control socket and start receiving responses. Does nothing when already started.
+        Arguments:
+            on_response: called with (host, drone entry, data) for every command response
+            on_state: called with (host, drone entry, data) for every state packet
+        """
+        with self._lock:
+            if self.started:
+                return
+
+            self.on_response = on_response
+            self.on_state = on_state
+            self.control_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.control_socket.bind((self.bind_host, self.control_port))
+            self.control_port = self.control_socket.getsockname()[1]
+            self._start_receiver(self.control_socket, "response")
+            self.started = True
+
+        self.logger.info("Listening for command responses on UDP port {}".format(self.control_port))
+
+    def _start_receiver(self, sock: socket.socket, kind: str):
+        thread = Thread(target=self._receive, args=(sock, kind), name="tello-{}-receiver".format(kind))
+        thread.daemon = True
+        thread.start()
+
+    def _receive(self, sock: socket.socket, kind: str):
+        """Receive packets on a socket until it is closed and hand them to the drone they came from.
+        """
+        while True:
+            try:
+                data, address = sock.recvfrom(self.buffer_size)
+            except OSError:
+                # The socket was closed
+                break
+            if address is None:
+                # The socket was shut down
+                break
+
+            host = address[0]
+            drone = self.drones.get(host)
+            if drone is None:
+                self.logger.debug('Ignoring {} packet from unknown host {}'.format(kind, host))
+                continue
+
+            try:
+                if kind == "response":
+                    self.on_response(host, drone, data)
+                else:
+                    self.on_state(host, drone, data)
+            except Exception as e:
+                self.logger.error(e)
+
+    def open_state_port(self, port: int) -> int:
+        """Start receiving state packets on a port, unless that is already done.
+        Returns:
+            int: the bound port, useful when port is 0
+        """
+        with self._lock:
+            if port in self.state_sockets:
+                return port
+
+            state_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            state_socket.bind((self.bind_host, port))
+            port = state_socket.getsockname()[1]
+            self.state_sockets[port] = state_socket
+            self._start_receiver(state_socket, "state")
+
+        self.logger.info("Listening for state packets on UDP port {}".format(port))
+        return port
+
+    def register(self, host: str, create_entry: Callable[[], dict]) -> dict:
+        """Get the entry of a drone in the routing table, creating it on first use.
+        """
+        drone = self.drones.get(host)
+        if drone is None:
+            with self._lock:
+                drone = self.drones.setdefault(host, create_entry())
+        return drone
+
+    def acquire(self, host: str, create_entry: Callable[[], dict]) -> dict:
+        """Register a drone for one more user of its entry.
+        """
+        drone = self.register(host, create_entry)
+        with self._lock:
+            self.references[host] = self.references.get(host, 0) + 1
+        return drone
+
+    def release(self, host: str, unregister: bool = True):
+        """A user of the entry of a drone is done with it. The entry is only
+        dropped when nobody uses it anymore and unregister is True.
+        """
+        with self._lock:
+            count = self.references.get(host, 0) - 1
+            if count > 0:
+                self.references[host] = count
+                return
+            self.references.pop(host, None)
+            if unregister:
+                self.drones.pop(host, None)
+
+    def unregister(self, host: str):
+        """Stop routing packets of a drone
+        """
+        with self._lock:
+            self.drones.pop(host, None)
+
+    def send(self, data: bytes, address: tuple):
+        self.control_socket.sendto(data, address)
+
+    def close(self):
+        """Close every socket, which stops the receiver threads
+        """
+        with self._lock:
+            sockets = list(self.state_sockets.values())
+            if self.control_socket is not None:
+                sockets.append(self.control_socket)
+
+            for sock in sockets:
+                try:
+                    # Wakes up the receiver blocked in recvfrom
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
+
+            self.state_sockets.clear()
+            self.control_socket = None
+            self.started = False
@@ -0,0 +1,256 @@
+"""Panorama capture and stitching.
+
+A PanoramaJob turns the drone in place following one of the routines of
+examples/panorama/panoramaModule.py. Instead of sleeping a fixed second after
+every rotation it waits until the state packets show the drone holding still on
+the expected heading, then keeps the first frame decoded after that moment.
+The captured frames stay in memory and are stitched on a background thread
+with OpenCV, which matches features on downscaled copies of the frames.
+"""
+
+import itertools
+import time
+from threading import Lock, Thread
+from typing import Callable, Dict, List, Optional
+
+from .tello import TelloException
+from ..utils.Logger import Logger
+from ..utils.lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+
+MODE_FULL = 'full'
+MODE_HALF = 'half'
+
+DIRECTION_CLOCKWISE = 'cw'
+DIRECTION_COUNTER_CLOCKWISE = 'ccw'
+
+# Rotation (in degrees, negative turns the other way) before every capture
+# and after the last one, as in panoramaModule
+PANORAMA_PLANS = {
+    MODE_FULL: ([0, 80, 80, 80, 80], 40),
+    MODE_HALF: ([-90, 60, 60, 60], -90),
+}
+
+STATUS_CAPTURING = 'capturing'
+STATUS_STITCHING = 'stitching'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+def angle_difference(a: float, b: float) -> float:
+    """Smallest signed difference between two headings in degrees
+    """
+    return (a - b + 180) % 360 - 180
+
+
+def stitch_images(images: list, registration_resolution: float = 0.3):
+    """Stitch RGB frames into a panorama with OpenCV.
+    Arguments:
+        images: RGB numpy arrays in capture order
+        registration_resolution: megapixels the frames are downscaled to for feature matching
+    Returns:
+        RGB numpy array
+    """
+    stitcher = cv2.Stitcher_create(cv2.Stitcher_PANORAMA)
+    stitcher.setRegistrationResol(registration_resolution)
+    status, panorama = stitcher.stitch([cv2.cvtColor(image, cv2.COLOR_RGB2BGR) for image in images])
+    if status != cv2.Stitcher_OK:
+        raise TelloException('Stitching the panorama failed with status {}'.format(status))
+    return cv2.cvtColor(panorama, cv2.COLOR_BGR2RGB)
+
+
+def encode_jpeg(image, quality: int = 90) -> bytes:
+    """Encode an RGB frame as JPEG
+    """
+    success, data = cv2.imencode('.jpg', cv2.cvtColor(image, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not success:
+        raise TelloException('Encoding the panorama failed')
+    return data.tobytes()
+
+
+class PanoramaJob:
+    """Captures and stitches one panorama in the background.
+    """
+    logger = Logger.get_logger(name="PanoramaJob")
+
+    YAW_TOLERANCE = 3  # in degrees
+    SETTLE_TIMEOUT = 3.0  # in seconds
+    SETTLE_POLL_INTERVAL = 0.05  # in seconds
+    FRAME_TIMEOUT = 2.0  # in seconds
+
+    ids = itertools.count(1)
+
+    def __init__(self, tello, mode: str = MODE_FULL, direction: str = DIRECTION_CLOCKWISE,
+                 stitcher: Callable[[list], object] = stitch_images):
+        if mode not in PANORAMA_PLANS:
+            raise ValueError("Unknown panorama mode: {}".format(mode))
+        if direction not in (DIRECTION_CLOCKWISE, DIRECTION_COUNTER_CLOCKWISE):
+            raise ValueError("Unknown rotation direction: {}".format(direction))
+
+        self.id = str(next(PanoramaJob.ids))
+        self.tello = tello
+        self.mode = mode
+        self.direction = direction
+        self.stitcher = stitcher
+        self.status = STATUS_CAPTURING
+        self.error: Optional[str] = None
+        self.frames: List = []
+        self.headings: List[Optional[float]] = []
+        self.panorama = None
+        self.target_yaw: Optional[float] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.worker = Thread(target=self.run, daemon=True, name="tello-panorama-{}".format(self.id))
+
+    def start(self):
+        self.worker.start()
+
+    def run(self):
+        """Thread worker function, captures the frames then stitches them.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        try:
+            self.capture()
+            self.status = STATUS_STITCHING
+            started = time.perf_counter()
+            self.panorama = self.stitcher(self.frames)
+            self.logger.info("Panorama {} stitched from {} frames in {:.2f} seconds".format(
+                self.id, len(self.frames), time.perf_counter() - started))
+            self.status = STATUS_DONE
+        except Exception as e:
+            self.logger.error("Panorama {} failed".format(self.id), exc_info=True)
+            self.error = str(e)
+            self.status = STATUS_FAILED
+        finally:
+            self.finished_at = time.time()
+
+    def capture(self):
+        """Rotate through the plan and keep one settled frame per heading.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        started_stream = not self.tello.stream_on
+        if started_stream:
+            self.tello.streamon()
+        # The frame reader binds the video port, the one started here must not outlive the job
+        started_reader = self.tello.background_frame_read is None
+        frame_read = self.tello.get_frame_read()
+        subscriber = frame_read.subscribe()
+        try:
+            rotations, final_rotation = PANORAMA_PLANS[self.mode]
+            for rotation in rotations:
+                self.rotate(rotation)
+                settled_at = self.wait_until_settled()
+                self.frames.append(self.first_frame_after(subscriber, settled_at))
+                self.headings.append(self.get_yaw())
+            self.rotate(final_rotation)
+        finally:
+            subscriber.close()
+            if started_reader:
+                frame_read.stop()
+                self.tello.background_frame_read = None
+            if started_stream:
+                try:
+                    self.tello.streamoff()
+                except TelloException:
+                    self.logger.warning("Panorama {}: turning the video stream off failed".format(self.id))
+
+    def rotate(self, angle: int):
+        """Turn by angle degrees in the direction of the job, negative angles turn the other way.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        if not angle:
+            self.target_yaw = self.get_yaw()
+            return
+
+        clockwise = (angle > 0) == (self.direction == DIRECTION_CLOCKWISE)
+        yaw = self.get_yaw()
+        if clockwise:
+            self.tello.rotate_clockwise(abs(angle))
+        else:
+            self.tello.rotate_counter_clockwise(abs(angle))
+        self.target_yaw = None if yaw is None else (yaw + (abs(angle) if clockwise else -abs(angle)))
+
+    def get_yaw(self) -> Optional[float]:
+        try:
+            return self.tello.get_yaw()
+        except TelloException:
+            return None
+
+    def wait_until_settled(self) -> float:
+        """Wait until the drone is stable (see Tello.wait_until_stable) on the expected heading.
+        Internal method, you normally wouldn't call this yourself.
+        Returns:
+            float: the time the drone settled at, or gave up waiting
+        """
+        deadline = time.time() + self.SETTLE_TIMEOUT
+        while True:
+            stable = self.tello.wait_until_stable(timeout=max(deadline - time.time(), 0))
+            yaw = self.get_yaw()
+            on_heading = self.target_yaw is None or yaw is None or \
+                abs(angle_difference(yaw, self.target_yaw)) <= self.YAW_TOLERANCE
+            if stable and on_heading:
+                return time.time()
+            if time.time() >= deadline:
+                break
+            time.sleep(self.SETTLE_POLL_INTERVAL)
+
+        self.logger.warning("Panorama {}: yaw did not settle on {} within {} seconds".format(
+            self.id, self.target_yaw, self.SETTLE_TIMEOUT))
+        return time.time()
+
+    def first_frame_after(self, subscriber, timestamp: float):
+        """Get the first frame published after timestamp.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        deadline = time.time() + self.FRAME_TIMEOUT
+        while True:
+            remaining = deadline - time.time()
+            frame = subscriber.wait_for_next(timeout=max(remaining, 0))
+            if frame is not None and frame.timestamp >= timestamp:
+                return frame.image
+            if remaining <= 0:
+                raise TelloException('No video frame received after the rotation settled')
+
+    def get_image(self) -> Optional[bytes]:
+        """Get the stitched panorama as JPEG, None until the job is done
+        """
+        if self.panorama is None:
+            return None
+        return encode_jpeg(self.panorama)
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'mode': self.mode,
+            'direction': self.direction,
+            'status': self.status,
+            'error': self.error,
+            'frames': len(self.frames),
+            'headings': list(self.headings),
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+MAX_PANORAMA_JOBS = 10
+
+# Most recent panorama jobs by id
+panorama_jobs: Dict[str, PanoramaJob] = {}
+panorama_jobs_lock = Lock()
+
+
+def start_panorama(tello, mode: str = MODE_FULL, direction: str = DIRECTION_CLOCKWISE) -> PanoramaJob:
+    """Start a panorama job, only one drone rotation may run at a time
+    """
+    with panorama_jobs_lock:
+        if any(job.status == STATUS_CAPTURING for job in panorama_jobs.values()):
+            raise TelloException('A panorama is already being captured')
+
+        job = PanoramaJob(tello, mode, direction)
+        panorama_jobs[job.id] = job
+        while len(panorama_jobs) > MAX_PANORAMA_JOBS:
+            del panorama_jobs[next(iter(panorama_jobs))]
+
+    job.start()
+    return job
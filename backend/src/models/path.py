@@ -0,0 +1,213 @@
+"""Waypoint path optimizer.
+
+Flying a route with one move_forward/move_left/... per axis and leg costs a
+command round trip and a full stop every time. optimize_path turns a list of
+waypoints into the fewest go and curve commands: legs going the same way are
+merged, gentle turns are flown as one curve through the corner when its radius
+fits the SDK limits, and legs are split or skipped to fit the 20-500 cm range
+of the commands. The estimated flight time before and after is reported.
+
+Waypoints are (x, y, z) in cm relative to the start, in the frame of the drone
+at the start: x forward, y left, z up, the same as go_xyz_speed.
+"""
+
+import math
+from typing import List, Optional, Sequence
+
+MIN_DISTANCE = 20  # in cm, at least one axis must move this much
+MAX_DISTANCE = 500  # in cm, per axis
+MIN_CURVE_RADIUS = 50  # in cm
+MAX_CURVE_RADIUS = 1000  # in cm
+MAX_CURVE_SPEED = 60  # in cm/s
+COMMAND_OVERHEAD = 0.5  # in seconds, round trip of a command
+STOP_SECONDS = 1.0  # in seconds, braking and settling at the end of a command
+
+
+def _sub(a, b):
+    return tuple(p - q for p, q in zip(a, b))
+
+
+def _norm(v):
+    return math.sqrt(sum(c * c for c in v))
+
+
+def _cross(u, v):
+    return (u[1] * v[2] - u[2] * v[1], u[2] * v[0] - u[0] * v[2], u[0] * v[1] - u[1] * v[0])
+
+
+def _dot(u, v):
+    return sum(p * q for p, q in zip(u, v))
+
+
+def _too_short(v) -> bool:
+    return all(abs(c) < MIN_DISTANCE for c in v)
+
+
+def command_seconds(length: float, speed: float) -> float:
+    """Estimated time of one motion command covering length cm
+    """
+    return length / speed + COMMAND_OVERHEAD + STOP_SECONDS
+
+
+def turn_angle(u, v) -> float:
+    """Heading change in degrees between two legs, 0 when going straight on
+    """
+    cos = _dot(u, v) / (_norm(u) * _norm(v))
+    return math.degrees(math.acos(max(-1.0, min(1.0, cos))))
+
+
+def circumradius(u, v) -> float:
+    """Radius of the circle through a point, the point + u and the point + u + v, inf if they are collinear
+    """
+    area = _norm(_cross(u, v))
+    if area < 1e-9:
+        return math.inf
+    return _norm(u) * _norm(v) * _norm(tuple(p + q for p, q in zip(u, v))) / (2 * area)
+
+
+class PathCommand:
+    """One go or curve command, coordinates relative to the position the command starts from
+    """
+    __slots__ = ('action', 'via', 'end', 'speed', 'length')
+
+    def __init__(self, action: str, end: tuple, speed: int, length: float, via: Optional[tuple] = None):
+        self.action = action
+        self.via = via
+        self.end = end
+        self.speed = speed
+        self.length = length
+
+    @property
+    def seconds(self) -> float:
+        return command_seconds(self.length, self.speed)
+
+    def to_step(self) -> dict:
+        """Mission step (see mission.compile_mission) of the command
+        """
+        if self.action == 'curve':
+            (x1, y1, z1), (x2, y2, z2) = self.via, self.end
+            return {'action': 'curve', 'x1': x1, 'y1': y1, 'z1': z1, 'x2': x2, 'y2': y2, 'z2': z2,
+                    'speed': self.speed}
+        x, y, z = self.end
+        return {'action': 'go', 'x': x, 'y': y, 'z': z, 'speed': self.speed}
+
+    def to_command(self) -> str:
+        if self.action == 'curve':
+            return 'curve {} {} {} {} {} {} {}'.format(*self.via, *self.end, self.speed)
+        return 'go {} {} {} {}'.format(*self.end, self.speed)
+
+
+class PathPlan:
+    """Result of optimize_path
+    """
+
+    def __init__(self, commands: List[PathCommand], naive_commands: int, naive_duration: float,
+                 warnings: List[str]):
+        self.commands = commands
+        self.naive_commands = naive_commands
+        self.naive_duration = naive_duration
+        self.duration = sum(command.seconds for command in commands)
+        self.warnings = warnings
+
+    def to_steps(self) -> list:
+        return [command.to_step() for command in self.commands]
+
+    def to_dict(self) -> dict:
+        return {
+            'commands': [command.to_command() for command in self.commands],
+            'steps': self.to_steps(),
+            'before': {'commands': self.naive_commands, 'duration': round(self.naive_duration, 1)},
+            'after': {'commands': len(self.commands), 'duration': round(self.duration, 1)},
+            'warnings': self.warnings,
+        }
+
+
+def naive_estimate(points: Sequence[tuple], speed: int):
+    """Commands and time to fly the legs with one move_* command per axis
+    Returns:
+        (int, float): number of commands, seconds
+    """
+    commands, seconds = 0, 0.0
+    for start, end in zip(points, points[1:]):
+        for component in _sub(end, start):
+            if abs(component) >= 1:
+                commands += 1
+                seconds += command_seconds(abs(component), speed)
+    return commands, seconds
+
+
+def optimize_path(waypoints: Sequence[Sequence[float]], speed: int = 50, max_turn: float = 60,
+                  curves: bool = True) -> PathPlan:
+    """Compile waypoints into go/curve commands.
+    Arguments:
+        waypoints: (x, y, z) in cm relative to the start
+        speed: 10-100 cm/s, curves fly at most 60 cm/s
+        max_turn: largest heading change in degrees flown as a curve, sharper corners stop
+        curves: use curve commands for gentle turns
+    Returns:
+        PathPlan
+    """
+    if not 10 <= speed <= 100:
+        raise ValueError('speed must be within 10 and 100')
+
+    points = [(0, 0, 0)] + [tuple(int(round(c)) for c in point) for point in waypoints]
+    warnings = []
+    naive_commands, naive_duration = naive_estimate(points, speed)
+
+    # Merge legs going the same way
+    merged = [points[0]]
+    for point in points[1:]:
+        if _norm(_sub(point, merged[-1])) < 1:
+            continue
+        if len(merged) >= 2:
+            u, v = _sub(merged[-1], merged[-2]), _sub(point, merged[-1])
+            if _norm(_cross(u, v)) <= 1e-6 * _norm(u) * _norm(v) and _dot(u, v) > 0:
+                merged[-1] = point
+                continue
+        merged.append(point)
+
+    # Skip waypoints too close to the previous one, the SDK can't fly such short legs
+    reachable = [merged[0]]
+    for index, point in enumerate(merged[1:], 1):
+        if _too_short(_sub(point, reachable[-1])):
+            if index == len(merged) - 1 and len(reachable) > 1:
+                warnings.append('waypoint {} replaced by the last waypoint {}, closer than {} cm'.format(
+                    list(reachable[-1]), list(point), MIN_DISTANCE))
+                reachable[-1] = point
+            else:
+                warnings.append('waypoint {} skipped, closer than {} cm to the previous one'.format(
+                    list(point), MIN_DISTANCE))
+            continue
+        reachable.append(point)
+
+    # Split legs longer than an SDK command can fly
+    legs = []
+    for start, end in zip(reachable, reachable[1:]):
+        delta = _sub(end, start)
+        pieces = max(1, math.ceil(max(abs(c) for c in delta) / MAX_DISTANCE))
+        previous = start
+        for piece in range(1, pieces + 1):
+            point = tuple(start[axis] + round(delta[axis] * piece / pieces) for axis in range(3))
+            legs.append(_sub(point, previous))
+            previous = point
+
+    commands = []
+    curve_speed = min(speed, MAX_CURVE_SPEED)
+    index = 0
+    while index < len(legs):
+        u = legs[index]
+        if curves and index + 1 < len(legs):
+            v = legs[index + 1]
+            end = tuple(p + q for p, q in zip(u, v))
+            radius = circumradius(u, v)
+            if turn_angle(u, v) <= max_turn and MIN_CURVE_RADIUS <= radius <= MAX_CURVE_RADIUS \
+                    and all(abs(c) <= MAX_DISTANCE for c in end) and not _too_short(end):
+                # Arc from the start through the corner to the end, its central angle is twice the turn
+                length = radius * 2 * math.radians(turn_angle(u, v))
+                commands.append(PathCommand('curve', end, curve_speed, length, via=u))
+                index += 2
+                continue
+        commands.append(PathCommand('go', u, speed, _norm(u)))
+        index += 1
+
+    return PathPlan(commands, naive_commands, naive_duration, warnings)
@@ -0,0 +1,185 @@
+"""Dead reckoned pose of a drone.
+
+The state packets carry velocities (vgx/vgy/vgz, dm/s) and accelerations
+(agx/agy/agz, thousandths of g) in the frame of the drone, the yaw and the
+height, but no position. A PoseEstimator integrates them into a position in the
+frame of the drone when the estimator started: x forward, y left, z up in cm,
+the frame of go_xyz_speed and of path.optimize_path.
+
+It works on the TelemetryHistory of the drone. Whenever the pose is read, the
+samples received since the last read are integrated in one vectorized pass:
+the velocity is a complementary filter of the measured velocity (coarse, in
+steps of 10 cm/s) and of the integrated acceleration, the accelerometer bias
+is learned while the drone is still, and the height comes from `h`. When a
+mission pad is detected the position is fixed to the pad: the first sighting of
+a pad records where it is, later sightings remove the drift accumulated since.
+"""
+
+import math
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from .telemetry import TelemetryHistory
+from ..utils.lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+VELOCITY_SCALE = 10.0  # dm/s to cm/s
+ACCELERATION_SCALE = 0.980665  # thousandths of g to cm/s^2
+MAX_BATCH = 200  # samples integrated at once, keeps alpha ** -n finite
+
+
+class PoseEstimator:
+    """Streaming position estimate of one drone.
+    """
+
+    def __init__(self, history: TelemetryHistory, alpha: float = 0.8, bias_alpha: float = 0.1, max_gap: float = 1.0,
+                 pads: Optional[Dict[int, Tuple[float, float]]] = None):
+        """
+        Arguments:
+            history: telemetry history of the drone
+            alpha: weight of the integrated acceleration against the measured velocity
+            bias_alpha: smoothing factor of the accelerometer bias learned while still
+            max_gap: longest time step in seconds integrated, longer gaps are skipped
+            pads: known mission pad positions (x, y in cm), pads seen first are added
+        """
+        self.history = history
+        self.alpha = alpha
+        self.bias_alpha = bias_alpha
+        self.max_gap = max_gap
+        self.pads = dict(pads or {})
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self, x: float = 0.0, y: float = 0.0, yaw: Optional[float] = None):
+        """Restart the estimate at (x, y), with the current heading of the drone as x axis unless yaw is given
+        """
+        with self._lock:
+            self.position = (float(x), float(y), 0.0)
+            self.velocity = (0.0, 0.0, 0.0)
+            self.bias = (0.0, 0.0)
+            self.yaw_origin = yaw
+            self.heading = 0.0
+            self.timestamp = None
+            self.fix = None
+            self.samples = 0
+            self._version = self.history.version
+
+    def update(self):
+        """Integrate the samples received since the last update.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        with self._lock:
+            version = self.history.version
+            new = min(version - self._version, self.history.capacity)
+            self._version = version
+            if new <= 0:
+                return
+            samples = self.history.to_array(last=new)
+            for start in range(0, len(samples), MAX_BATCH):
+                self._integrate(samples[start:start + MAX_BATCH])
+
+    def _integrate(self, samples: 'np.ndarray'):
+        columns = TelemetryHistory.COLUMNS
+        timestamps = samples[:, columns['timestamp']]
+        yaw = samples[:, columns['yaw']]
+        valid = ~np.isnan(yaw)
+        if not valid.any():
+            return
+        samples, timestamps, yaw = samples[valid], timestamps[valid], yaw[valid]
+
+        if self.yaw_origin is None:
+            self.yaw_origin = float(yaw[0])
+        heading = np.radians((yaw - self.yaw_origin + 180) % 360 - 180)
+        cos, sin = np.cos(heading), np.sin(heading)
+
+        measured = np.nan_to_num(samples[:, [columns['vgx'], columns['vgy'], columns['vgz']]]) * VELOCITY_SCALE
+        acceleration = np.nan_to_num(samples[:, [columns['agx'], columns['agy']]]) * ACCELERATION_SCALE
+
+        # The accelerometer bias is whatever it reads while the drone does not move: an
+        # exponential average of the still samples, each sample corrected by the bias known at its time
+        still = ~measured.any(axis=1)
+        bias = np.array([self.bias])
+        if still.any():
+            keep = (1 - self.bias_alpha) ** np.arange(1, np.count_nonzero(still) + 1)
+            updates = keep[:, None] * (bias + np.cumsum(
+                self.bias_alpha * acceleration[still] / keep[:, None], axis=0))
+            bias = np.vstack((bias, updates))[np.cumsum(still)]
+            self.bias = tuple(float(value) for value in bias[-1])
+        acceleration = acceleration - bias
+
+        # Drone frame (x forward, y right) to the estimator frame (x forward at the start, y left)
+        world_measured = np.column_stack((measured[:, 0] * cos - measured[:, 1] * sin,
+                                          -measured[:, 0] * sin - measured[:, 1] * cos))
+        world_acceleration = np.column_stack((acceleration[:, 0] * cos - acceleration[:, 1] * sin,
+                                              -acceleration[:, 0] * sin - acceleration[:, 1] * cos))
+
+        previous = self.timestamp if self.timestamp is not None else timestamps[0]
+        dt = np.diff(np.concatenate(([previous], timestamps)))
+        dt[(dt < 0) | (dt > self.max_gap)] = 0
+
+        # v[i] = alpha * (v[i-1] + a[i] * dt[i]) + (1 - alpha) * m[i], solved for every i at once:
+        # v[i] = alpha ** (i + 1) * (v0 + sum_k u[k] / alpha ** (k + 1)),
+        # restarting from 0 at every still sample (zero velocity update)
+        index = np.arange(len(samples))
+        powers = self.alpha ** (index + 1)
+        drive = self.alpha * world_acceleration * dt[:, None] + (1 - self.alpha) * world_measured
+        sums = np.cumsum(drive / powers[:, None], axis=0)
+        last_still = np.maximum.accumulate(np.where(still, index, -1))
+        start = np.where((last_still < 0)[:, None], -np.array(self.velocity[:2]), sums[last_still])
+        velocity = powers[:, None] * (sums - start)
+
+        # Trapezoidal integration of the velocity
+        before = np.vstack((self.velocity[:2], velocity[:-1]))
+        positions = np.array(self.position[:2]) + np.cumsum((before + velocity) / 2 * dt[:, None], axis=0)
+
+        positions = self._apply_pad_fix(samples, positions)
+
+        height = samples[:, columns['h']]
+        z = float(height[~np.isnan(height)][-1]) if not np.isnan(height).all() else \
+            self.position[2] + float(np.sum(measured[:, 2] * dt))
+
+        self.position = (float(positions[-1, 0]), float(positions[-1, 1]), z)
+        self.velocity = (float(velocity[-1, 0]), float(velocity[-1, 1]), float(measured[-1, 2]))
+        self.heading = math.degrees(float(heading[-1]))
+        self.timestamp = float(timestamps[-1])
+        self.samples += len(samples)
+
+    def _apply_pad_fix(self, samples: 'np.ndarray', positions: 'np.ndarray') -> 'np.ndarray':
+        """Record the pads seen for the first time and move the positions onto the last known pad seen.
+        Mission pad coordinates are taken as aligned with the estimator frame.
+        """
+        columns = TelemetryHistory.COLUMNS
+        mid = samples[:, columns['mid']]
+        offsets = samples[:, [columns['x'], columns['y']]]
+        seen = np.flatnonzero((mid > 0) & ~np.isnan(offsets).any(axis=1))
+        if not seen.size:
+            return positions
+
+        for row in seen:
+            pad = int(mid[row])
+            if pad not in self.pads:
+                self.pads[pad] = tuple(float(value) for value in positions[row] - offsets[row])
+
+        row = seen[-1]
+        pad = int(mid[row])
+        fixed = np.array(self.pads[pad]) + offsets[row]
+        positions[row:] += fixed - positions[row]
+        self.fix = {'pad': pad, 'timestamp': float(samples[row, columns['timestamp']])}
+        return positions
+
+    def get_pose(self) -> dict:
+        """Get the current pose, after integrating the newest samples
+        """
+        self.update()
+        with self._lock:
+            return {
+                'x': round(self.position[0], 1),
+                'y': round(self.position[1], 1),
+                'z': round(self.position[2], 1),
+                'heading': round(self.heading, 1),
+                'velocity': [round(value, 1) for value in self.velocity],
+                'timestamp': self.timestamp,
+                'fix': self.fix,
+                'samples': self.samples,
+            }
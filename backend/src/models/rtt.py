@@ -0,0 +1,70 @@
+"""Round trip time estimation for Tello commands.
+
+The estimator follows the retransmission timer of TCP (RFC 6298): a smoothed
+round trip time (SRTT) and its mean deviation (RTTVAR) are updated with every
+unambiguous sample, the timeout is SRTT + K * RTTVAR and doubles on every
+timeout until a new sample arrives.
+"""
+
+from threading import Lock
+
+
+class RttEstimator:
+    """Smoothed round trip time and retransmission timeout of one command class.
+    """
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+    MAX_BACKOFF = 64
+
+    def __init__(self, initial_timeout: float = 1.0, min_timeout: float = 0.25, max_timeout: float = 7.0):
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.backoff_factor = 1
+        self._lock = Lock()
+
+    def _clamp(self, timeout: float) -> float:
+        return max(self.min_timeout, min(self.max_timeout, timeout))
+
+    @property
+    def timeout(self) -> float:
+        """Current retransmission timeout in seconds, including backoff
+        """
+        with self._lock:
+            if self.srtt is None:
+                base = self.initial_timeout
+            else:
+                base = self.srtt + self.K * self.rttvar
+            return self._clamp(base * self.backoff_factor)
+
+    def observe(self, rtt: float):
+        """Add a round trip time sample. Only sample commands that were answered on
+        their first attempt, retransmitted commands give ambiguous samples (Karn's algorithm).
+        """
+        with self._lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+                self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+            self.samples += 1
+            self.backoff_factor = 1
+
+    def backoff(self):
+        """Double the timeout after a command timed out
+        """
+        with self._lock:
+            self.backoff_factor = min(self.backoff_factor * 2, self.MAX_BACKOFF)
+
+    def to_dict(self) -> dict:
+        return {
+            "srtt": self.srtt,
+            "rttvar": self.rttvar,
+            "timeout": self.timeout,
+            "samples": self.samples,
+        }
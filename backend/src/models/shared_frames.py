@@ -0,0 +1,119 @@
+"""Frames shared with worker processes without pickling them.
+
+A SharedFrameRing is a ring of frame sized slots in one block of
+multiprocessing shared memory. The producer copies a frame into a free slot
+and only sends a small SharedFrameRef to the worker process, which maps the
+same memory and reads the frame as a numpy array in place.
+"""
+
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from threading import Condition
+from typing import NamedTuple, Optional, Tuple
+
+from ..utils.lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+
+class SharedFrameRef(NamedTuple):
+    """Picklable reference to a frame in a SharedFrameRing
+    """
+    name: str
+    slot: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+class SharedFrameRing:
+    """Fixed number of slots holding frames of one shape in shared memory. A slot
+    is busy from write() until release(), write() waits for a free slot.
+    """
+
+    def __init__(self, shape: tuple, dtype='uint8', slots: int = 4):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.frame_size = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.memory = shared_memory.SharedMemory(create=True, size=max(self.frame_size * slots, 1))
+        self.frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self.memory.buf)
+        self.busy = [False] * slots
+        self._next = 0
+        self._condition = Condition()
+        self.closed = False
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def fits(self, image) -> bool:
+        return image.shape == self.shape and image.dtype == self.dtype
+
+    def write(self, image, timeout: Optional[float] = None) -> Optional[SharedFrameRef]:
+        """Copy a frame into the next free slot.
+        Returns:
+            SharedFrameRef, None when no slot got free within timeout
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: not all(self.busy) or self.closed, timeout):
+                return None
+            if self.closed:
+                return None
+
+            while self.busy[self._next]:
+                self._next = (self._next + 1) % self.slots
+            slot = self._next
+            self._next = (slot + 1) % self.slots
+            self.busy[slot] = True
+
+        self.frames[slot] = image
+        return SharedFrameRef(self.name, slot, self.shape, self.dtype.str)
+
+    def release(self, ref: SharedFrameRef):
+        """Make the slot of a frame available again, once the workers are done with it
+        """
+        with self._condition:
+            self.busy[ref.slot] = False
+            self._condition.notify()
+
+    def close(self):
+        """Free the shared memory. Workers that still map it keep their mapping until they detach.
+        """
+        with self._condition:
+            if self.closed:
+                return
+            self.closed = True
+            self._condition.notify_all()
+
+        del self.frames
+        try:
+            self.memory.close()
+        except BufferError:
+            pass  # a view of a slot is still alive, the mapping goes away with it
+        self.memory.unlink()
+
+
+# Shared memory blocks mapped by this (worker) process, by name
+_attached = OrderedDict()
+MAX_ATTACHED = 8
+
+
+def attach_frame(ref: SharedFrameRef):
+    """Get the frame a SharedFrameRef points to as a numpy array, without copying it.
+    Meant to be called in worker processes, blocks stay mapped for the next frames.
+    """
+    memory = _attached.get(ref.name)
+    if memory is None:
+        memory = _attached[ref.name] = shared_memory.SharedMemory(name=ref.name)
+        while len(_attached) > MAX_ATTACHED:
+            _, oldest = _attached.popitem(last=False)
+            try:
+                oldest.close()
+            except BufferError:
+                pass  # a frame of it is still in use, it gets unmapped with the process
+    else:
+        _attached.move_to_end(ref.name)
+
+    dtype = np.dtype(ref.dtype)
+    frame_size = int(np.prod(ref.shape)) * dtype.itemsize
+    return np.ndarray(ref.shape, dtype=dtype, buffer=memory.buf, offset=ref.slot * frame_size)
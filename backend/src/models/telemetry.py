@@ -0,0 +1,213 @@
+"""Telemetry history and derived metrics.
+
+Every state packet of a drone is appended to a fixed size numpy ring buffer.
+Derived metrics (magnitudes, moving averages, filtered altitude, battery
+drain) are computed in one vectorized pass over that history and cached until
+the next packet arrives, so any number of viewers share the same computation.
+"""
+
+import time
+from threading import Condition, Lock
+from typing import Optional
+
+from ..utils.lazy_import import lazy_import
+
+# numpy is only loaded once the first state packet arrives
+np = lazy_import('numpy')
+
+
+class TelemetryHistory:
+    """Ring buffer of the numeric state fields of one drone.
+    """
+    FIELDS = (
+        'timestamp',
+        'vgx', 'vgy', 'vgz',
+        'agx', 'agy', 'agz',
+        'pitch', 'roll', 'yaw',
+        'templ', 'temph',
+        'h', 'tof', 'baro', 'bat', 'time',
+        'mid', 'x', 'y', 'z',
+    )
+    COLUMNS = {name: index for index, name in enumerate(FIELDS)}
+
+    def __init__(self, capacity: int = 600):
+        self.capacity = capacity
+        self._data = None  # allocated with the first sample
+        self._next = 0
+        self._count = 0
+        self._version = 0
+        self._derived = None
+        self._derived_version = -1
+        self._lock = Lock()
+        self._new_sample = Condition(self._lock)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def version(self) -> int:
+        """Number of samples appended so far
+        """
+        return self._version
+
+    def append(self, state: dict, timestamp: Optional[float] = None):
+        """Add the numeric fields of a parsed state packet. Missing fields are stored as NaN.
+        """
+        row = np.full(len(self.FIELDS), np.nan)
+        row[0] = timestamp if timestamp is not None else time.time()
+        for name, index in self.COLUMNS.items():
+            value = state.get(name)
+            if isinstance(value, (int, float)):
+                row[index] = value
+
+        with self._lock:
+            if self._data is None:
+                self._data = np.full((self.capacity, len(self.FIELDS)), np.nan)
+            self._data[self._next] = row
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self._version += 1
+            self._new_sample.notify_all()
+
+    def wait_for_sample(self, version: int, timeout: Optional[float] = None) -> bool:
+        """Block until a sample newer than version was appended.
+        Returns:
+            bool: False on timeout
+        """
+        with self._new_sample:
+            return self._new_sample.wait_for(lambda: self._version > version, timeout)
+
+    def to_array(self, last: Optional[int] = None) -> 'np.ndarray':
+        """Get a copy of the history in chronological order, one row per sample.
+        Arguments:
+            last: only return the last n samples
+        """
+        with self._lock:
+            if self._data is None:
+                return np.empty((0, len(self.FIELDS)))
+            count = self._count if last is None else min(last, self._count)
+            indices = (np.arange(self._next - count, self._next)) % self.capacity
+            return self._data[indices].copy()
+
+    def column(self, name: str, last: Optional[int] = None) -> 'np.ndarray':
+        return self.to_array(last)[:, self.COLUMNS[name]]
+
+    def derived(self, **kwargs) -> dict:
+        """Get the derived metrics of the current history, computed at most once per sample.
+        Keyword arguments are passed to compute_derived and disable caching.
+        """
+        if kwargs:
+            return compute_derived(self.to_array(), **kwargs)
+
+        version = self._version
+        if self._derived_version != version:
+            self._derived = compute_derived(self.to_array())
+            self._derived_version = version
+        return self._derived
+
+
+def _latest(values: 'np.ndarray') -> Optional[float]:
+    valid = values[~np.isnan(values)]
+    return float(valid[-1]) if valid.size else None
+
+
+def _mean(values: 'np.ndarray') -> Optional[float]:
+    valid = values[~np.isnan(values)]
+    return float(valid.mean()) if valid.size else None
+
+
+def _ewma(values: 'np.ndarray', alpha: float) -> Optional[float]:
+    """Last value of the exponentially weighted moving average, computed with a
+    single dot product instead of a Python loop.
+    """
+    values = values[~np.isnan(values)]
+    if not values.size:
+        return None
+
+    weights = alpha * (1 - alpha) ** np.arange(values.size - 1, -1, -1)
+    weights[0] = (1 - alpha) ** (values.size - 1)
+    return float(weights @ values)
+
+
+def compute_derived(samples: 'np.ndarray', window: int = 10, ewma_alpha: float = 0.2,
+                    drain_window: float = 60.0) -> dict:
+    """Compute derived telemetry from a history array (see TelemetryHistory.to_array).
+    Arguments:
+        samples: one row per state packet, columns as in TelemetryHistory.FIELDS
+        window: number of samples of the moving averages
+        ewma_alpha: smoothing factor of the filtered altitude
+        drain_window: seconds of history used to estimate the battery drain rate
+    Returns:
+        dict
+    """
+    columns = TelemetryHistory.COLUMNS
+    if not len(samples):
+        return {}
+
+    timestamps = samples[:, columns['timestamp']]
+    velocity = samples[:, [columns['vgx'], columns['vgy'], columns['vgz']]]
+    acceleration = samples[:, [columns['agx'], columns['agy'], columns['agz']]]
+
+    speed = np.sqrt(np.sum(velocity ** 2, axis=1))
+    total_acceleration = np.sqrt(np.sum(acceleration ** 2, axis=1))
+    temperature = (samples[:, columns['templ']] + samples[:, columns['temph']]) / 2
+
+    derived = {
+        'total_speed': _latest(speed),
+        'average_speed': _mean(speed[-window:]),
+        'max_speed': float(np.nanmax(speed)) if not np.all(np.isnan(speed)) else None,
+        'total_acceleration': _latest(total_acceleration),
+        'average_acceleration': _mean(total_acceleration[-window:]),
+        'average_temperature': _latest(temperature),
+        'smoothed_temperature': _mean(temperature[-window:]),
+        'filtered_height': _ewma(samples[:, columns['h']], ewma_alpha),
+        'battery_drain_rate': None,
+        'time_to_empty': None,
+        'samples': int(len(samples)),
+    }
+
+    # Battery drain: slope of a least squares line through the recent battery readings
+    battery = samples[:, columns['bat']]
+    recent = (timestamps >= timestamps[-1] - drain_window) & ~np.isnan(battery)
+    if np.count_nonzero(recent) >= 2 and np.ptp(timestamps[recent]) > 0:
+        slope = np.polyfit(timestamps[recent] - timestamps[recent][0], battery[recent], 1)[0]
+        derived['battery_drain_rate'] = float(-slope * 60)  # in % per minute
+        if slope < 0:
+            derived['time_to_empty'] = float(battery[recent][-1] / -slope)  # in seconds
+
+    return derived
+
+
+def is_stable(samples: 'np.ndarray', window: float = 0.5, max_speed: float = 1.0, max_attitude_rate: float = 5.0,
+              now: Optional[float] = None) -> bool:
+    """Check whether the drone held still during the last `window` seconds of a
+    history array: every speed at most max_speed and pitch, roll and yaw changing
+    by at most max_attitude_rate degrees per second.
+    Arguments:
+        samples: one row per state packet, columns as in TelemetryHistory.FIELDS
+        now: current time, when given the last sample must not be older than window
+    """
+    columns = TelemetryHistory.COLUMNS
+    if len(samples) < 2:
+        return False
+
+    timestamps = samples[:, columns['timestamp']]
+    if now is not None and now - timestamps[-1] > window:
+        return False
+
+    recent = samples[timestamps >= timestamps[-1] - window]
+    recent_timestamps = recent[:, columns['timestamp']]
+    # The window must be covered by samples, a single packet proves nothing
+    if len(recent) < 2 or recent_timestamps[-1] - recent_timestamps[0] < window * 0.8:
+        return False
+
+    velocity = recent[:, [columns['vgx'], columns['vgy'], columns['vgz']]]
+    speed = np.sqrt(np.sum(velocity ** 2, axis=1))
+    if np.any(np.isnan(speed)) or np.max(speed) > max_speed:
+        return False
+
+    attitude = recent[:, [columns['pitch'], columns['roll'], columns['yaw']]]
+    change = np.diff(attitude, axis=0)
+    change = (change + 180) % 360 - 180  # the yaw wraps around at +-180 degrees
+    rates = np.abs(change) / np.diff(recent_timestamps)[:, None]
+    return not np.any(np.isnan(rates)) and float(np.max(rates)) <= max_attitude_rate
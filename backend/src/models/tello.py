@@ -2,28 +2,100 @@
 """
 
 # coding=utf-8
-import socket
+import itertools
+import queue
+import re
 import time
+import weakref
 from collections import deque
 from datetime import datetime
-from threading import Thread, Lock
-from typing import Optional, Union, Type, Dict
-
-import av
-import numpy as np
+from threading import Condition, Thread, Lock, RLock
+from typing import Optional, Union, Type, Dict, List
 
+from .broadcaster import FrameBroadcaster, FrameSubscriber
 from .enforce_types import enforce_types
+from .geofence import Geofence, SafetyEnvelope
+from .health import HealthMonitor, LinkHealth
+from .mission_pads import MissionPadTracker
+from .pose import PoseEstimator
+from .network import TelloNetwork
+from .rtt import RttEstimator
+from .telemetry import TelemetryHistory, is_stable
+from .vision import VisionPipeline, VisionStage
 from ..utils.Logger import Logger
-
-threads_initialized = False
-drones: Optional[dict] = {}
-client_socket: socket.socket
+from ..utils import tracing
+from ..utils.lazy_import import lazy_import
+from ..utils.metrics import registry as metrics
+
+# PyAV and numpy take a while to import, they are loaded on first video use
+av = lazy_import('av')
+np = lazy_import('numpy')
+
+# Sockets and routing table shared by every drone
+network = TelloNetwork()
+drones: Dict[str, dict] = network.drones
+command_ids = itertools.count(1)
+# Round trip time estimators by host and command class, kept across Tello instances
+rtt_estimators: Dict[str, Dict[str, RttEstimator]] = {}
+# Connection health monitors by host
+health_monitors: Dict[str, HealthMonitor] = {}
+# Vision pipelines by host
+vision_pipelines: Dict[str, VisionPipeline] = {}
+# Geofences by host
+geofences: Dict[str, Geofence] = {}
+
+command_duration_seconds = metrics.histogram(
+    "tello_command_duration_seconds", "Time between sending a command and receiving its response", ("host", "verb"))
+command_retries = metrics.counter(
+    "tello_command_retries_total", "Control commands that were sent again after a failed attempt", ("host", "verb"))
+command_timeouts = metrics.counter(
+    "tello_command_timeouts_total", "Commands that did not receive a response in time", ("host", "verb"))
+late_responses = metrics.counter(
+    "tello_late_responses_total", "Responses discarded because they belong to an earlier command", ("host", "verb"))
+lost_responses = metrics.counter(
+    "tello_lost_responses_total", "Timed out commands whose response never arrived", ("host", "verb"))
+query_cache_lookups = metrics.counter(
+    "tello_query_cache_lookups_total", "Query commands answered from the state stream (hit) or via UDP (miss)",
+    ("host", "field", "result"))
+command_timeout_seconds = metrics.gauge(
+    "tello_command_timeout_seconds", "Current adaptive response timeout", ("host", "command_class"))
+priority_commands = metrics.counter(
+    "tello_priority_commands_total", "Commands sent through the priority lane", ("host", "verb"))
+cancelled_commands = metrics.counter(
+    "tello_cancelled_commands_total", "Pending commands cancelled by a priority command", ("host", "verb"))
+state_packets = metrics.counter(
+    "tello_state_packets_total", "State packets received", ("host",))
+state_parse_errors = metrics.counter(
+    "tello_state_parse_errors_total", "State fields that could not be parsed", ("field",))
+
+video_packets = metrics.counter(
+    "tello_video_packets_total", "Video packets demuxed from the UDP stream", ("stream",))
+video_frames_decoded = metrics.counter(
+    "tello_video_frames_decoded_total", "Frames produced by the H.264 decoder", ("stream",))
+video_frames_published = metrics.counter(
+    "tello_video_frames_published_total", "Frames converted to RGB and handed to consumers", ("stream",))
+video_frames_dropped = metrics.counter(
+    "tello_video_frames_dropped_total", "Decoded frames dropped before conversion", ("stream", "reason"))
+video_stage_seconds = metrics.histogram(
+    "tello_video_stage_seconds", "Time spent per video pipeline stage", ("stream", "stage"))
+video_queue_depth = metrics.gauge(
+    "tello_video_queue_depth", "Items waiting in a video pipeline hand-off queue", ("stream", "queue"))
+video_frame_age_seconds = metrics.histogram(
+    "tello_video_frame_age_seconds", "Age of a frame when a consumer reads it", ("stream",))
 
 
 class TelloException(Exception):
     pass
 
 
+class GeofenceViolation(TelloException):
+    pass
+
+
+class CommandCancelled(TelloException):
+    pass
+
+
 @enforce_types
 class Tello:
     """Python wrapper to interact with the Ryze Tello drone using the official Tello api.
@@ -33,6 +105,8 @@ class Tello:
     """
     # Send and receive commands, client socket
     RESPONSE_TIMEOUT = 7  # in seconds
+    MIN_RESPONSE_TIMEOUT = 0.25  # in seconds, lower bound of the adaptive timeout
+    INITIAL_RESPONSE_TIMEOUT = 1  # in seconds, adaptive timeout before the first round trip was measured
     TAKEOFF_TIMEOUT = 20  # in seconds
     FRAME_GRAB_TIMEOUT = 5
     TIME_BTW_COMMANDS = 0.1  # in seconds
@@ -66,6 +140,27 @@ class Tello:
     # Set up logger
     logger = Logger.get_logger(name="TelloModel")
 
+    # Command classes used to pick response timeouts. Queries and control commands are
+    # answered right away so their timeout follows the measured round trip time, motion
+    # commands are only answered once the maneuver is finished.
+    COMMAND_CLASS_QUERY = 'query'
+    COMMAND_CLASS_CONTROL = 'control'
+    COMMAND_CLASS_MOTION = 'motion'
+    MOTION_COMMANDS = (
+        'takeoff', 'land', 'throwfly',
+        'up', 'down', 'left', 'right', 'forward', 'back',
+        'cw', 'ccw', 'flip', 'go', 'curve', 'jump'
+    )
+    TIMEOUT_RESPONSE_PREFIX = 'Aborting command'
+    # Responses only a query can get: numbers with an optional unit or range, or key:value; lists
+    QUERY_RESPONSE_PATTERN = re.compile(r'^-?\d+(\.\d+)?(~-?\d+)?\s*[a-z%]{0,2}$|;')
+    LATE_RESPONSE_GRACE = RESPONSE_TIMEOUT  # in seconds an abandoned command may still be answered
+    # Commands of the priority lane, see send_priority_command
+    PRIORITY_COMMANDS = ('emergency', 'stop', 'land')
+    PRIORITY_REPEAT = 3  # copies sent, in case one is lost
+    PRIORITY_REPEAT_INTERVAL = 0.02  # in seconds between the copies
+    PRIORITY_REPLY_GRACE = 0.1  # in seconds the next command waits for the replies to the copies
+
     # Conversion functions for state protocol fields
     INT_STATE_FIELDS = (
         # Tello EDU with mission pads enabled only
@@ -79,6 +174,19 @@ class Tello:
     )
     FLOAT_STATE_FIELDS = ('baro', 'agx', 'agy', 'agz')
 
+    # Maximum age in seconds of a state packet for the query_* methods to answer
+    # from it instead of sending the query command. Set QUERY_CACHE_ENABLED to
+    # False to always send the query.
+    QUERY_CACHE_ENABLED = True
+    QUERY_CACHE_TTLS = {
+        'bat': 5.0,
+        'time': 1.0,
+        'h': 0.5,
+        'baro': 0.5,
+        'tof': 0.3,
+        'pitch': 0.3, 'roll': 0.3, 'yaw': 0.3,
+    }
+
     state_field_converters: Dict[str, Union[Type[int], Type[float]]]
     state_field_converters = {key: int for key in INT_STATE_FIELDS}
     state_field_converters.update({key: float for key in FLOAT_STATE_FIELDS})
@@ -92,9 +200,8 @@ class Tello:
     def __init__(self,
                  host=TELLO_IP,
                  retry_count=RETRY_COUNT,
-                 video_stream_udp=VIDEO_STREAM_UDP_PORT):
-
-        global threads_initialized, client_socket, drones
+                 video_stream_udp=VIDEO_STREAM_UDP_PORT,
+                 state_udp=STATE_UDP_PORT):
 
         self.address = (host, Tello.CONTROL_UDP_PORT)
         self.stream_on = False
@@ -102,93 +209,92 @@ class Tello:
         self.last_received_command_timestamp = time.time()
         self.last_rc_control_timestamp = time.time()
 
-        if not threads_initialized:
-            # Run Tello command responses UDP receiver on background
-            client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            client_socket.bind(("", Tello.CONTROL_UDP_PORT))
-            response_receiver_thread = Thread(target=Tello.udp_response_receiver)
-            response_receiver_thread.daemon = True
-            response_receiver_thread.start()
-
-            # Run state UDP receiver on background
-            state_receiver_thread = Thread(target=Tello.udp_state_receiver)
-            state_receiver_thread.daemon = True
-            state_receiver_thread.start()
-
-            threads_initialized = True
-
-        drones[host] = {'responses': [], 'state': {}}
+        # Sockets are bound and receivers started on the first command, see start_network
+        self.state_udp_port = state_udp
+        network.acquire(host, Tello.create_drone_entry)
+        self.network_acquired = True
 
         self.logger.info("Tello instance was initialized. Host: '{}'. Port: '{}'.".format(host, Tello.CONTROL_UDP_PORT))
 
         self.video_streaming_udp_port = video_stream_udp
 
+    @staticmethod
+    def create_drone_entry() -> dict:
+        """Create the entry of a drone in the global drones dict.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        history = TelemetryHistory()
+        return {
+            'responses': deque(),
+            'response_condition': Condition(),
+            'outstanding': deque(),
+            'command_lock': RLock(),
+            'generation': 0,  # incremented by priority commands to cancel pending ones
+            'priority_until': 0.0,  # commands are not sent before the replies to a priority command are in
+            'state': {},
+            'history': history,
+            'pose': PoseEstimator(history),
+            'link': LinkHealth(),
+            'mission_pads': MissionPadTracker(),
+        }
+
+    def start_network(self):
+        """Bind the control socket and this drone's state port and start their
+        receivers, unless that was already done.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        if not network.started:
+            network.start(Tello.handle_response, Tello.handle_state_packet)
+        if self.state_udp_port not in network.state_sockets:
+            network.open_state_port(self.state_udp_port)
+
     def change_vs_udp(self, udp_port):
-        """Change the UDP Port for sending video feed from the drone.
+        """Change the UDP Port for sending video feed from the drone. Give every
+        drone its own port to stream the video of several drones at once.
         """
-        self.video_streaming_udp_port = udp_port
-        self.send_control_command(f'port 8890 {self.video_streaming_udp_port}')
+        self.set_network_ports(self.state_udp_port, udp_port)
 
     def get_own_udp_object(self):
-        """Get own object from the global drones dict. This object is filled
-        with responses and state information by the receiver threads.
+        """Get own object from the routing table of the network. This object is
+        filled with responses and state information by the receiver threads.
         Internal method, you normally wouldn't call this yourself.
         """
-        global drones
-
         host = self.address[0]
-        return drones[host]
+        drone = network.drones.get(host)
+        if drone is None:
+            # The entry was dropped by end() of another instance of the same drone
+            drone = network.register(host, Tello.create_drone_entry)
+        return drone
 
     @staticmethod
-    def udp_response_receiver():
-        """Setup drone UDP receiver. This method listens for responses of Tello.
-        Must be run from a background thread in order to not block the main thread.
+    def handle_response(host: str, drone: dict, data: bytes):
+        """Queue a command response received by the network for the waiting command.
         Internal method, you normally wouldn't call this yourself.
         """
-        while True:
-            try:
-                data, address = client_socket.recvfrom(1024)
-
-                address = address[0]
-                Tello.logger.debug('Data received from {} at client_socket'.format(address))
-
-                if address not in drones:
-                    continue
-
-                drones[address]['responses'].append(data)
-
-            except Exception as e:
-                Tello.logger.error(e)
-                break
+        Tello.logger.debug('Response received from {}'.format(host))
+        with drone['response_condition']:
+            drone['responses'].append(data)
+            drone['response_condition'].notify_all()
 
     @staticmethod
-    def udp_state_receiver():
-        """Setup state UDP receiver. This method listens for state information from
-        Tello. Must be run from a background thread in order to not block
-        the main thread.
+    def handle_state_packet(host: str, drone: dict, data: bytes):
+        """Parse a state packet received by the network and store it in the drone's entry.
         Internal method, you normally wouldn't call this yourself.
         """
-        state_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        state_socket.bind(("", Tello.STATE_UDP_PORT))
-
-        while True:
-            try:
-                data, address = state_socket.recvfrom(1024)
-
-                address = address[0]
-                Tello.logger.debug('Data received from {} at state_socket'.format(address))
-
-                if address not in drones:
-                    continue
-
-                data = data.decode('ASCII')
-                data = Tello.parse_state(data)
-                data['received_at'] = datetime.now()
-                drones[address]['state'] = data
-
-            except Exception as e:
-                Tello.logger.error(e)
-                break
+        Tello.logger.debug('State received from {}'.format(host))
+        state_packets.inc(host=host)
+        state = Tello.parse_state(data.decode('ASCII'))
+        state['received_at'] = datetime.now()
+        drone['state'] = state
+        drone['history'].append(state)
+        drone['link'].record_state()
+        drone['mission_pads'].update(state)
+
+        geofence = geofences.get(host)
+        if geofence is not None:
+            # Keeps the pose current, so checking a command does not need to integrate anything
+            drone['pose'].update()
+            geofence.watch(drone['pose'].position, state.get('bat'))
 
     @staticmethod
     def parse_state(state: str) -> Dict[str, Union[int, float, str]]:
@@ -218,12 +324,103 @@ class Tello:
                     Tello.logger.debug('Error parsing state value for {}: {} to {}'
                                        .format(key, value, num_type))
                     Tello.logger.error(e)
+                    state_parse_errors.inc(field=key)
                     continue
 
             state_dict[key] = value
 
         return state_dict
 
+    @staticmethod
+    def command_verb(command: str) -> str:
+        """Get the first word of a command, used to label command metrics.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        return command.split(' ', 1)[0]
+
+    @staticmethod
+    def command_class(command: str) -> str:
+        """Classify a command as query, control or motion command.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        if command.endswith('?'):
+            return Tello.COMMAND_CLASS_QUERY
+        if Tello.command_verb(command) in Tello.MOTION_COMMANDS:
+            return Tello.COMMAND_CLASS_MOTION
+        return Tello.COMMAND_CLASS_CONTROL
+
+    @staticmethod
+    def is_timeout_response(response: str) -> bool:
+        """Check whether send_command_with_return gave up waiting for a response.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        return response.startswith(Tello.TIMEOUT_RESPONSE_PREFIX)
+
+    def get_rtt_estimator(self, command_class: str) -> RttEstimator:
+        """Get the round trip time estimator of this drone for a command class.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        estimators = rtt_estimators.setdefault(self.address[0], {})
+        if command_class not in estimators:
+            estimators[command_class] = RttEstimator(initial_timeout=self.INITIAL_RESPONSE_TIMEOUT,
+                                                     min_timeout=self.MIN_RESPONSE_TIMEOUT,
+                                                     max_timeout=self.RESPONSE_TIMEOUT)
+        return estimators[command_class]
+
+    def get_command_timeout(self, command: str) -> float:
+        """Get the response timeout for a command. Motion commands always get
+        RESPONSE_TIMEOUT, other commands a timeout derived from the measured round trip time.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        command_class = Tello.command_class(command)
+        if command_class == self.COMMAND_CLASS_MOTION:
+            return self.RESPONSE_TIMEOUT
+
+        timeout = self.get_rtt_estimator(command_class).timeout
+        command_timeout_seconds.set(timeout, host=self.address[0], command_class=command_class)
+        return timeout
+
+    def get_rtt_stats(self) -> dict:
+        """Get the smoothed round trip time, its variation and the current timeout
+        per command class of this drone.
+        Returns:
+            dict
+        """
+        estimators = rtt_estimators.get(self.address[0], {})
+        return {command_class: estimator.to_dict() for command_class, estimator in estimators.items()}
+
+    def get_link_health(self, now=None) -> dict:
+        """Get the link quality of this drone: status, score, state packet loss,
+        jitter and the smoothed round trip time of control commands.
+        Returns:
+            dict
+        """
+        estimator = rtt_estimators.get(self.address[0], {}).get(self.COMMAND_CLASS_CONTROL)
+        rtt = estimator.srtt if estimator is not None else None
+        return self.get_own_udp_object()['link'].to_dict(rtt, now)
+
+    def start_health_monitor(self, check_interval: float = 0.1, keepalive_idle: float = 5.0) -> HealthMonitor:
+        """Watch the link of this drone in the background and keep it from landing
+        when idle, see HealthMonitor. Does nothing when a monitor is already running.
+        Returns:
+            HealthMonitor
+        """
+        host = self.address[0]
+        monitor = health_monitors.get(host)
+        if monitor is None or not monitor.running:
+            monitor = HealthMonitor(self, check_interval=check_interval, keepalive_idle=keepalive_idle)
+            health_monitors[host] = monitor
+            monitor.start()
+        return monitor
+
+    def stop_health_monitor(self):
+        """Stop watching the link of this drone, keepalives are not sent anymore.
+        Does nothing when no monitor is running.
+        """
+        monitor = health_monitors.pop(self.address[0], None)
+        if monitor is not None:
+            monitor.stop()
+
     def get_current_state(self) -> dict:
         """Call this function to attain the state of the Tello. Returns a dict
         with all fields.
@@ -242,6 +439,104 @@ class Tello:
         else:
             raise TelloException('Could not get state property: {}'.format(key))
 
+    def get_cached_state_fields(self, keys: tuple, max_age=None) -> Optional[dict]:
+        """Get state fields if the last state packet is fresh enough to answer a query.
+        Internal method, you normally wouldn't call this yourself.
+        Arguments:
+            keys: state fields the query needs
+            max_age: maximum age in seconds, defaults to the smallest QUERY_CACHE_TTLS entry of the keys
+        Returns:
+            dict with the requested fields, None if they have to be queried via UDP
+        """
+        host = self.address[0]
+        if max_age is None:
+            max_age = min(self.QUERY_CACHE_TTLS.get(key, 0) for key in keys)
+
+        state = self.get_current_state()
+        received_at = state.get('received_at')
+        fresh = (self.QUERY_CACHE_ENABLED and received_at is not None
+                 and (datetime.now() - received_at).total_seconds() <= max_age
+                 and all(key in state for key in keys))
+
+        result = 'hit' if fresh else 'miss'
+        for key in keys:
+            query_cache_lookups.inc(host=host, field=key, result=result)
+
+        return {key: state[key] for key in keys} if fresh else None
+
+    def get_query_cache_stats(self) -> dict:
+        """Get the number of query_* calls answered from the state stream (hits)
+        and via a UDP round trip (misses), per state field.
+        Returns:
+            {field: {'hit': int, 'miss': int}}
+        """
+        stats = {}
+        for labels, value in query_cache_lookups.samples():
+            if labels['host'] == self.address[0]:
+                stats.setdefault(labels['field'], {'hit': 0, 'miss': 0})[labels['result']] = value
+        return stats
+
+    def get_telemetry_history(self) -> TelemetryHistory:
+        """Get the history of the numeric state fields of this drone.
+        Returns:
+            TelemetryHistory
+        """
+        return self.get_own_udp_object()['history']
+
+    def get_derived_state(self) -> dict:
+        """Get metrics derived from the recent state packets: speed and acceleration
+        magnitudes, moving averages, filtered height, battery drain rate (%/min) and
+        estimated time until the battery is empty (s).
+        Returns:
+            dict
+        """
+        return self.get_telemetry_history().derived()
+
+    def wait_until_stable(self, timeout=5.0, window=0.5, max_speed=1.0, max_attitude_rate=5.0) -> bool:
+        """Wait until the state packets show the drone holding still, e.g. after a
+        move and before taking a picture. Returns as soon as the speeds and the
+        attitude changes stayed below the thresholds for `window` seconds.
+        Arguments:
+            timeout: maximum number of seconds to wait
+            window: seconds the drone must have been still
+            max_speed: maximum speed on every axis combined, in the unit of the state packets
+            max_attitude_rate: maximum pitch, roll and yaw change in degrees per second
+        Returns:
+            bool: False when the drone was not stable before the timeout
+        """
+        history = self.get_telemetry_history()
+        deadline = time.time() + timeout
+        while True:
+            version = history.version
+            if is_stable(history.to_array(), window, max_speed, max_attitude_rate, now=time.time()):
+                return True
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            history.wait_for_sample(version, remaining)
+
+    def get_pose_estimator(self) -> PoseEstimator:
+        """Get the dead reckoning position estimator of this drone.
+        Returns:
+            PoseEstimator
+        """
+        return self.get_own_udp_object()['pose']
+
+    def get_pose(self) -> dict:
+        """Get the position (x forward, y left, z up in cm) and heading of the drone
+        relative to where the estimate started, dead reckoned from the state packets
+        and fixed on mission pads when they are detected.
+        Returns:
+            dict
+        """
+        return self.get_pose_estimator().get_pose()
+
+    def reset_pose(self):
+        """Restart the position estimate here, with the current heading as x axis
+        """
+        self.get_pose_estimator().reset()
+
     def get_last_state_update(self) -> datetime:
         """Get the datetime of when the last state packet was received.
         You may use this function to check the age of values returned by all other get_* functions.
@@ -282,6 +577,25 @@ class Tello:
         """
         return self.get_state_field('z')
 
+    def get_mission_pad_tracker(self) -> MissionPadTracker:
+        """Get the debounced mission pad state of this drone. Use its add_listener
+        to be notified when a pad is detected, lost or the position to it changes.
+        Only available on Tello EDUs after calling enable_mission_pads
+        Returns:
+            MissionPadTracker
+        """
+        return self.get_own_udp_object()['mission_pads']
+
+    def wait_for_mission_pad(self, pad_id=None, timeout=None):
+        """Block until a mission pad is detected instead of polling get_mission_pad_id.
+        Arguments:
+            pad_id: wait for this pad, None for any pad
+            timeout: seconds to wait, None waits forever
+        Returns:
+            int: the detected pad id, None on timeout
+        """
+        return self.get_mission_pad_tracker().wait_for_pad(pad_id, timeout)
+
     def get_pitch(self) -> int:
         """Get pitch in degree
         Returns:
@@ -412,57 +726,345 @@ class Tello:
         address = address_schema.format(ip=self.VIDEO_STREAM_UDP_IP, port=self.video_streaming_udp_port)
         return address
 
-    def get_frame_read(self, with_queue=False, max_queue_len=32) -> 'BackgroundFrameRead':
+    def get_frame_read(self, with_queue=False, max_queue_len=32, on_demand=False, target_fps=None,
+                       resolution=None, keyframes_only=False, decoder_threads=0,
+                       pipelined=False) -> 'BackgroundFrameRead':
         """Get the BackgroundFrameRead object from the camera drone. Then, you just need to call
         backgroundFrameRead.frame to get the actual frame received by the drone.
+        Arguments:
+            with_queue: keep every converted frame in a queue instead of only the latest one
+            max_queue_len: maximum number of frames kept for queue readers and subscribers
+            on_demand: only convert the latest frame to RGB when `frame` is read
+            target_fps: maximum number of frames per second that are kept, None keeps all
+            resolution: (width, height) tuple to downscale frames to while converting
+            keyframes_only: only decode keyframes, drastically lowers the CPU usage and the frame rate
+            decoder_threads: number of FFmpeg decoder threads, 0 keeps single threaded decoding
+            pipelined: run demuxing, decoding and colour conversion in separate threads
         Returns:
             BackgroundFrameRead
         """
         if self.background_frame_read is None:
             address = self.get_udp_video_address()
-            self.background_frame_read = BackgroundFrameRead(self, address, with_queue, max_queue_len)
+            self.background_frame_read = BackgroundFrameRead(self, address, with_queue, max_queue_len,
+                                                             on_demand=on_demand,
+                                                             target_fps=target_fps,
+                                                             resolution=resolution,
+                                                             keyframes_only=keyframes_only,
+                                                             decoder_threads=decoder_threads,
+                                                             pipelined=pipelined)
             self.background_frame_read.start()
         return self.background_frame_read
 
-    def send_command_with_return(self, command: str, timeout: int = RESPONSE_TIMEOUT) -> str:
+    def start_vision_pipeline(self, stages: List[VisionStage], workers: int = 2, use_processes: bool = False,
+                              share_frames: bool = True) -> VisionPipeline:
+        """Run computer vision stages on the video of this drone, see VisionPipeline.
+        Starts the video frame reader if needed and replaces a running pipeline.
+        Returns:
+            VisionPipeline
+        """
+        self.stop_vision_pipeline()
+        pipeline = VisionPipeline(self.get_frame_read(), stages, workers=workers, use_processes=use_processes,
+                                  share_frames=share_frames)
+        vision_pipelines[self.address[0]] = pipeline
+        pipeline.start()
+        return pipeline
+
+    def stop_vision_pipeline(self):
+        """Stop the vision pipeline of this drone and drop its results. The video
+        frame reader keeps running. Does nothing when no pipeline is running.
+        """
+        pipeline = vision_pipelines.pop(self.address[0], None)
+        if pipeline is not None:
+            pipeline.stop()
+
+    def set_geofence(self, envelope: SafetyEnvelope, action: str = 'stop') -> Geofence:
+        """Keep this drone inside a safety envelope: motion commands that would leave it
+        raise GeofenceViolation instead of being sent, rc sticks that would leave it are
+        ignored, and the drone is sent `action` (stop or land) when it is found outside.
+        The envelope is in the frame of get_pose, relative to the takeoff point.
+        Returns:
+            Geofence
+        """
+        geofence = Geofence(self, envelope, action)
+        geofences[self.address[0]] = geofence
+        return geofence
+
+    def clear_geofence(self):
+        """Stop checking the commands and state of this drone against its safety envelope.
+        """
+        geofences.pop(self.address[0], None)
+
+    def get_geofence(self) -> Optional[Geofence]:
+        """Get the geofence set with set_geofence
+        Returns:
+            Geofence: None when this drone has none
+        """
+        return geofences.get(self.address[0])
+
+    def check_geofence(self, command: str):
+        """Raise GeofenceViolation when a motion command would leave the safety envelope.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        geofence = geofences.get(self.address[0])
+        if geofence is None:
+            return
+
+        drone = self.get_own_udp_object()
+        pose = drone['pose']
+        reason = geofence.check_command(command, pose.position, pose.heading, drone['state'].get('bat'))
+        if reason is not None:
+            self.logger.warning("Command '{}' rejected by the geofence: {}".format(command, reason))
+            raise GeofenceViolation("Command '{}' rejected by the geofence: {}".format(command, reason))
+
+    def get_vision_results(self, max_age=None) -> dict:
+        """Get the results of the vision stages for the latest processed frame by stage name
+        Returns:
+            dict: empty without a vision pipeline
+        """
+        pipeline = vision_pipelines.get(self.address[0])
+        return pipeline.get_results(max_age) if pipeline is not None else {}
+
+    def send_command_with_return(self, command: str, timeout=None, first_attempt: bool = True) -> str:
         """Send command to Tello and wait for its response.
         Internal method, you normally wouldn't call this yourself.
+        Arguments:
+            command: command to send
+            timeout: seconds to wait for the response, None picks one with get_command_timeout
+            first_attempt: False for retransmissions, their round trip time is not sampled
         Return:
             bool/str: str with response text on success, False when unsuccessfull.
         """
-        # Commands very consecutive makes the drone not respond to them.
-        # So wait at least self.TIME_BTW_COMMANDS seconds
-        diff = time.time() - self.last_received_command_timestamp
-        if diff < self.TIME_BTW_COMMANDS:
-            self.logger.debug('Waiting {} seconds to execute command: {}...'.format(diff, command))
-            time.sleep(diff)
+        command_class = Tello.command_class(command)
+        if command_class == self.COMMAND_CLASS_MOTION:
+            self.check_geofence(command)
+        adaptive = timeout is None and command_class != self.COMMAND_CLASS_MOTION
+        if timeout is None:
+            timeout = self.get_command_timeout(command)
 
-        self.logger.info("Send command: '{}'".format(command))
-        timestamp = time.time()
+        command_id = next(command_ids)
+        trace = tracing.current_trace()
+        trace_id = trace.trace_id if trace is not None else None
+        tracing.mark('command_enqueued', command=command, command_id=command_id)
 
-        client_socket.sendto(command.encode('utf-8'), self.address)
+        self.start_network()
+        drone = self.get_own_udp_object()
+        host = self.address[0]
+        verb = Tello.command_verb(command)
+        generation = drone['generation']
+
+        # Only one command per drone may wait for a response at a time, otherwise
+        # there is no way to tell which response belongs to which command
+        with drone['command_lock']:
+            self.expire_outstanding_commands(drone)
+
+            # Commands very consecutive makes the drone not respond to them.
+            # So wait at least self.TIME_BTW_COMMANDS seconds
+            diff = time.time() - self.last_received_command_timestamp
+            if diff < self.TIME_BTW_COMMANDS:
+                self.logger.debug('Waiting {} seconds to execute command: {}...'.format(diff, command))
+                time.sleep(diff)
+            # The 'ok' to a priority command or one of its copies must not be taken for this command's response
+            hold = drone['priority_until'] - time.time()
+            if hold > 0:
+                time.sleep(hold)
+            tracing.mark('command_paced', command_id=command_id)
+            if drone['generation'] != generation:
+                self.raise_cancelled(command)
+            # Whatever arrived before this command was sent can't be its response
+            self.discard_stale_responses(drone)
+
+            self.logger.info("Send command: '{}' (id: {}, trace: {})".format(command, command_id, trace_id))
+            timestamp = time.time()
+
+            network.send(command.encode('utf-8'), self.address)
+            drone['link'].record_command(timestamp)
+            tracing.mark('command_sent', command_id=command_id)
+
+            outstanding = {'id': command_id, 'command': command, 'sent_at': timestamp, 'abandoned_at': None}
+            drone['outstanding'].append(outstanding)
+
+            try:
+                response = self.wait_for_response(drone, command, timestamp + timeout, generation)
+            except CommandCancelled:
+                outstanding['abandoned_at'] = time.time()
+                raise
 
-        responses = self.get_own_udp_object()['responses']
+            if response is None:
+                # Keep the command around, a late response to it must not be taken for the next command's one
+                outstanding['abandoned_at'] = time.time()
 
-        while not responses:
-            if time.time() - timestamp > timeout:
-                message = "Aborting command '{}'. Did not receive a response after {} seconds".format(command, timeout)
+                message = "{} '{}'. Did not receive a response after {:.2f} seconds".format(
+                    self.TIMEOUT_RESPONSE_PREFIX, command, timeout)
                 self.logger.warning(message)
+                command_timeouts.inc(host=host, verb=verb)
+                if adaptive:
+                    self.get_rtt_estimator(command_class).backoff()
+                tracing.mark('command_timeout', command_id=command_id)
                 return message
-            time.sleep(0.1)  # Sleep during send command
+
+            drone['outstanding'].remove(outstanding)
 
         self.last_received_command_timestamp = time.time()
+        rtt = self.last_received_command_timestamp - timestamp
+        command_duration_seconds.observe(rtt, host=host, verb=verb)
+        if first_attempt and command_class != self.COMMAND_CLASS_MOTION:
+            self.get_rtt_estimator(command_class).observe(rtt)
+        tracing.mark('reply_received', command_id=command_id)
 
-        first_response = responses.pop(0)  # first datum from socket
+        self.logger.info("Response {}: '{}'".format(command, response))
+        return response
+
+    def wait_for_response(self, drone: dict, command: str, deadline: float, generation=None):
+        """Wait until a plausible response to command arrives or the deadline passes.
+        Responses that can't belong to command are attributed to abandoned commands.
+        Internal method, you normally wouldn't call this yourself.
+        Returns:
+            str: the response, None on timeout
+        Raises:
+            CommandCancelled: a priority command was sent in the meantime
+        """
+        condition = drone['response_condition']
+        with condition:
+            while True:
+                if generation is not None and drone['generation'] != generation:
+                    self.raise_cancelled(command)
+                while drone['responses']:
+                    response = self.decode_response(drone['responses'].popleft())
+                    if Tello.is_plausible_response(command, response):
+                        return response
+                    self.attribute_late_response(drone, response)
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                condition.wait(remaining)
+
+    def decode_response(self, data: bytes) -> str:
+        """Internal method, you normally wouldn't call this yourself.
+        """
         try:
-            response = first_response.decode("utf-8")
+            return data.decode("utf-8").rstrip("\r\n")
         except UnicodeDecodeError as e:
             self.logger.error(e)
             return "response decode error"
-        response = response.rstrip("\r\n")
 
-        self.logger.info("Response {}: '{}'".format(command, response))
-        return response
+    @staticmethod
+    def is_plausible_response(command: str, response: str) -> bool:
+        """Check whether a response could have been sent for command. Queries are
+        never answered with 'ok', other commands never with a measurement.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        response = response.lower()
+        if 'error' in response:
+            return True
+        if Tello.command_class(command) == Tello.COMMAND_CLASS_QUERY:
+            return response != 'ok'
+        return Tello.QUERY_RESPONSE_PATTERN.search(response) is None
+
+    def attribute_late_response(self, drone: dict, response: str):
+        """Attribute a response that arrived too late to the oldest abandoned command.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        host = self.address[0]
+        abandoned = next((c for c in drone['outstanding'] if c['abandoned_at'] is not None), None)
+
+        if abandoned is None:
+            self.logger.warning("Discarding unsolicited response from {}: '{}'".format(host, response))
+            late_responses.inc(host=host, verb='unknown')
+            return
+
+        drone['outstanding'].remove(abandoned)
+        self.logger.warning("Discarding late response to command '{}' (id: {}) received {:.2f} seconds after "
+                            "it was sent: '{}'".format(abandoned['command'], abandoned['id'],
+                                                       time.time() - abandoned['sent_at'], response))
+        late_responses.inc(host=host, verb=Tello.command_verb(abandoned['command']))
+
+    def discard_stale_responses(self, drone: dict):
+        """Drop every response that is waiting before a new command is sent.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        with drone['response_condition']:
+            while drone['responses']:
+                self.attribute_late_response(drone, self.decode_response(drone['responses'].popleft()))
+
+    def expire_outstanding_commands(self, drone: dict):
+        """Forget abandoned commands whose response is not expected anymore.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        now = time.time()
+        for outstanding in list(drone['outstanding']):
+            abandoned_at = outstanding['abandoned_at']
+            if abandoned_at is not None and now - abandoned_at > self.LATE_RESPONSE_GRACE:
+                drone['outstanding'].remove(outstanding)
+                lost_responses.inc(host=self.address[0], verb=Tello.command_verb(outstanding['command']))
+
+    def get_outstanding_commands(self) -> list:
+        """Get the commands of this drone that are waiting for a response or were
+        abandoned after a timeout and might still be answered.
+        Returns:
+            list of dicts with the keys id, command, sent_at and abandoned_at
+        """
+        return [dict(outstanding) for outstanding in self.get_own_udp_object()['outstanding']]
+
+    def raise_cancelled(self, command: str):
+        """Internal method, you normally wouldn't call this yourself.
+        """
+        cancelled_commands.inc(host=self.address[0], verb=Tello.command_verb(command))
+        self.logger.warning("Command '{}' cancelled by a priority command".format(command))
+        raise CommandCancelled("Command '{}' cancelled by a priority command".format(command))
+
+    def send_priority_command(self, command: str, repeat=None):
+        """Send emergency, stop or land right away. Skips the pacing between
+        commands, does not wait for the command lock or a response, and sends
+        `repeat` copies in case one is lost. Every command of this drone that is
+        waiting to be sent or for its response raises CommandCancelled.
+        Arguments:
+            command: emergency, stop or land
+            repeat: number of copies, PRIORITY_REPEAT by default
+        """
+        if command not in self.PRIORITY_COMMANDS:
+            raise TelloException("'{}' is not a priority command".format(command))
+        repeat = self.PRIORITY_REPEAT if repeat is None else repeat
+
+        self.start_network()
+        drone = self.get_own_udp_object()
+        data = command.encode('utf-8')
+
+        def send():
+            # Every copy is answered, track it as abandoned so that its reply is attributed to it
+            sent_at = time.time()
+            with drone['response_condition']:
+                drone['outstanding'].append({'id': next(command_ids), 'command': command, 'sent_at': sent_at,
+                                             'abandoned_at': sent_at})
+            network.send(data, self.address)
+
+        # Cancel the pending commands first, none of them may be sent after this one
+        drone['generation'] += 1
+        drone['priority_until'] = time.time() + (repeat - 1) * self.PRIORITY_REPEAT_INTERVAL + \
+            self.PRIORITY_REPLY_GRACE
+        send()
+        self.last_received_command_timestamp = time.time()
+        tracing.mark('priority_command_sent', command=command)
+        self.logger.warning("Sent priority command: '{}'".format(command))
+
+        # Wake up the command waiting for its response
+        with drone['response_condition']:
+            drone['response_condition'].notify_all()
+        drone['link'].record_command()
+        priority_commands.inc(host=self.address[0], verb=command)
+        if command != 'stop':
+            self.is_flying = False
+
+        def send_copies():
+            for _ in range(repeat - 1):
+                time.sleep(self.PRIORITY_REPEAT_INTERVAL)
+                try:
+                    send()
+                except Exception:
+                    self.logger.error("Sending a copy of priority command '{}' failed".format(command), exc_info=True)
+
+        if repeat > 1:
+            Thread(target=send_copies, daemon=True, name="tello-priority-{}".format(command)).start()
 
     def send_command_without_return(self, command: str):
         """Send command to Tello without expecting a response.
@@ -471,37 +1073,51 @@ class Tello:
         # Commands very consecutive makes the drone not respond to them. So wait at least self.TIME_BTW_COMMANDS seconds
 
         self.logger.info("Send command (no response expected): '{}'".format(command))
-        client_socket.sendto(command.encode('utf-8'), self.address)
+        self.start_network()
+        network.send(command.encode('utf-8'), self.address)
+        self.get_own_udp_object()['link'].record_command()
 
-    def send_control_command(self, command: str, timeout: int = RESPONSE_TIMEOUT) -> bool:
+    def send_control_command(self, command: str, timeout=None) -> bool:
         """Send control command to Tello and wait for its response.
         Internal method, you normally wouldn't call this yourself.
 
         Parameters:
             command(str): Control command to send to Tello
-            timeout(int): Amount out time before response timeout
+            timeout(int/float): Amount out time before response timeout, by default
+                derived from the measured round trip time (see get_command_timeout)
 
         Returns:
             bool: True if command is executed successfully otherwise false
         """
         response = "max retries exceeded"
         for i in range(0, self.retry_count):
-            response = self.send_command_with_return(command, timeout=timeout)
+            response = self.send_command_with_return(command, timeout=timeout, first_attempt=i == 0)
 
             if 'ok' in response.lower():
                 return True
 
             self.logger.debug("Command attempt #{} failed for command: '{}'".format(i, command))
+            if i + 1 < self.retry_count:
+                command_retries.inc(host=self.address[0], verb=Tello.command_verb(command))
 
         self.raise_result_error(command, response)
         return False  # never reached
 
     def send_read_command(self, command: str) -> str:
         """Send given command to Tello and wait for its response.
+        Queries are idempotent, so they are retransmitted as soon as their
+        adaptive timeout expires.
         Internal method, you normally wouldn't call this yourself.
         """
+        response = "max retries exceeded"
+        for i in range(0, self.retry_count):
+            response = self.send_command_with_return(command, first_attempt=i == 0)
+            if not Tello.is_timeout_response(response):
+                break
 
-        response = self.send_command_with_return(command)
+            self.logger.debug("Query attempt #{} timed out for command: '{}'".format(i, command))
+            if i + 1 < self.retry_count:
+                command_retries.inc(host=self.address[0], verb=Tello.command_verb(command))
 
         try:
             response = str(response)
@@ -584,6 +1200,7 @@ class Tello:
         """
         # Something it takes a looooot of time to take off and return a succesful takeoff.
         # So we better wait. Otherwise, it would give us an error on the following calls.
+        self.reset_pose()
         self.send_control_command("takeoff", timeout=Tello.TAKEOFF_TIMEOUT)
         self.is_flying = True
 
@@ -622,8 +1239,7 @@ class Tello:
     def emergency(self):
         """Stop all motors immediately.
         """
-        self.send_command_without_return("emergency")
-        self.is_flying = False
+        self.send_priority_command("emergency")
 
     def move(self, direction: str, x: int):
         """Tello fly up, down, left, right, forward or back with distance x cm.
@@ -731,9 +1347,9 @@ class Tello:
         self.send_control_command(cmd)
 
     def stop(self):
-        """Hovers in the air. Works at any time.
+        """Hovers in the air. Works at any time, cancels the pending commands.
         """
-        self.send_control_command("stop")
+        self.send_priority_command("stop")
 
     def curve_xyz_speed(self, x1: int, y1: int, z1: int, x2: int, y2: int, z2: int, speed: int):
         """Fly to x2 y2 z2 in a curve via x1 y1 z1. Speed defines the traveling speed in cm/s.
@@ -846,6 +1462,12 @@ class Tello:
 
         if time.time() - self.last_rc_control_timestamp > self.TIME_BTW_RC_CONTROL_COMMANDS:
             self.last_rc_control_timestamp = time.time()
+            geofence = geofences.get(self.address[0])
+            if geofence is not None:
+                pose = self.get_own_udp_object()['pose']
+                left_right_velocity, forward_backward_velocity, up_down_velocity, yaw_velocity = geofence.filter_rc(
+                    pose.position, pose.heading, left_right_velocity, forward_backward_velocity, up_down_velocity,
+                    yaw_velocity)
             cmd = 'rc {} {} {} {}'.format(
                 clamp100(left_right_velocity),
                 clamp100(forward_backward_velocity),
@@ -870,11 +1492,14 @@ class Tello:
 
     def set_network_ports(self, state_packet_port: int, video_stream_port: int):
         """Sets the ports for state packets and video streaming
-        While you can use this command to reconfigure the Tello this library currently does not support
-        non-default ports (TODO!)
+        State packets are received on the new port as well, so several drones can
+        use different ports. Call this before `get_frame_read` to use the new video port.
         """
+        network.open_state_port(state_packet_port)
         cmd = 'port {} {}'.format(state_packet_port, video_stream_port)
         self.send_control_command(cmd)
+        self.state_udp_port = state_packet_port
+        self.video_streaming_udp_port = video_stream_port
 
     def reboot(self):
         """Reboots the drone
@@ -938,28 +1563,40 @@ class Tello:
         """
         return self.send_read_command_int('speed?')
 
-    def query_battery(self) -> int:
+    def query_battery(self, max_age=None) -> int:
         """Get current battery percentage via a query command
-        Using get_battery is usually faster
+        Answered from the state stream when it is younger than max_age seconds
+        (QUERY_CACHE_TTLS by default), pass max_age=0 to force the query.
         Returns:
             int: 0-100 in %
         """
+        cached = self.get_cached_state_fields(('bat',), max_age)
+        if cached is not None:
+            return cached['bat']
         return self.send_read_command_int('battery?')
 
-    def query_flight_time(self) -> int:
+    def query_flight_time(self, max_age=None) -> int:
         """Query current fly time (s).
-        Using get_flight_time is usually faster.
+        Answered from the state stream when it is younger than max_age seconds
+        (QUERY_CACHE_TTLS by default), pass max_age=0 to force the query.
         Returns:
             int: Seconds elapsed during flight.
         """
+        cached = self.get_cached_state_fields(('time',), max_age)
+        if cached is not None:
+            return cached['time']
         return self.send_read_command_int('time?')
 
-    def query_height(self) -> int:
+    def query_height(self, max_age=None) -> int:
         """Get height in cm via a query command.
-        Using get_height is usually faster
+        Answered from the state stream when it is younger than max_age seconds
+        (QUERY_CACHE_TTLS by default), pass max_age=0 to force the query.
         Returns:
             int: 0-3000
         """
+        cached = self.get_cached_state_fields(('h',), max_age)
+        if cached is not None:
+            return cached['h']
         return self.send_read_command_int('height?')
 
     def query_temperature(self) -> int:
@@ -970,30 +1607,42 @@ class Tello:
         """
         return self.send_read_command_int('temp?')
 
-    def query_attitude(self) -> dict:
+    def query_attitude(self, max_age=None) -> dict:
         """Query IMU attitude data.
-        Using get_pitch, get_roll and get_yaw is usually faster.
+        Answered from the state stream when it is younger than max_age seconds
+        (QUERY_CACHE_TTLS by default), pass max_age=0 to force the query.
         Returns:
             {'pitch': int, 'roll': int, 'yaw': int}
         """
+        cached = self.get_cached_state_fields(('pitch', 'roll', 'yaw'), max_age)
+        if cached is not None:
+            return cached
         response = self.send_read_command('attitude?')
         return Tello.parse_state(response)
 
-    def query_barometer(self) -> int:
+    def query_barometer(self, max_age=None) -> int:
         """Get barometer value (cm)
-        Using get_barometer is usually faster.
+        Answered from the state stream when it is younger than max_age seconds
+        (QUERY_CACHE_TTLS by default), pass max_age=0 to force the query.
         Returns:
             int: 0-100
         """
+        cached = self.get_cached_state_fields(('baro',), max_age)
+        if cached is not None:
+            return cached['baro'] * 100
         baro = self.send_read_command_int('baro?')
         return baro * 100
 
-    def query_distance_tof(self) -> float:
+    def query_distance_tof(self, max_age=None) -> float:
         """Get distance value from TOF (cm)
-        Using get_distance_tof is usually faster.
+        Answered from the state stream when it is younger than max_age seconds
+        (QUERY_CACHE_TTLS by default), pass max_age=0 to force the query.
         Returns:
             float: 30-1000
         """
+        cached = self.get_cached_state_fields(('tof',), max_age)
+        if cached is not None:
+            return float(cached['tof'])
         # example response: 801mm
         tof = self.send_read_command('tof?')
         return int(tof[:-2]) / 10
@@ -1027,7 +1676,8 @@ class Tello:
         return self.send_read_command('active?')
 
     def end(self):
-        """Call this method when you want to end the tello object
+        """Call this method when you want to end the tello object. The drone's
+        state is forgotten once no other instance for the same drone is left.
         """
         try:
             if self.is_flying:
@@ -1037,30 +1687,78 @@ class Tello:
         except TelloException:
             pass
 
+        self.release(unregister=True)
+
+    def release(self, unregister: bool = True):
+        """Stop this instance's frame reader and give up its use of the drone's shared entry.
+        Internal method, you normally wouldn't call this yourself.
+        """
         if self.background_frame_read is not None:
             self.background_frame_read.stop()
             self.background_frame_read = None
 
-        host = self.address[0]
-        if host in drones:
-            del drones[host]
+        if getattr(self, 'network_acquired', False):
+            self.network_acquired = False
+            network.release(self.address[0], unregister)
 
     def __del__(self):
-        self.end()
+        # The routes create an instance per request. Collecting one must neither land the
+        # drone nor drop the pose, history and pending commands shared with the others.
+        self.release(unregister=False)
 
 
 class BackgroundFrameRead:
     """
     This class read frames using PyAV in background. Use
-    backgroundFrameRead.frame to get the current frame.
+    backgroundFrameRead.frame to get the current frame, or
+    backgroundFrameRead.subscribe() to read every frame from several consumers at once.
+
+    When `on_demand` is set, the stream keeps being demuxed and decoded but, as long
+    as nobody subscribed, the RGB conversion of the latest frame only happens when `frame` is read.
+    `target_fps` skips the packets of frames arriving faster than the given rate
+    before they are decoded, and drops the decoded frames still over it before they
+    are converted. `resolution` downscales frames during conversion and
+    `keyframes_only` tells the decoder to skip every non-keyframe.
+
+    `decoder_threads` enables FFmpeg's threaded decoding. With `pipelined` set,
+    demuxing, decoding and colour conversion each run in their own thread and hand
+    packets and frames over through bounded queues. `get_stage_latency` reports
+    the average time spent in (and waiting in front of) every stage.
     """
+    PIPELINE_QUEUE_SIZE = 8
+    STAGE_LATENCY_SMOOTHING = 0.1
+    FPS_WINDOW = 60  # number of decoded frames the fps is computed over
+    STALL_TIMEOUT = 1.0  # in seconds
 
-    def __init__(self, tello, address, with_queue=False, maxsize=32):
+    # Readers that are still alive, by stream address
+    active_readers = weakref.WeakValueDictionary()
+
+    def __init__(self, tello, address, with_queue=False, maxsize=32, on_demand=False, target_fps=None,
+                 resolution=None, keyframes_only=False, decoder_threads=0, pipelined=False):
         self.address = address
         self.lock = Lock()
         self.frame = np.zeros([300, 400, 3], dtype=np.uint8)
-        self.frames = deque([], maxsize)
+        self.started_at = time.time()
+        self.last_decoded_at = None
+        self.last_published_at = None
+        self.decoded_timestamps = deque([], self.FPS_WINDOW)
+        self.broadcaster = FrameBroadcaster(maxsize, on_consume=self.record_frame_age)
         self.with_queue = with_queue
+        # Subscriber backing the single-consumer get_queued_frame API
+        self.queue_subscriber = self.broadcaster.subscribe() if with_queue else None
+
+        self.on_demand = on_demand
+        self.resolution = resolution
+        self.keyframes_only = keyframes_only
+        self.min_frame_interval = 1 / target_fps if target_fps else 0
+        self.last_frame_timestamp = 0.0
+        # A skipped non-keyframe breaks the references of the following ones until the next keyframe
+        self._skipping_to_keyframe = False
+        self._pending_frame = None
+
+        self.decoder_threads = decoder_threads
+        self.pipelined = pipelined
+        self.stage_latency = {}
 
         # Try grabbing frame with PyAV
         # According to issue #90 the decoder might need some time
@@ -1072,41 +1770,347 @@ class BackgroundFrameRead:
             raise TelloException('Failed to grab video frames from video stream')
 
         self.stopped = False
-        self.worker = Thread(target=self.update_frame, args=(), daemon=True)
+        if pipelined:
+            self.packet_queue = queue.Queue(self.PIPELINE_QUEUE_SIZE)
+            self.frame_queue = queue.Queue(self.PIPELINE_QUEUE_SIZE)
+            self.workers = [
+                Thread(target=self.demux_packets, args=(), daemon=True),
+                Thread(target=self.decode_packets, args=(), daemon=True),
+                Thread(target=self.convert_frames, args=(), daemon=True),
+            ]
+        else:
+            self.workers = [Thread(target=self.update_frame, args=(), daemon=True)]
+        self.worker = self.workers[0]
+        BackgroundFrameRead.active_readers[address] = self
 
     def start(self):
-        """Start the frame update worker
+        """Start the frame update workers
+        Internal method, you normally wouldn't call this yourself.
+        """
+        for worker in self.workers:
+            worker.start()
+
+    def subscribe(self, from_latest=True) -> FrameSubscriber:
+        """Subscribe to the decoded frames. Every subscriber sees every frame
+        (unless it falls more than `maxsize` frames behind) without copying it.
+        Call `close()` on the subscriber once you are done.
+        Arguments:
+            from_latest: start with the next frame instead of the oldest frame still buffered
+        Returns:
+            FrameSubscriber
+        """
+        return self.broadcaster.subscribe(from_latest)
+
+    def set_target_fps(self, target_fps):
+        """Change the maximum number of frames per second that are kept.
+        Arguments:
+            target_fps: frames per second, None or 0 keeps every decoded frame
+        """
+        self.min_frame_interval = 1 / target_fps if target_fps else 0
+
+    def convert_frame(self, frame):
+        """Convert a decoded PyAV frame to an RGB numpy array, downscaling it
+        to `resolution` if one was given.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        if self.resolution is None:
+            return frame.to_ndarray(format='rgb24')
+
+        width, height = self.resolution
+        return frame.to_ndarray(format='rgb24', width=width, height=height)
+
+    def accept_packet(self, packet) -> bool:
+        """Check whether a packet should be decoded according to `target_fps`, so that
+        frames over the budget cost no decoder time. Keyframes are always decoded, a
+        skipped non-keyframe skips the rest of its group of pictures.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        if packet.is_keyframe or not self.min_frame_interval:
+            self._skipping_to_keyframe = False
+            return True
+
+        if not self._skipping_to_keyframe and time.time() - self.last_frame_timestamp >= self.min_frame_interval:
+            return True
+
+        self._skipping_to_keyframe = True
+        video_frames_dropped.inc(stream=self.address, reason="fps_limit")
+        return False
+
+    def accept_frame(self) -> bool:
+        """Check whether the next decoded frame should be kept according to `target_fps`.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        if not self.min_frame_interval:
+            return True
+
+        now = time.time()
+        if now - self.last_frame_timestamp < self.min_frame_interval:
+            return False
+
+        self.last_frame_timestamp = now
+        return True
+
+    def record_stage_latency(self, stage: str, seconds: float):
+        """Update the smoothed latency of a pipeline stage.
         Internal method, you normally wouldn't call this yourself.
         """
-        self.worker.start()
+        video_stage_seconds.observe(seconds, stream=self.address, stage=stage)
+
+        previous = self.stage_latency.get(stage)
+        if previous is None:
+            self.stage_latency[stage] = seconds
+        else:
+            alpha = self.STAGE_LATENCY_SMOOTHING
+            self.stage_latency[stage] = previous + alpha * (seconds - previous)
+
+    def get_stage_latency(self) -> dict:
+        """Get the smoothed time spent per stage, in seconds.
+        `demux`, `decode` and `convert` are processing times, `decode_queue` and
+        `convert_queue` the time spent waiting in the hand-off queues (pipelined mode only).
+        """
+        return dict(self.stage_latency)
+
+    def record_frame_age(self, frame):
+        """Record how old a frame is when a consumer reads it.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        video_frame_age_seconds.observe(frame.age(), stream=self.address)
+
+    def get_decoded_fps(self) -> float:
+        """Get the number of frames decoded per second over the last FPS_WINDOW frames
+        """
+        timestamps = list(self.decoded_timestamps)
+        if len(timestamps) < 2 or timestamps[-1] == timestamps[0]:
+            return 0.0
+        return (len(timestamps) - 1) / (timestamps[-1] - timestamps[0])
+
+    def is_stalled(self, timeout=None) -> bool:
+        """Check whether no frame was decoded for `timeout` seconds (STALL_TIMEOUT by default)
+        """
+        timeout = self.STALL_TIMEOUT if timeout is None else timeout
+        last_activity = self.last_decoded_at or self.started_at
+        return time.time() - last_activity > timeout
+
+    def get_stats(self) -> dict:
+        """Get the health of the video stream: packet and frame counters, decoded fps,
+        stage latencies, queue depths and frame ages.
+        Returns:
+            dict
+        """
+        now = time.time()
+        subscribers = self.broadcaster.subscribers()
+        queue_depth = {"subscribers": max((s.pending() for s in subscribers), default=0)}
+        if self.pipelined:
+            queue_depth["packets"] = self.packet_queue.qsize()
+            queue_depth["frames"] = self.frame_queue.qsize()
+
+        frame_age = video_frame_age_seconds.get(stream=self.address)
+        dropped = {labels["reason"]: value for labels, value in video_frames_dropped.samples()
+                   if labels["stream"] == self.address}
+
+        return {
+            "stream": self.address,
+            "packets": video_packets.get(stream=self.address),
+            "frames_decoded": video_frames_decoded.get(stream=self.address),
+            "frames_published": video_frames_published.get(stream=self.address),
+            "frames_dropped": dropped,
+            "subscriber_frames_dropped": sum(s.dropped for s in subscribers),
+            "subscribers": len(subscribers),
+            "decoded_fps": self.get_decoded_fps(),
+            "stage_latency": self.get_stage_latency(),
+            "queue_depth": queue_depth,
+            "last_frame_age": now - self.last_published_at if self.last_published_at else None,
+            "frame_age": frame_age.to_dict() if frame_age else None,
+            "stalled": self.is_stalled(),
+        }
+
+    def open_video_stream(self):
+        """Get the video stream of the container and configure its decoder.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        stream = self.container.streams.video[0]
+        if self.keyframes_only:
+            stream.codec_context.skip_frame = 'NONKEY'
+        if self.decoder_threads:
+            stream.codec_context.thread_type = 'AUTO'
+            stream.codec_context.thread_count = self.decoder_threads
+        return stream
+
+    def handle_decoded_frame(self, frame):
+        """Drop, defer or convert and publish a decoded frame.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        if not self.accept_frame():
+            video_frames_dropped.inc(stream=self.address, reason="fps_limit")
+            return
+
+        if self.on_demand and not self.broadcaster.has_subscribers():
+            with self.lock:
+                self._pending_frame = frame
+            return
+
+        started = time.perf_counter()
+        image = self.convert_frame(frame)
+        self.record_stage_latency('convert', time.perf_counter() - started)
+        self.publish_frame(image)
+
+    def decode_packet(self, packet) -> list:
+        """Decode a single packet, timing the decoder.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        started = time.perf_counter()
+        frames = packet.decode()
+        self.record_stage_latency('decode', time.perf_counter() - started)
+
+        if frames:
+            self.last_decoded_at = time.time()
+            self.decoded_timestamps.append(self.last_decoded_at)
+            video_frames_decoded.inc(len(frames), stream=self.address)
+        return frames
 
     def update_frame(self):
         """Thread worker function to retrieve frames using PyAV
         Internal method, you normally wouldn't call this yourself.
         """
         try:
-            for frame in self.container.decode(video=0):
-                if self.with_queue:
-                    self.frames.append(np.array(frame.to_image()))
-                else:
-                    self.frame = np.array(frame.to_image())
-
-                if self.stopped:
-                    self.container.close()
+            stream = self.open_video_stream()
+            packets = self.container.demux(stream)
+
+            while not self.stopped:
+                started = time.perf_counter()
+                packet = next(packets, None)
+                if packet is None:
+                    break
+                self.record_stage_latency('demux', time.perf_counter() - started)
+                video_packets.inc(stream=self.address)
+                if not self.accept_packet(packet):
+                    continue
+
+                for frame in self.decode_packet(packet):
+                    self.handle_decoded_frame(frame)
+
+            self.container.close()
+        except av.error.ExitError:
+            raise TelloException(
+                'Do not have enough frames for decoding, please try again or increase video fps before get_frame_read()')
+        finally:
+            self.broadcaster.close()
+
+    def put_stage_item(self, stage_queue: queue.Queue, item, drop_oldest: bool):
+        """Hand an item over to the next pipeline stage. Packets block until there
+        is room (dropping them would corrupt the decoder), decoded frames
+        replace the oldest waiting frame instead.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        entry = (time.perf_counter(), item)
+        while not self.stopped:
+            try:
+                stage_queue.put(entry, timeout=0.1)
+                video_queue_depth.set(stage_queue.qsize(), stream=self.address, queue=self.queue_name(stage_queue))
+                return
+            except queue.Full:
+                if drop_oldest:
+                    try:
+                        stage_queue.get_nowait()
+                        video_frames_dropped.inc(stream=self.address, reason="pipeline_full")
+                    except queue.Empty:
+                        pass
+
+    def queue_name(self, stage_queue: queue.Queue) -> str:
+        """Internal method, you normally wouldn't call this yourself.
+        """
+        return "packets" if stage_queue is self.packet_queue else "frames"
+
+    def get_stage_item(self, stage_queue: queue.Queue, stage: str):
+        """Take the next item from a hand-off queue, None once the pipeline stopped.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        while not self.stopped:
+            try:
+                enqueued_at, item = stage_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            video_queue_depth.set(stage_queue.qsize(), stream=self.address, queue=self.queue_name(stage_queue))
+            if item is not None:
+                self.record_stage_latency(stage, time.perf_counter() - enqueued_at)
+            return item
+        return None
+
+    def demux_packets(self):
+        """Pipeline stage reading packets from the UDP stream.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        try:
+            stream = self.open_video_stream()
+            packets = self.container.demux(stream)
+
+            while not self.stopped:
+                started = time.perf_counter()
+                packet = next(packets, None)
+                if packet is None:
                     break
+                self.record_stage_latency('demux', time.perf_counter() - started)
+                video_packets.inc(stream=self.address)
+                if self.accept_packet(packet):
+                    self.put_stage_item(self.packet_queue, packet, drop_oldest=False)
+
+            self.container.close()
         except av.error.ExitError:
             raise TelloException(
                 'Do not have enough frames for decoding, please try again or increase video fps before get_frame_read()')
+        finally:
+            self.put_stage_item(self.packet_queue, None, drop_oldest=False)
+
+    def decode_packets(self):
+        """Pipeline stage decoding packets to frames.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        try:
+            while True:
+                packet = self.get_stage_item(self.packet_queue, 'decode_queue')
+                if packet is None:
+                    break
+
+                for frame in self.decode_packet(packet):
+                    self.put_stage_item(self.frame_queue, frame, drop_oldest=True)
+        finally:
+            self.put_stage_item(self.frame_queue, None, drop_oldest=False)
+
+    def convert_frames(self):
+        """Pipeline stage converting and publishing decoded frames.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        try:
+            while True:
+                frame = self.get_stage_item(self.frame_queue, 'convert_queue')
+                if frame is None:
+                    break
+
+                self.handle_decoded_frame(frame)
+        finally:
+            self.broadcaster.close()
+
+    def publish_frame(self, image):
+        """Make a converted frame the current frame and hand it to all subscribers.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        with self.lock:
+            self._frame = image
+            self._pending_frame = None
+        published = self.broadcaster.publish(image)
+        self.last_published_at = published.timestamp
+        video_frames_published.inc(stream=self.address)
 
     def get_queued_frame(self):
         """
         Get a frame from the queue
         """
-        with self.lock:
-            try:
-                return self.frames.popleft()
-            except IndexError:
-                return None
+        if self.queue_subscriber is None:
+            return None
+
+        queued = self.queue_subscriber.poll()
+        return queued.image if queued is not None else None
 
     @property
     def frame(self):
@@ -1117,6 +2121,16 @@ class BackgroundFrameRead:
             return self.get_queued_frame()
 
         with self.lock:
+            if self._pending_frame is not None:
+                # Convert the latest decoded frame only now that somebody asks for it
+                self._frame = self.convert_frame(self._pending_frame)
+                self._pending_frame = None
+                produced_at = self.last_decoded_at
+            else:
+                produced_at = self.last_published_at
+
+            if produced_at is not None:
+                video_frame_age_seconds.observe(time.time() - produced_at, stream=self.address)
             return self._frame
 
     @frame.setter
@@ -0,0 +1,156 @@
+"""Video of several drones at once.
+
+Every drone streams to its own UDP port and gets its own BackgroundFrameRead,
+so each stream is demuxed and decoded by its own workers. The frame rates of
+all streams share one budget: the focused drone gets a fixed share of it and
+the other drones split the rest.
+"""
+
+from threading import RLock
+from typing import Dict, Optional
+
+from .tello import BackgroundFrameRead, Tello, TelloException
+from ..utils.Logger import Logger
+
+
+class VideoManager:
+    """Allocates video ports to drones and balances their frame rates.
+    """
+    logger = Logger.get_logger(name="VideoManager")
+
+    MAX_STREAM_FPS = 30  # the Tello never streams faster
+
+    def __init__(self, base_port: int = Tello.DEFAULT_VIDEO_STREAM_UDP_PORT, max_streams: int = 8,
+                 total_fps=60, focus_share: float = 0.5, **reader_options):
+        """
+        Arguments:
+            base_port: first video port, the following max_streams - 1 ports are used as well
+            max_streams: maximum number of drones streaming at once
+            total_fps: frames per second decoded over all streams, None for no limit
+            focus_share: share of total_fps reserved for the focused drone
+            reader_options: passed to Tello.get_frame_read for every stream
+        """
+        self.base_port = base_port
+        self.max_streams = max_streams
+        self.total_fps = total_fps
+        self.focus_share = focus_share
+        self.reader_options = reader_options
+
+        # Streams by host, each a dict with the keys tello, port, reader and target_fps
+        self.streams: Dict[str, dict] = {}
+        self.focused: Optional[str] = None
+        self.lock = RLock()
+
+    def allocate_port(self) -> int:
+        """Get the first video port that no stream uses.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        used = {stream['port'] for stream in self.streams.values()}
+        for port in range(self.base_port, self.base_port + self.max_streams):
+            if port not in used:
+                return port
+        raise TelloException('Can not stream more than {} drones at once'.format(self.max_streams))
+
+    def add(self, tello: Tello) -> BackgroundFrameRead:
+        """Start streaming the video of a drone to its own port.
+        Returns:
+            BackgroundFrameRead
+        """
+        host = tello.address[0]
+        with self.lock:
+            if host in self.streams:
+                return self.streams[host]['reader']
+
+            port = self.allocate_port()
+            if tello.stream_on:
+                if port != tello.video_streaming_udp_port:
+                    tello.change_vs_udp(port)
+            else:
+                # streamon sends the port command when the port is not the default one
+                tello.video_streaming_udp_port = port
+                tello.streamon()
+
+            reader = tello.get_frame_read(**self.reader_options)
+            self.streams[host] = {'tello': tello, 'port': port, 'reader': reader, 'target_fps': None}
+            self.logger.info("Streaming video of {} on port {}".format(host, port))
+            self.rebalance()
+            return reader
+
+    def remove(self, host: str):
+        """Stop the video of a drone and free its port
+        """
+        with self.lock:
+            stream = self.streams.pop(host, None)
+            if stream is None:
+                return
+
+            try:
+                stream['tello'].streamoff()
+            except TelloException as e:
+                self.logger.warning("Failed to turn off the video of {}: {}".format(host, e))
+                stream['reader'].stop()
+
+            if self.focused == host:
+                self.focused = None
+            self.rebalance()
+
+    def focus(self, host: Optional[str]):
+        """Give the biggest share of the frame rate budget to a drone, None shares it equally
+        """
+        with self.lock:
+            if host is not None and host not in self.streams:
+                raise TelloException('No video stream for {}'.format(host))
+            self.focused = host
+            self.rebalance()
+
+    def compute_target_fps(self) -> Dict[str, Optional[float]]:
+        """Split the frame rate budget over the streams.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        hosts = list(self.streams)
+        if not hosts or not self.total_fps:
+            return {host: None for host in hosts}
+
+        if self.focused is None or len(hosts) == 1:
+            shares = {host: self.total_fps / len(hosts) for host in hosts}
+        else:
+            others = (1 - self.focus_share) * self.total_fps / (len(hosts) - 1)
+            shares = {host: others for host in hosts}
+            shares[self.focused] = self.focus_share * self.total_fps
+
+        return {host: min(share, self.MAX_STREAM_FPS) for host, share in shares.items()}
+
+    def rebalance(self):
+        """Apply the frame rate budget to every stream.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        with self.lock:
+            for host, target_fps in self.compute_target_fps().items():
+                stream = self.streams[host]
+                stream['target_fps'] = target_fps
+                stream['reader'].set_target_fps(target_fps)
+
+    def get_reader(self, host: str) -> Optional[BackgroundFrameRead]:
+        stream = self.streams.get(host)
+        return stream['reader'] if stream is not None else None
+
+    def get_stats(self) -> dict:
+        """Get the port, frame rate budget and reader statistics of every stream
+        """
+        with self.lock:
+            return {
+                host: {
+                    'port': stream['port'],
+                    'focused': host == self.focused,
+                    'target_fps': stream['target_fps'],
+                    'reader': stream['reader'].get_stats(),
+                }
+                for host, stream in self.streams.items()
+            }
+
+    def stop(self):
+        """Stop the video of every drone
+        """
+        with self.lock:
+            for host in list(self.streams):
+                self.remove(host)
@@ -0,0 +1,237 @@
+"""Computer vision on the drone video.
+
+A VisionPipeline subscribes once to a BackgroundFrameRead and runs every
+stage on the most recent frame. Stages declare the resolution and pixel format
+they need, each input is converted once per frame and shared by all stages
+asking for it. With worker processes, inputs are handed over through shared
+memory instead of being pickled (see shared_frames). Results are attached to the frame metadata under "vision" and
+kept as the latest results of the pipeline, which the telemetry push sends to
+the clients.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Lock, Thread
+from typing import Callable, Dict, List, Optional
+
+from .broadcaster import BroadcastFrame
+from .shared_frames import SharedFrameRef, SharedFrameRing, attach_frame
+from ..utils.Logger import Logger
+from ..utils.lazy_import import lazy_import
+from ..utils.metrics import registry as metrics
+
+np = lazy_import('numpy')
+
+vision_stage_seconds = metrics.histogram(
+    "tello_vision_stage_seconds", "Time spent per vision stage and frame", ("stage",))
+vision_frames_skipped = metrics.counter(
+    "tello_vision_frames_skipped_total", "Frames the vision pipeline skipped because it was busy", ())
+
+FORMAT_RGB = 'rgb24'
+FORMAT_BGR = 'bgr24'
+FORMAT_GRAY = 'gray'
+
+# ITU-R BT.601 luma weights
+GRAY_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+def prepare_image(image, resolution=None, image_format=FORMAT_RGB):
+    """Convert an RGB frame to the resolution (width, height) and format a stage asked for.
+    Downscaling samples the nearest pixel, which is plenty for detection inputs.
+    """
+    if resolution is not None:
+        width, height = resolution
+        rows = np.linspace(0, image.shape[0] - 1, height).astype(np.intp)
+        columns = np.linspace(0, image.shape[1] - 1, width).astype(np.intp)
+        image = image[rows[:, None], columns]
+
+    if image_format == FORMAT_BGR:
+        return image[..., ::-1]
+    if image_format == FORMAT_GRAY:
+        return (image @ np.array(GRAY_WEIGHTS)).astype(np.uint8)
+    return image
+
+
+class VisionStage:
+    """A processing step of the vision pipeline. Subclasses set `name`, the
+    `resolution` (width, height) and `image_format` of their input, and implement
+    process(). Stages run in a process pool must be picklable.
+    """
+    name = 'stage'
+    resolution = None
+    image_format = FORMAT_RGB
+
+    def process(self, image, metadata: dict):
+        """Process one frame.
+        Arguments:
+            image: numpy array in the declared resolution and format, do not modify it in place
+            metadata: copy of the metadata of the frame
+        Returns:
+            JSON serializable result, e.g. a list of detections
+        """
+        raise NotImplementedError
+
+
+class FunctionStage(VisionStage):
+    """Stage running a plain function taking the image and the frame metadata
+    """
+
+    def __init__(self, name: str, function: Callable, resolution=None, image_format: str = FORMAT_RGB):
+        self.name = name
+        self.function = function
+        self.resolution = resolution
+        self.image_format = image_format
+
+    def process(self, image, metadata: dict):
+        return self.function(image, metadata)
+
+
+def run_stage(stage: VisionStage, image, metadata: dict):
+    """Run a stage and measure it. Module level so it can be sent to a process pool.
+    """
+    started = time.perf_counter()
+    result = stage.process(image, metadata)
+    return result, time.perf_counter() - started
+
+
+def run_stage_shared(stage: VisionStage, ref: SharedFrameRef, metadata: dict):
+    """Run a stage in a worker process on a frame in shared memory
+    """
+    return run_stage(stage, attach_frame(ref), metadata)
+
+
+class VisionPipeline:
+    """Runs vision stages on the frames of a BackgroundFrameRead.
+
+    Stages run concurrently on a thread pool, or on a process pool for CPU bound
+    Python code when `use_processes` is set. Worker processes read their inputs
+    from shared memory unless `share_frames` is disabled, only the results are
+    pickled. The pipeline always processes the most recent frame, frames
+    published while it is busy are skipped.
+    """
+    SHARED_SLOTS = 2
+    logger = Logger.get_logger(name="VisionPipeline")
+
+    def __init__(self, frame_read, stages: List[VisionStage], workers: int = 2, use_processes: bool = False,
+                 share_frames: bool = True, frame_timeout: float = 1.0):
+        self.frame_read = frame_read
+        self.stages = list(stages)
+        self.frame_timeout = frame_timeout
+        self.share_frames = use_processes and share_frames
+        # Shared memory rings by input (resolution, format)
+        self.rings: Dict[tuple, SharedFrameRing] = {}
+        self.executor = ProcessPoolExecutor(workers) if use_processes else ThreadPoolExecutor(workers)
+        self.listeners: List[Callable[[BroadcastFrame, dict], None]] = []
+        self.results: Dict[str, object] = {}
+        self.results_timestamp: Optional[float] = None
+        self.processed = 0
+        self.lock = Lock()
+        self.stopped = False
+        self.subscriber = None
+        self.worker = Thread(target=self.run, daemon=True, name="tello-vision")
+
+    def add_listener(self, listener: Callable[[BroadcastFrame, dict], None]):
+        """Call listener with (frame, results) after every processed frame
+        """
+        self.listeners.append(listener)
+
+    def start(self):
+        self.subscriber = self.frame_read.subscribe()
+        self.worker.start()
+
+    def stop(self):
+        self.stopped = True
+        if self.subscriber is not None:
+            self.subscriber.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for ring in self.rings.values():
+            ring.close()
+        self.rings.clear()
+
+    def run(self):
+        """Thread worker function, processes the latest frame until stopped.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        while not self.stopped:
+            frame = self.subscriber.wait_for_next(timeout=self.frame_timeout)
+            if frame is None:
+                continue
+
+            skipped = self.subscriber.pending()
+            if skipped:
+                frame = self.subscriber.latest()
+                vision_frames_skipped.inc(skipped)
+
+            try:
+                self.process_frame(frame)
+            except Exception:
+                if self.stopped:
+                    break
+                self.logger.error("Vision pipeline failed on frame {}".format(frame.seq), exc_info=True)
+
+    def process_frame(self, frame: BroadcastFrame) -> dict:
+        """Run every stage on a frame and publish the results.
+        Internal method, you normally wouldn't call this yourself.
+        Returns:
+            dict: result by stage name
+        """
+        inputs = {}
+        futures = {}
+        try:
+            for stage in self.stages:
+                key = (stage.resolution, stage.image_format)
+                if key not in inputs:
+                    image = prepare_image(frame.image, stage.resolution, stage.image_format)
+                    inputs[key] = self.share_input(key, image) if self.share_frames else image
+
+                task = run_stage_shared if self.share_frames else run_stage
+                futures[stage.name] = self.executor.submit(task, stage, inputs[key], dict(frame.metadata))
+
+            results = {}
+            for name, future in futures.items():
+                try:
+                    results[name], seconds = future.result()
+                    vision_stage_seconds.observe(seconds, stage=name)
+                except Exception as e:
+                    self.logger.error("Vision stage '{}' failed: {}".format(name, e))
+                    results[name] = None
+        finally:
+            if self.share_frames:
+                for key, ref in inputs.items():
+                    if ref is not None:
+                        self.rings[key].release(ref)
+
+        frame.metadata['vision'] = results
+        with self.lock:
+            self.results = results
+            self.results_timestamp = frame.timestamp
+            self.processed += 1
+
+        for listener in list(self.listeners):
+            try:
+                listener(frame, results)
+            except Exception:
+                self.logger.error("Vision listener failed", exc_info=True)
+        return results
+
+    def share_input(self, key: tuple, image) -> SharedFrameRef:
+        """Copy a stage input to the shared memory ring of its kind.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        ring = self.rings.get(key)
+        if ring is None or not ring.fits(image):
+            if ring is not None:
+                ring.close()
+            ring = self.rings[key] = SharedFrameRing(image.shape, image.dtype, self.SHARED_SLOTS)
+        return ring.write(image)
+
+    def get_results(self, max_age=None) -> dict:
+        """Get the results of the last processed frame, {} when there are none
+        or they are older than max_age seconds.
+        """
+        with self.lock:
+            if self.results_timestamp is None:
+                return {}
+            if max_age is not None and time.time() - self.results_timestamp > max_age:
+                return {}
+            return dict(self.results)
@@ -1,7 +1,12 @@
-from flask import Blueprint, g, jsonify, request
+from flask import Blueprint, Response, g, jsonify, request
 
-from src.models import Tello
+from src.models import BackgroundFrameRead, GeofenceViolation, SafetyEnvelope, Tello
+from src.models.mission import MissionError, abort_missions, compile_mission, missions, start_mission
+from src.models.path import optimize_path
+from src.models.panorama import PANORAMA_PLANS, STATUS_DONE, panorama_jobs, start_panorama
 from src.utils.Logger import Logger
+from src.utils import tracing
+from src.utils.metrics import registry as metrics
 
 tello_bp = Blueprint("tello"
                      , __name__,
@@ -16,6 +21,7 @@ def get_tello():
     try:
         if 'tello' not in g:
             g.tello = Tello()
+            tracing.mark("tello_ready")
         return g.tello
     except Exception:
         logger.error('Failed to initialize Tello instance', exc_info=True)
@@ -31,6 +37,7 @@ def connect():
 
         if success:
             logger.info("Tello drone connected")
+            tello.start_health_monitor()
             tello.takeoff()
             return response_generator("Successfully connected to Tello drone", 200)
         else:
@@ -52,6 +59,7 @@ def disconnect():
 
         tello.stop()
         tello.land()
+        tello.stop_health_monitor()
 
         logger.info("Tello drone stopped and landed")
         # Clear resources
@@ -72,11 +80,32 @@ def takeoff():
         tello = get_tello()
         tello.takeoff()
         return response_generator("Successfully took off Tello drone", 200)
+    except GeofenceViolation as e:
+        return response_generator(str(e), 409)
     except Exception as e:
         logger.error(f"Takeoff error:", exc_info=True)
         return response_generator(f"Unexpected takeoff error: {str(e)}", 500)
 
 
+@tello_bp.route("/priority/<command>", methods=["POST"])
+def priority(command):
+    """
+    Priority lane: sends emergency, stop or land right away, cancelling the pending commands and missions of the drone
+    """
+    if command not in Tello.PRIORITY_COMMANDS:
+        return response_generator(f"Invalid priority command: {command}", 400)
+
+    try:
+        tello = get_tello()
+        tello.send_priority_command(command)
+        logger.warning(f"Client sent priority command {command}")
+        abort_missions(land=False, host=tello.address[0])
+        return response_generator(f"Sent {command}", 200)
+    except Exception as e:
+        logger.error("Priority command error:", exc_info=True)
+        return response_generator(f"Unexpected priority command error: {str(e)}", 500)
+
+
 @tello_bp.route("/land", methods=["POST"])
 def land():
     logger.info("Client is landing Tello")
@@ -106,6 +135,8 @@ def move():
         tello.move(direction, distance)
 
         return response_generator(f"Successfully moved {direction}", 200)
+    except GeofenceViolation as e:
+        return response_generator(str(e), 409)
     except Exception as e:
         logger.error(f"Move error:", exc_info=True)
         return response_generator(f"Unexpected move error: {str(e)}", 500)
@@ -135,6 +166,8 @@ def rotate():
         rotation_actions.get(direction)(angle)
 
         return response_generator(f"Successfully rotated {direction}", 200)
+    except GeofenceViolation as e:
+        return response_generator(str(e), 409)
     except Exception as e:
         logger.error("Rotation error:", exc_info=True)
         return response_generator(f"Unexpected rotation error: {str(e)}", 500)
@@ -156,6 +189,8 @@ def flip():
         tello.flip(direction[0])
 
         return response_generator("Successfully flipped Tello", 200)
+    except GeofenceViolation as e:
+        return response_generator(str(e), 409)
     except Exception as e:
         logger.error("Flip error:", exc_info=True)
         return response_generator(f"Unexpected flip error: {str(e)}", 500)
@@ -181,6 +216,238 @@ def state():
         return response_generator(f"Unexpected state error: {str(e)}", 500)
 
 
+@tello_bp.route("/telemetry", methods=["GET"])
+def telemetry():
+    logger.info("Client is getting Tello telemetry")
+    try:
+        tello = get_tello()
+        state = tello.get_current_state()
+
+        if not state:
+            logger.error("Failed to get Tello state")
+            return response_generator("Failed to get Tello state", 500)
+
+        return response_generator({
+            "state": state,
+            "derived": tello.get_derived_state()
+        }, 200)
+    except Exception as e:
+        logger.error("Telemetry error:", exc_info=True)
+        return response_generator(f"Unexpected telemetry error: {str(e)}", 500)
+
+
+@tello_bp.route("/health", methods=["GET"])
+def health():
+    logger.info("Client is getting Tello link health")
+    try:
+        tello = get_tello()
+        return response_generator(tello.get_link_health(), 200)
+    except Exception as e:
+        logger.error("Link health error:", exc_info=True)
+        return response_generator(f"Unexpected link health error: {str(e)}", 500)
+
+
+@tello_bp.route("/pose", methods=["GET"])
+def pose():
+    logger.info("Client is getting the Tello pose")
+    try:
+        return response_generator(get_tello().get_pose(), 200)
+    except Exception as e:
+        logger.error("Pose error:", exc_info=True)
+        return response_generator(f"Unexpected pose error: {str(e)}", 500)
+
+
+@tello_bp.route("/pose/reset", methods=["POST"])
+def pose_reset():
+    logger.info("Client is resetting the Tello pose")
+    try:
+        tello = get_tello()
+        tello.reset_pose()
+        return response_generator(tello.get_pose(), 200)
+    except Exception as e:
+        logger.error("Pose reset error:", exc_info=True)
+        return response_generator(f"Unexpected pose reset error: {str(e)}", 500)
+
+
+@tello_bp.route("/geofence", methods=["GET"])
+def geofence():
+    logger.info("Client is getting the Tello geofence")
+    try:
+        geofence = get_tello().get_geofence()
+        return response_generator(geofence.to_dict() if geofence is not None else None, 200)
+    except Exception as e:
+        logger.error("Geofence error:", exc_info=True)
+        return response_generator(f"Unexpected geofence error: {str(e)}", 500)
+
+
+@tello_bp.route("/geofence", methods=["PUT"])
+def set_geofence():
+    logger.info("Client is setting the Tello geofence")
+
+    body = request.get_json(silent=True) or {}
+    action = body.get("action", "stop")
+    try:
+        envelope = SafetyEnvelope(box=body.get("box"), polygon=body.get("polygon"),
+                                  min_height=body.get("min_height", 0), max_height=body.get("max_height", 300),
+                                  min_battery=body.get("min_battery", 15))
+    except (TypeError, ValueError) as e:
+        return response_generator(f"Invalid geofence: {str(e)}", 400)
+    if action not in ["stop", "land"]:
+        return response_generator(f"Invalid geofence action: {action}", 400)
+
+    try:
+        return response_generator(get_tello().set_geofence(envelope, action).to_dict(), 200)
+    except Exception as e:
+        logger.error("Geofence error:", exc_info=True)
+        return response_generator(f"Unexpected geofence error: {str(e)}", 500)
+
+
+@tello_bp.route("/geofence", methods=["DELETE"])
+def clear_geofence():
+    logger.info("Client is removing the Tello geofence")
+    try:
+        get_tello().clear_geofence()
+        return response_generator("Geofence removed", 200)
+    except Exception as e:
+        logger.error("Geofence error:", exc_info=True)
+        return response_generator(f"Unexpected geofence error: {str(e)}", 500)
+
+
+@tello_bp.route("/mission-pads", methods=["GET"])
+def mission_pads():
+    logger.info("Client is getting mission pad events")
+    try:
+        since = request.args.get("since", 0, type=int)
+        tracker = get_tello().get_mission_pad_tracker()
+        return response_generator(dict(tracker.to_dict(), events=tracker.events_since(since)), 200)
+    except Exception as e:
+        logger.error("Mission pad error:", exc_info=True)
+        return response_generator(f"Unexpected mission pad error: {str(e)}", 500)
+
+
+@tello_bp.route("/panorama", methods=["POST"])
+def panorama():
+    logger.info("Client is starting a panorama")
+
+    body = request.get_json(silent=True) or {}
+    mode = body.get("mode", "full")
+    direction = body.get("direction", "cw")
+
+    if mode not in PANORAMA_PLANS:
+        return response_generator(f"Invalid panorama mode: {mode}", 400)
+    if direction not in ["cw", "ccw"]:
+        return response_generator(f"Invalid rotation: {direction}", 400)
+
+    try:
+        job = start_panorama(get_tello(), mode, direction)
+        return response_generator(job.to_dict(), 202)
+    except Exception as e:
+        logger.error("Panorama error:", exc_info=True)
+        return response_generator(f"Unexpected panorama error: {str(e)}", 500)
+
+
+@tello_bp.route("/panorama/<job_id>", methods=["GET"])
+def panorama_status(job_id):
+    job = panorama_jobs.get(job_id)
+    if job is None:
+        return response_generator(f"Unknown panorama: {job_id}", 404)
+    return response_generator(job.to_dict(), 200)
+
+
+@tello_bp.route("/panorama/<job_id>/image", methods=["GET"])
+def panorama_image(job_id):
+    job = panorama_jobs.get(job_id)
+    if job is None:
+        return response_generator(f"Unknown panorama: {job_id}", 404)
+    if job.status != STATUS_DONE:
+        return response_generator(f"Panorama {job_id} is {job.status}", 409)
+
+    try:
+        return Response(job.get_image(), mimetype="image/jpeg")
+    except Exception as e:
+        logger.error("Panorama image error:", exc_info=True)
+        return response_generator(f"Unexpected panorama image error: {str(e)}", 500)
+
+
+@tello_bp.route("/missions/validate", methods=["POST"])
+def mission_validate():
+    logger.info("Client is validating a mission")
+    try:
+        plan = compile_mission(request.get_json(silent=True) or request.get_data(as_text=True))
+        return response_generator(plan.to_dict(), 200)
+    except MissionError as e:
+        return response_generator({"errors": e.errors}, 400)
+    except Exception as e:
+        logger.error("Mission validation error:", exc_info=True)
+        return response_generator(f"Unexpected mission validation error: {str(e)}", 500)
+
+
+@tello_bp.route("/missions", methods=["POST"])
+def mission_start():
+    logger.info("Client is starting a mission")
+    try:
+        plan = compile_mission(request.get_json(silent=True) or request.get_data(as_text=True))
+        runner = start_mission(get_tello(), plan)
+        return response_generator(dict(runner.to_dict(), plan=plan.to_dict()), 202)
+    except MissionError as e:
+        return response_generator({"errors": e.errors}, 400)
+    except Exception as e:
+        logger.error("Mission error:", exc_info=True)
+        return response_generator(f"Unexpected mission error: {str(e)}", 500)
+
+
+@tello_bp.route("/missions/path", methods=["POST"])
+def mission_path():
+    logger.info("Client is optimizing a path")
+
+    body = request.get_json(silent=True) or {}
+    waypoints = body.get("waypoints")
+    if not isinstance(waypoints, list) or not waypoints:
+        return response_generator("Missing waypoints", 400)
+
+    try:
+        plan = optimize_path(waypoints, body.get("speed", 50), body.get("max_turn", 60), body.get("curves", True))
+        return response_generator(plan.to_dict(), 200)
+    except (TypeError, ValueError) as e:
+        return response_generator(f"Invalid path: {str(e)}", 400)
+    except Exception as e:
+        logger.error("Path error:", exc_info=True)
+        return response_generator(f"Unexpected path error: {str(e)}", 500)
+
+
+@tello_bp.route("/missions/<mission_id>", methods=["GET"])
+def mission_status(mission_id):
+    runner = missions.get(mission_id)
+    if runner is None:
+        return response_generator(f"Unknown mission: {mission_id}", 404)
+    return response_generator(runner.to_dict(), 200)
+
+
+@tello_bp.route("/missions/<mission_id>/abort", methods=["POST"])
+def mission_abort(mission_id):
+    logger.info(f"Client is aborting mission {mission_id}")
+    runner = missions.get(mission_id)
+    if runner is None:
+        return response_generator(f"Unknown mission: {mission_id}", 404)
+    runner.abort()
+    return response_generator(runner.to_dict(), 202)
+
+
+@tello_bp.route("/video/metrics", methods=["GET"])
+def video_metrics():
+    logger.info("Client is getting video stream metrics")
+    try:
+        streams = [reader.get_stats() for reader in list(BackgroundFrameRead.active_readers.values())]
+
+        return response_generator({
+            "streams": streams,
+            "metrics": metrics.collect("tello_video")
+        }, 200)
+    except Exception as e:
+        logger.error("Video metrics error:", exc_info=True)
+        return response_generator(f"Unexpected video metrics error: {str(e)}", 500)
+
+
 def response_generator(message, code):
     return jsonify({
         "message": message
@@ -1,15 +1,30 @@
-from flask import Blueprint, g
+from flask import Blueprint, g, request
 from flask_socketio import emit
 
 from src.main import socketio
 from src.models import Tello
+from src.models.mission import abort_missions
 from src.utils.Logger import Logger
+from src.utils.metrics import registry as metrics
+from src.utils.telemetry_codec import TelemetryEncoder
 
 tello_socket_bp = Blueprint("tello_socket", __name__)
 TELLO_NAMESPACE = "/tello"
 
 logger = Logger.get_logger(name="TelloSocketRoutes")
 
+socketio_connections = metrics.gauge(
+    "socketio_connections", "Connected Socket.IO clients", ("namespace",))
+
+TELEMETRY_PUSH_RATE = 10  # frames per second
+MAX_TELEMETRY_PUSH_RATE = 30  # frames per second
+VISION_RESULTS_MAX_AGE = 1.0  # in seconds
+
+# Telemetry push subscriptions by Socket.IO session id
+telemetry_subscriptions = {}
+# Mission pad event subscriptions by Socket.IO session id
+mission_pad_subscriptions = {}
+
 
 def get_tello():
     """
@@ -30,6 +45,7 @@ def on_connect(session_id):
     When the client connects to the Tello namespace, attempt to connect to the Tello drone
     """
     logger.info("New client connected to Tello namespace")
+    socketio_connections.inc(namespace=TELLO_NAMESPACE)
     try:
         tello = get_tello()
         success = tello.connect()
@@ -58,6 +74,9 @@ def on_disconnect(session_id):
     When the client disconnects, stop the drone and clear resources
     """
     logger.info("Client disconnected from Tello namespace")
+    socketio_connections.dec(namespace=TELLO_NAMESPACE)
+    stop_telemetry_push(request.sid)
+    stop_mission_pad_push(request.sid)
     try:
 
         tello = get_tello()
@@ -91,6 +110,37 @@ def on_takeoff():
         })
 
 
+@socketio.on("priority", namespace=TELLO_NAMESPACE)
+def on_priority(command):
+    """
+    Priority lane: sends emergency, stop or land right away, cancelling the pending commands and missions of the drone
+    Parameters:
+        command (str): emergency, stop or land
+    """
+    if command not in Tello.PRIORITY_COMMANDS:
+        emit("priority_status", {
+            "status": "error",
+            "message": f"Invalid priority command: {command}"
+        })
+        return
+
+    try:
+        tello = get_tello()
+        tello.send_priority_command(command)
+        logger.warning("Client sent priority command %s", command)
+        abort_missions(land=False, host=tello.address[0])
+        emit("priority_status", {
+            "status": "success",
+            "message": f"Sent {command}"
+        })
+    except Exception as e:
+        logger.error(f"Priority command error: {e}", exc_info=True)
+        emit("priority_status", {
+            "status": "error",
+            "message": f"Priority command failed: {str(e)}"
+        })
+
+
 @socketio.on("move", namespace=TELLO_NAMESPACE)
 def on_move(direction):
     """
@@ -243,3 +293,174 @@ def on_get_state():
             "status": "error",
             "message": f"Unexpected error retrieving state: {str(e)}"
         })
+
+
+@socketio.on("telemetry", namespace=TELLO_NAMESPACE)
+def on_get_telemetry():
+    """
+    Retrieve and emit Tello drone state together with the metrics derived from it
+    """
+    try:
+        logger.info("Retrieving Tello telemetry")
+
+        tello = get_tello()
+        state = tello.get_current_state()
+
+        if state:
+            emit('telemetry_update', {
+                "status": "success",
+                "state": state,
+                "derived": tello.get_derived_state()
+            })
+        else:
+            logger.warning("Could not retrieve Tello state")
+            emit('telemetry_update', {
+                "status": "error",
+                "message": "Could not retrieve Tello state"
+            })
+
+    except Exception as e:
+        logger.error("Telemetry retrieval error", exc_info=True)
+        emit('telemetry_update', {
+            "status": "error",
+            "message": f"Unexpected error retrieving telemetry: {str(e)}"
+        })
+
+
+def push_telemetry(session_id, subscription):
+    """
+    Background task sending delta encoded telemetry frames to one client until it unsubscribes
+    """
+    tello = subscription["tello"]
+    encoder = subscription["encoder"]
+    interval = 1 / subscription["rate"]
+
+    while subscription["active"]:
+        try:
+            state = tello.get_current_state()
+            if state:
+                derived = dict(tello.get_derived_state())
+                vision = tello.get_vision_results(max_age=VISION_RESULTS_MAX_AGE)
+                if vision:
+                    derived["vision"] = vision
+                derived["pose"] = tello.get_pose()
+                frame = encoder.encode(state, derived)
+                if frame is not None:
+                    socketio.emit("telemetry_frame", frame, namespace=TELLO_NAMESPACE, to=session_id)
+        except Exception:
+            logger.error("Telemetry push error", exc_info=True)
+        socketio.sleep(interval)
+
+
+def stop_telemetry_push(session_id):
+    subscription = telemetry_subscriptions.pop(session_id, None)
+    if subscription is not None:
+        subscription["active"] = False
+
+
+@socketio.on("subscribe_telemetry", namespace=TELLO_NAMESPACE)
+def on_subscribe_telemetry(options=None):
+    """
+    Start pushing telemetry frames ('telemetry_frame' events) to the client.
+    Frames only contain the fields that changed, see TelemetryEncoder.
+    Parameters:
+        options (dict): optional "rate" (frames per second), "binary" (MessagePack frames)
+            and "full_snapshot_interval" (frames between two full snapshots)
+    """
+    options = options or {}
+    logger.info("Client subscribed to telemetry: %s", options)
+
+    try:
+        rate = min(max(float(options.get("rate", TELEMETRY_PUSH_RATE)), 0.1), MAX_TELEMETRY_PUSH_RATE)
+        encoder = TelemetryEncoder(full_snapshot_interval=int(options.get("full_snapshot_interval", 50)),
+                                   binary=bool(options.get("binary", False)))
+
+        stop_telemetry_push(request.sid)
+        subscription = {
+            "tello": get_tello(),
+            "encoder": encoder,
+            "rate": rate,
+            "active": True
+        }
+        telemetry_subscriptions[request.sid] = subscription
+        socketio.start_background_task(push_telemetry, request.sid, subscription)
+
+        emit("telemetry_status", {
+            "status": "success",
+            "message": f"Pushing telemetry at {rate} frames per second",
+            "binary": encoder.binary
+        })
+    except Exception as e:
+        logger.error("Telemetry subscription error", exc_info=True)
+        emit("telemetry_status", {
+            "status": "error",
+            "message": f"Unexpected error subscribing to telemetry: {str(e)}"
+        })
+
+
+@socketio.on("telemetry_resync", namespace=TELLO_NAMESPACE)
+def on_telemetry_resync():
+    """
+    Make the next pushed frame a full snapshot, e.g. after the client missed a frame
+    """
+    subscription = telemetry_subscriptions.get(request.sid)
+    if subscription is not None:
+        subscription["encoder"].resync()
+
+
+@socketio.on("unsubscribe_telemetry", namespace=TELLO_NAMESPACE)
+def on_unsubscribe_telemetry():
+    logger.info("Client unsubscribed from telemetry")
+    stop_telemetry_push(request.sid)
+    emit("telemetry_status", {
+        "status": "success",
+        "message": "Stopped pushing telemetry"
+    })
+
+
+def mission_pad_listener(session_id):
+    """
+    Listener of a MissionPadTracker forwarding its events ('mission_pad' events) to one client as they happen
+    """
+    def forward(event):
+        socketio.emit("mission_pad", event, namespace=TELLO_NAMESPACE, to=session_id)
+
+    return forward
+
+
+def stop_mission_pad_push(session_id):
+    subscription = mission_pad_subscriptions.pop(session_id, None)
+    if subscription is not None:
+        subscription["tracker"].remove_listener(subscription["listener"])
+
+
+@socketio.on("subscribe_mission_pads", namespace=TELLO_NAMESPACE)
+def on_subscribe_mission_pads():
+    """
+    Push mission pad detected, lost and position events to the client
+    """
+    logger.info("Client subscribed to mission pad events")
+    try:
+        tracker = get_tello().get_mission_pad_tracker()
+        stop_mission_pad_push(request.sid)
+        subscription = {"tracker": tracker, "listener": mission_pad_listener(request.sid)}
+        mission_pad_subscriptions[request.sid] = subscription
+        tracker.add_listener(subscription["listener"])
+
+        emit("mission_pad_status", dict(tracker.to_dict(), status="success"))
+    except Exception as e:
+        logger.error("Mission pad subscription error", exc_info=True)
+        emit("mission_pad_status", {
+            "status": "error",
+            "message": f"Unexpected error subscribing to mission pad events: {str(e)}"
+        })
+
+
+@socketio.on("unsubscribe_mission_pads", namespace=TELLO_NAMESPACE)
+def on_unsubscribe_mission_pads():
+    logger.info("Client unsubscribed from mission pad events")
+    stop_mission_pad_push(request.sid)
+    emit("mission_pad_status", {
+        "status": "success",
+        "message": "Stopped pushing mission pad events"
+    })
@@ -0,0 +1,41 @@
+import importlib.util
+import sys
+import types
+
+
+class MissingModule(types.ModuleType):
+    """
+    Stands in for a module that is not installed, using it raises the ImportError
+    """
+
+    def __getattr__(self, attribute):
+        raise ImportError(f"No module named '{self.__name__}'", name=self.__name__)
+
+
+def lazy_import(name):
+    """
+    Returns a module that is only executed when one of its attributes is first
+    used. Keeps heavy dependencies (PyAV, numpy, OpenCV) out of the application
+    startup. A module that is not installed only fails once it is used.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return MissingModule(name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def is_loaded(name):
+    """
+    Check whether a module was imported and executed, lazy modules that were never used are not
+    """
+    return type(sys.modules.get(name)) is types.ModuleType
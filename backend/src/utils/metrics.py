@@ -0,0 +1,257 @@
+import math
+from bisect import bisect_left
+from threading import Lock
+
+
+class Metric:
+    """
+    Base class for a named metric with an optional set of labels.
+    Values are kept per combination of label values.
+    """
+    metric_type = "untyped"
+
+    def __init__(self, name, documentation="", label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric '{self.name}' expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _labels(self, key):
+        return dict(zip(self.label_names, key))
+
+    def samples(self):
+        """
+        Returns a list of (labels, value) tuples
+        """
+        with self._lock:
+            return [(self._labels(key), value) for key, value in self._values.items()]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing value, e.g. the number of received packets
+    """
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """
+    Value that can go up and down, e.g. a queue depth
+    """
+    metric_type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class HistogramValue:
+    """
+    Bucket counts, sum and count of the observations of one label combination
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_buckets(self):
+        """
+        Returns a list of (upper bound, cumulative count) tuples, ending with +Inf
+        """
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            total += count
+            cumulative.append((bound, total))
+        cumulative.append((math.inf, self.count))
+        return cumulative
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by linear interpolation inside the matching bucket
+        """
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        lower_bound, lower_count = 0.0, 0
+        for bound, cumulative in self.cumulative_buckets():
+            if cumulative >= rank:
+                if math.isinf(bound):
+                    return lower_bound
+                in_bucket = cumulative - lower_count
+                fraction = (rank - lower_count) / in_bucket if in_bucket else 0
+                return lower_bound + (bound - lower_bound) * fraction
+            lower_bound, lower_count = bound, cumulative
+        return lower_bound
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values, e.g. decode times in seconds
+    """
+    metric_type = "histogram"
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, documentation="", label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = HistogramValue(self.buckets)
+            histogram.observe(value)
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+
+class MetricsRegistry:
+    """
+    Process wide collection of metrics. Metrics are created on first use and
+    shared by everyone asking for the same name afterwards.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def _get_or_create(self, metric_class, name, documentation, label_names, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, label_names, **kwargs)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric '{name}' is already registered as a {metric.metric_type}")
+            return metric
+
+    def counter(self, name, documentation="", label_names=()):
+        return self._get_or_create(Counter, name, documentation, label_names)
+
+    def gauge(self, name, documentation="", label_names=()):
+        return self._get_or_create(Gauge, name, documentation, label_names)
+
+    def histogram(self, name, documentation="", label_names=(), buckets=Histogram.DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, label_names, buckets=buckets)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def collect(self, prefix=""):
+        """
+        Returns a JSON serializable snapshot of all metrics whose name starts with prefix
+        """
+        snapshot = {}
+        for metric in self.metrics():
+            if not metric.name.startswith(prefix):
+                continue
+
+            samples = []
+            for labels, value in metric.samples():
+                if isinstance(value, HistogramValue):
+                    value = value.to_dict()
+                samples.append({"labels": labels, "value": value})
+
+            snapshot[metric.name] = {
+                "type": metric.metric_type,
+                "help": metric.documentation,
+                "samples": samples,
+            }
+        return snapshot
+
+
+registry = MetricsRegistry()
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def render_prometheus(metrics_registry=registry):
+    """
+    Render all metrics of a registry in the Prometheus text exposition format (version 0.0.4)
+    """
+    lines = []
+    for metric in metrics_registry.metrics():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+
+        for labels, value in metric.samples():
+            if isinstance(value, HistogramValue):
+                for bound, count in value.cumulative_buckets():
+                    bucket_labels = dict(labels, le=_format_value(bound))
+                    lines.append(f"{metric.name}_bucket{_format_labels(bucket_labels)} {count}")
+                lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(value.sum)}")
+                lines.append(f"{metric.name}_count{_format_labels(labels)} {value.count}")
+            else:
+                lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,148 @@
+from datetime import datetime
+
+from src.utils.Logger import Logger
+
+try:
+    import msgpack
+except ImportError:  # optional dependency, frames are sent as JSON without it
+    msgpack = None
+
+logger = Logger.get_logger(name="TelemetryCodec")
+
+# Short keys sent on the wire instead of the state field and derived metric names
+KEY_MAP = {
+    "mid": "m", "x": "x", "y": "y", "z": "z", "mpry": "mp",
+    "pitch": "p", "roll": "r", "yaw": "yw",
+    "vgx": "vx", "vgy": "vy", "vgz": "vz",
+    "agx": "ax", "agy": "ay", "agz": "az",
+    "templ": "tl", "temph": "th",
+    "tof": "tf", "h": "h", "bat": "b", "baro": "br", "time": "t",
+    "received_at": "ra",
+    "total_speed": "ds", "average_speed": "das", "max_speed": "dms",
+    "total_acceleration": "da", "average_acceleration": "daa",
+    "average_temperature": "dt", "smoothed_temperature": "dst",
+    "filtered_height": "dh", "battery_drain_rate": "dbr", "time_to_empty": "dte",
+    "samples": "dn",
+}
+REVERSE_KEY_MAP = {short: key for key, short in KEY_MAP.items()}
+
+FRAME_FULL = "f"
+FRAME_DELTA = "d"
+
+
+def _wire_value(value, precision):
+    if isinstance(value, datetime):
+        return round(value.timestamp(), 3)
+    if isinstance(value, float):
+        return round(value, precision)
+    return value
+
+
+class TelemetryEncoder:
+    """
+    Encodes telemetry for one push client. Only fields that changed since the
+    previous frame are sent, with the short keys of KEY_MAP. A full snapshot is
+    sent on the first frame, every `full_snapshot_interval` frames and after resync().
+
+    Frames look like {"t": "f" or "d", "s": sequence number, "v": {short key: value}},
+    deltas send removed fields with a None value. The first full snapshot also
+    carries the key map under "k".
+    """
+
+    def __init__(self, full_snapshot_interval=50, binary=False, precision=2):
+        if binary and msgpack is None:
+            logger.warning("msgpack is not installed, sending telemetry frames as JSON")
+            binary = False
+
+        self.full_snapshot_interval = full_snapshot_interval
+        self.binary = binary
+        self.precision = precision
+        self.sequence = 0
+        self._last = None
+        self._key_map_sent = False
+
+    def resync(self):
+        """
+        Make the next frame a full snapshot
+        """
+        self._last = None
+
+    def flatten(self, state, derived=None):
+        """
+        Merge state and derived metrics into a single dict with short keys
+        """
+        values = {}
+        for source in (state or {}, derived or {}):
+            for key, value in source.items():
+                values[KEY_MAP.get(key, key)] = _wire_value(value, self.precision)
+        return values
+
+    def encode_frame(self, state, derived=None):
+        """
+        Returns the next frame as a dict, None when nothing changed since the previous frame
+        """
+        values = self.flatten(state, derived)
+        full = self._last is None or self.sequence % self.full_snapshot_interval == 0
+
+        if full:
+            frame = {"t": FRAME_FULL, "s": self.sequence, "v": values}
+            if not self._key_map_sent:
+                frame["k"] = KEY_MAP
+                self._key_map_sent = True
+        else:
+            changed = {key: value for key, value in values.items() if self._last.get(key) != value}
+            changed.update({key: None for key in self._last if key not in values})
+            if not changed:
+                return None
+            frame = {"t": FRAME_DELTA, "s": self.sequence, "v": changed}
+
+        self._last = values
+        self.sequence += 1
+        return frame
+
+    def encode(self, state, derived=None):
+        """
+        Returns the next frame serialized as MessagePack bytes in binary mode,
+        as a dict otherwise, or None when nothing changed
+        """
+        frame = self.encode_frame(state, derived)
+        if frame is None or not self.binary:
+            return frame
+        return msgpack.packb(frame, use_bin_type=True)
+
+
+class TelemetryDecoder:
+    """
+    Rebuilds the full telemetry from encoded frames. `needs_resync` is set when
+    a frame was missed, the client should then ask for a full snapshot.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.expected_sequence = None
+        self.needs_resync = False
+
+    def decode(self, frame):
+        if isinstance(frame, (bytes, bytearray)):
+            frame = msgpack.unpackb(frame, raw=False)
+
+        if frame["t"] == FRAME_FULL:
+            self.values = dict(frame["v"])
+            self.needs_resync = False
+        elif self.needs_resync or self.expected_sequence is None or frame["s"] != self.expected_sequence:
+            self.needs_resync = True
+        else:
+            for key, value in frame["v"].items():
+                if value is None:
+                    self.values.pop(key, None)
+                else:
+                    self.values[key] = value
+
+        self.expected_sequence = frame["s"] + 1
+        return self.state()
+
+    def state(self):
+        """
+        Returns the current telemetry with the long key names
+        """
+        return {REVERSE_KEY_MAP.get(key, key): value for key, value in self.values.items()}
@@ -0,0 +1,145 @@
+import contextvars
+import time
+import uuid
+from collections import deque
+from threading import Lock
+
+from src.utils.metrics import Histogram, HistogramValue
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """
+    Timeline of the events that happened while handling a single request.
+    Every event is recorded with its offset from the start of the trace, the
+    time between two consecutive events is the span named after both of them.
+    """
+
+    def __init__(self, name, trace_id=None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.name = name
+        self.started_at = time.time()
+        self.status = None
+        self.duration = None
+        self.events = []
+        self._start = time.perf_counter()
+
+    def mark(self, event, **attributes):
+        """
+        Record that an event happened now
+        """
+        self.events.append({
+            "name": event,
+            "offset": time.perf_counter() - self._start,
+            "attributes": attributes,
+        })
+
+    def finish(self, status=None):
+        self.status = status
+        self.duration = time.perf_counter() - self._start
+
+    def spans(self):
+        """
+        Returns a list of (span name, duration) tuples between consecutive events
+        """
+        spans = []
+        previous = {"name": "start", "offset": 0.0}
+        for event in self.events:
+            spans.append((f"{previous['name']}->{event['name']}", event["offset"] - previous["offset"]))
+            previous = event
+        return spans
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "status": self.status,
+            "events": list(self.events),
+            "spans": [{"name": name, "duration": duration} for name, duration in self.spans()],
+        }
+
+
+class Tracer:
+    """
+    Keeps the most recent finished traces and a latency summary per trace name
+    (the route for HTTP requests) and span.
+    """
+
+    def __init__(self, max_traces=500):
+        self._traces = deque([], max_traces)
+        self._summaries = {}
+        self._lock = Lock()
+
+    def start(self, name, trace_id=None):
+        """
+        Start a trace and make it the current trace of this context
+        """
+        trace = Trace(name, trace_id)
+        _current_trace.set(trace)
+        return trace
+
+    def finish(self, trace, status=None):
+        """
+        Finish a trace, store it and add its spans to the summary of its name
+        """
+        trace.finish(status)
+        _current_trace.set(None)
+
+        with self._lock:
+            self._traces.append(trace)
+            summary = self._summaries.setdefault(trace.name, {})
+            self._observe(summary, "total", trace.duration)
+            for span, duration in trace.spans():
+                self._observe(summary, span, duration)
+
+    @staticmethod
+    def _observe(summary, span, duration):
+        histogram = summary.get(span)
+        if histogram is None:
+            histogram = summary[span] = HistogramValue(Histogram.DEFAULT_BUCKETS)
+        histogram.observe(duration)
+
+    def export(self, limit=None, name=None):
+        """
+        Returns the most recent finished traces as JSON serializable dicts, newest first
+        """
+        with self._lock:
+            traces = [trace for trace in reversed(self._traces) if name is None or trace.name == name]
+        return [trace.to_dict() for trace in traces[:limit]]
+
+    def summary(self):
+        """
+        Returns latency statistics per trace name and span
+        """
+        with self._lock:
+            return {
+                name: {span: histogram.to_dict() for span, histogram in spans.items()}
+                for name, spans in self._summaries.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+            self._summaries.clear()
+
+
+def current_trace():
+    """
+    Returns the trace of the request being handled in this context, if any
+    """
+    return _current_trace.get()
+
+
+def mark(event, **attributes):
+    """
+    Record an event on the current trace, does nothing outside a traced request
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.mark(event, **attributes)
+
+
+tracer = Tracer()
@@ -0,0 +1,51 @@
+import threading
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from src.models import tello as tello_module
+
+
+class FakeDrone:
+    """
+    Stands in for the UDP control socket. Every command sent to the drone is
+    recorded and answered by the responder callable, which returns the
+    response text or None to simulate a lost packet.
+    """
+
+    def __init__(self, responder=None, delay=0.0):
+        self.responder = responder or (lambda command: "ok")
+        self.delay = delay
+        self.commands = []
+
+    def sendto(self, data, address):
+        command = data.decode("utf-8")
+        self.commands.append(command)
+
+        response = self.responder(command)
+        if response is None:
+            return
+
+        def reply():
+            drone = tello_module.drones.get(address[0])
+            if drone is not None:
+                with drone["response_condition"]:
+                    drone["responses"].append(response.encode("utf-8"))
+                    drone["response_condition"].notify_all()
+
+        if self.delay:
+            threading.Timer(self.delay, reply).start()
+        else:
+            reply()
+
+
+@contextmanager
+def fake_drone(responder=None, delay=0.0):
+    """
+    Patch the Tello model so that no socket is bound and no receiver thread is started
+    """
+    drone = FakeDrone(responder, delay)
+    network = tello_module.network
+    with patch.object(network, "started", True), \
+            patch.object(network, "control_socket", drone), \
+            patch.object(network, "open_state_port", lambda port: port):
+        yield drone
@@ -0,0 +1,140 @@
+from unittest.mock import MagicMock, Mock, patch
+
+import av
+import numpy as np
+import pytest
+
+from src.models import BackgroundFrameRead
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+def make_video_frame(width=64, height=48):
+    """Create a decoded PyAV frame like the ones coming out of the Tello stream"""
+    image = np.zeros([height, width, 3], dtype=np.uint8)
+    image[:, :, 0] = 255
+    return av.VideoFrame.from_ndarray(image, format='rgb24').reformat(format='yuv420p')
+
+
+def make_container(frame_count):
+    """Create a mock PyAV container demuxing one packet per decoded frame"""
+    packets = []
+    for _ in range(frame_count):
+        packet = Mock()
+        packet.decode.return_value = [make_video_frame()]
+        packets.append(packet)
+
+    container = MagicMock()
+    container.demux.return_value = iter(packets)
+    return container
+
+
+@pytest.fixture
+def frame_read_factory():
+    """Fixture creating BackgroundFrameRead instances without opening a UDP stream"""
+    def factory(container=None, **kwargs):
+        with patch('src.models.tello.av.open', return_value=container or Mock()):
+            return BackgroundFrameRead(Mock(), 'udp://@0.0.0.0:11111', **kwargs)
+
+    return factory
+
+
+class TestBackgroundFrameRead:
+    @log_test
+    def test_convert_frame_downscales(self, frame_read_factory):
+        """Test frames are downscaled while being converted to RGB"""
+        frame_read = frame_read_factory(resolution=(32, 24))
+
+        converted = frame_read.convert_frame(make_video_frame())
+
+        assert converted.shape == (24, 32, 3)
+
+    @log_test
+    def test_on_demand_converts_lazily(self, frame_read_factory):
+        """Test the latest frame is only converted when it is read"""
+        frame_read = frame_read_factory(on_demand=True)
+        frame_read._pending_frame = make_video_frame()
+
+        frame = frame_read.frame
+
+        assert frame.shape == (48, 64, 3)
+        assert frame_read._pending_frame is None
+        assert frame_read.frame is frame
+
+    @log_test
+    def test_target_fps_drops_frames(self, frame_read_factory):
+        """Test frames arriving faster than the target fps are dropped"""
+        frame_read = frame_read_factory(target_fps=10)
+
+        with patch('src.models.tello.time.time', side_effect=[100.0, 100.05, 100.15]):
+            assert frame_read.accept_frame()
+            assert not frame_read.accept_frame()
+            assert frame_read.accept_frame()
+
+    @log_test
+    def test_target_fps_skips_packets_before_decoding(self, frame_read_factory):
+        """Test packets over the target fps are not decoded, up to the next keyframe"""
+        frame_read = frame_read_factory(target_fps=10)
+        frame_read.last_frame_timestamp = 100.0
+        keyframe, frame = Mock(is_keyframe=True), Mock(is_keyframe=False)
+
+        with patch('src.models.tello.time.time', side_effect=[100.05, 100.15]):
+            assert not frame_read.accept_packet(frame)
+            assert not frame_read.accept_packet(frame)
+            assert frame_read.accept_packet(keyframe)
+            assert frame_read.accept_packet(frame)
+
+        frame_read.set_target_fps(None)
+        assert frame_read.accept_packet(frame)
+
+    @log_test
+    def test_queued_frames_and_subscribers(self, frame_read_factory):
+        """Test the legacy queue and subscribers read the same frames"""
+        frame_read = frame_read_factory(with_queue=True)
+        subscriber = frame_read.subscribe()
+
+        frame_read.publish_frame("first")
+        frame_read.publish_frame("second")
+
+        assert frame_read.frame == "first"
+        assert frame_read.frame == "second"
+        assert frame_read.frame is None
+        assert subscriber.poll().image == "first"
+
+    @log_test
+    @pytest.mark.parametrize("pipelined", [False, True])
+    def test_decodes_every_frame(self, frame_read_factory, pipelined):
+        """Test the single threaded and the pipelined decoder publish every frame"""
+        frame_read = frame_read_factory(container=make_container(5), pipelined=pipelined, decoder_threads=2)
+        subscriber = frame_read.subscribe()
+
+        frame_read.start()
+        for worker in frame_read.workers:
+            worker.join(timeout=5)
+
+        frames = [subscriber.wait_for_next(timeout=1) for _ in range(5)]
+        assert [frame.seq for frame in frames] == [0, 1, 2, 3, 4]
+        assert frame_read.container.streams.video[0].codec_context.thread_count == 2
+        assert {'demux', 'decode', 'convert'} <= set(frame_read.get_stage_latency())
+        if pipelined:
+            assert {'decode_queue', 'convert_queue'} <= set(frame_read.get_stage_latency())
+
+    @log_test
+    def test_stats(self, frame_read_factory):
+        """Test the video health statistics of a finished stream"""
+        frame_read = frame_read_factory(container=make_container(3))
+        subscriber = frame_read.subscribe()
+
+        frame_read.start()
+        frame_read.worker.join(timeout=5)
+        subscriber.wait_for_next(timeout=1)
+        stats = frame_read.get_stats()
+
+        assert stats["frames_decoded"] >= 3
+        assert stats["frames_published"] >= 3
+        assert stats["queue_depth"]["subscribers"] == 2
+        assert stats["frame_age"]["count"] >= 1
+        assert not frame_read.is_stalled(timeout=60)
+        assert frame_read.is_stalled(timeout=-1)
@@ -0,0 +1,78 @@
+from threading import Thread
+
+from src.models import FrameBroadcaster
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+class TestFrameBroadcaster:
+    @log_test
+    def test_subscribers_see_every_frame(self):
+        """Test every subscriber reads the same frames independently"""
+        broadcaster = FrameBroadcaster(maxsize=4)
+        recorder = broadcaster.subscribe()
+        viewer = broadcaster.subscribe()
+
+        images = [object() for _ in range(3)]
+        for image in images:
+            broadcaster.publish(image)
+
+        assert [recorder.poll().image for _ in range(3)] == images
+        assert [viewer.poll().seq for _ in range(3)] == [0, 1, 2]
+        assert recorder.poll() is None
+
+    @log_test
+    def test_slow_subscriber_counts_dropped_frames(self):
+        """Test overwritten frames are reported as dropped"""
+        broadcaster = FrameBroadcaster(maxsize=2)
+        subscriber = broadcaster.subscribe()
+
+        for i in range(5):
+            broadcaster.publish(i)
+
+        assert subscriber.pending() == 2
+        assert subscriber.poll().image == 3
+        assert subscriber.dropped == 3
+        assert subscriber.received == 1
+
+    @log_test
+    def test_latest_skips_frames(self):
+        """Test skipping straight to the newest frame"""
+        broadcaster = FrameBroadcaster(maxsize=8)
+        subscriber = broadcaster.subscribe()
+
+        for i in range(4):
+            broadcaster.publish(i)
+
+        assert subscriber.latest().image == 3
+        assert subscriber.dropped == 3
+        assert subscriber.latest() is None
+
+    @log_test
+    def test_wait_for_next(self):
+        """Test waiting for a frame published from another thread"""
+        broadcaster = FrameBroadcaster()
+        subscriber = broadcaster.subscribe()
+
+        assert subscriber.wait_for_next(timeout=0.01) is None
+
+        publisher = Thread(target=broadcaster.publish, args=("frame",))
+        publisher.start()
+        frame = subscriber.wait_for_next(timeout=1)
+        publisher.join()
+
+        assert frame.image == "frame"
+        assert frame.age() >= 0
+
+    @log_test
+    def test_closed_subscriber_is_removed(self):
+        """Test closing a subscriber unregisters it"""
+        broadcaster = FrameBroadcaster()
+        subscriber = broadcaster.subscribe()
+        assert broadcaster.has_subscribers()
+
+        subscriber.close()
+
+        assert not broadcaster.has_subscribers()
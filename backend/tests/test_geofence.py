@@ -0,0 +1,152 @@
+from unittest.mock import patch
+
+import pytest
+
+from src.main import app
+from src.models import GeofenceViolation, SafetyEnvelope, Tello
+from src.models import tello as tello_module
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+from tests.fake_drone import fake_drone
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+BOX = SafetyEnvelope(box=(-100, -100, 100, 100), max_height=200, min_battery=20)
+
+
+def state_packet(h=80, bat=90):
+    return "mid:-1;x:0;y:0;z:0;pitch:0;roll:0;yaw:0;vgx:0;vgy:0;vgz:0;templ:60;temph:62;tof:{};h:{};bat:{};" \
+           "baro:0.0;time:5;agx:0.0;agy:0.0;agz:-1000.0;\r\n".format(h + 10, h, bat).encode("ASCII")
+
+
+class TestGeofence:
+
+    @log_test
+    def test_box_limits(self):
+        """Test the box, height and battery limits of an envelope"""
+        assert BOX.violation((0, 0, 80), battery=50) is None
+        assert "outside" in BOX.violation((150, 0, 80))
+        assert "above" in BOX.violation((0, 0, 250))
+        assert "battery" in BOX.violation((0, 0, 80), battery=10)
+
+    @log_test
+    def test_polygon_is_rasterized(self):
+        """Test that an L shaped polygon excludes its notch"""
+        envelope = SafetyEnvelope(polygon=[(0, 0), (400, 0), (400, 100), (100, 100), (100, 400), (0, 400)])
+
+        assert envelope.grid is not None
+        assert envelope.contains_ground(50, 50)
+        assert envelope.contains_ground(350, 50)
+        assert envelope.contains_ground(50, 350)
+        assert not envelope.contains_ground(300, 300)
+        assert not envelope.contains_ground(-10, 50)
+
+    @log_test
+    def test_motion_commands_are_checked(self):
+        """Test that a move leaving the envelope is not sent"""
+        with fake_drone() as drone:
+            tello = Tello("10.0.0.60")
+            tello.set_geofence(BOX)
+            Tello.handle_state_packet("10.0.0.60", tello.get_own_udp_object(), state_packet())
+
+            tello.move_forward(50)
+            with pytest.raises(GeofenceViolation):
+                tello.move_forward(150)
+            with pytest.raises(GeofenceViolation):
+                tello.move_up(150)
+            tello.rotate_clockwise(90)
+            with pytest.raises(GeofenceViolation):
+                tello.go_xyz_speed_mid(50, 0, 100, 50, 1)
+            with pytest.raises(GeofenceViolation):
+                tello.send_control_command("jump 0 0 100 50 0 m1 m2")
+            tello.land()
+
+            assert drone.commands == ["forward 50", "cw 90", "land"]
+            tello.clear_geofence()
+
+        tello_module.drones.pop("10.0.0.60", None)
+
+    @log_test
+    def test_rc_that_leaves_is_held(self):
+        """Test that rc sticks leading out of the envelope become a hover"""
+        with fake_drone() as drone:
+            tello = Tello("10.0.0.61")
+            geofence = tello.set_geofence(BOX)
+
+            assert geofence.filter_rc((0, 0, 80), 0, 0, 50, 0, 30) == (0, 50, 0, 30)
+            assert geofence.filter_rc((90, 0, 80), 0, 0, 50, 0, 30) == (0, 0, 0, 30)
+            assert geofence.filter_rc((90, 0, 80), 0, 0, -50, 0, 0) == (0, -50, 0, 0)
+            tello.clear_geofence()
+
+        tello_module.drones.pop("10.0.0.61", None)
+
+    @log_test
+    def test_watchdog_stops_on_breach(self):
+        """Test that the watchdog sends stop once when the drone is found too high, land on low battery"""
+        with fake_drone() as drone, patch.object(Tello, "PRIORITY_REPEAT", 1):
+            tello = Tello("10.0.0.62")
+            tello.set_geofence(BOX)
+            entry = tello.get_own_udp_object()
+
+            Tello.handle_state_packet("10.0.0.62", entry, state_packet(h=80))
+            assert drone.commands == []
+
+            Tello.handle_state_packet("10.0.0.62", entry, state_packet(h=250))
+            Tello.handle_state_packet("10.0.0.62", entry, state_packet(h=250))
+            assert drone.commands == ["stop"]
+            assert "above" in tello.get_geofence().breach
+
+            Tello.handle_state_packet("10.0.0.62", entry, state_packet(h=80))
+            assert tello.get_geofence().breach is None
+
+            Tello.handle_state_packet("10.0.0.62", entry, state_packet(h=80, bat=10))
+            assert drone.commands == ["stop", "land"]
+            tello.clear_geofence()
+
+        tello_module.drones.pop("10.0.0.62", None)
+
+    @log_test
+    def test_watchdog_lets_the_drone_fly_back(self):
+        """Test the watchdog acts once per breach, so commands flying the drone back in are not cancelled"""
+        with fake_drone() as drone, patch.object(Tello, "PRIORITY_REPEAT", 1):
+            tello = Tello("10.0.0.63")
+            tello.set_geofence(BOX)
+            entry = tello.get_own_udp_object()
+
+            for _ in range(5):
+                Tello.handle_state_packet("10.0.0.63", entry, state_packet(h=250))
+            tello.move_down(100)
+            Tello.handle_state_packet("10.0.0.63", entry, state_packet(h=250))
+            assert drone.commands == ["stop", "down 100"]
+
+            Tello.handle_state_packet("10.0.0.63", entry, state_packet(h=250, bat=10))
+            Tello.handle_state_packet("10.0.0.63", entry, state_packet(h=250, bat=10))
+            assert drone.commands == ["stop", "down 100", "land"]
+            tello.clear_geofence()
+
+        tello_module.drones.pop("10.0.0.63", None)
+
+
+class TestGeofenceRoutes:
+
+    @log_test
+    def test_rejected_commands_are_conflicts(self):
+        """Test that flips and rotations rejected by the geofence answer 409, reading and removing the geofence"""
+        host = Tello.TELLO_IP
+        client = app.test_client()
+
+        with fake_drone() as drone:
+            response = client.put("/tello/geofence", json={"box": [-100, -100, 100, 100], "min_battery": 20})
+            assert response.status_code == 200
+            Tello.handle_state_packet(host, tello_module.drones[host], state_packet(h=0, bat=10))
+
+            assert client.post("/tello/flip", json={"direction": "left"}).status_code == 409
+            assert client.post("/tello/rotate", json={"direction": "cw"}).status_code == 409
+            assert client.get("/tello/geofence").get_json()["message"]["min_battery"] == 20
+
+            assert client.delete("/tello/geofence").status_code == 200
+            assert client.get("/tello/geofence").get_json()["message"] is None
+            assert client.post("/tello/flip", json={"direction": "left"}).status_code == 200
+            assert drone.commands == ["flip l"]
+
+        tello_module.drones.pop(host, None)
@@ -0,0 +1,91 @@
+from src.models import Tello
+from src.models import tello as tello_module
+from src.models.health import (EVENT_DEGRADED, EVENT_LOST, EVENT_RECOVERED, STATUS_DEGRADED, STATUS_GOOD,
+                               STATUS_LOST, STATUS_UNKNOWN, HealthMonitor, LinkHealth)
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+from tests.fake_drone import fake_drone
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+def regular_packets(link, count, start=0.0, interval=0.1):
+    for i in range(count):
+        link.record_state(start + i * interval)
+    return start + (count - 1) * interval
+
+
+class TestLinkHealth:
+    @log_test
+    def test_regular_stream_is_good(self):
+        """Test a steady state stream gets a perfect score"""
+        link = LinkHealth()
+        assert link.status() == STATUS_UNKNOWN
+
+        last = regular_packets(link, 20)
+        assert link.loss == 0
+        assert link.score(now=last + 0.05) == 100
+        assert link.status(now=last + 0.05) == STATUS_GOOD
+
+    @log_test
+    def test_loss_degrades_link(self):
+        """Test gaps in the state stream are counted as lost packets"""
+        link = LinkHealth()
+        now = regular_packets(link, 10)
+        for _ in range(5):
+            now += 0.4  # three packets lost every time
+            link.record_state(now)
+
+        assert link.loss == 15 / 29
+        assert link.status(now=now) == STATUS_DEGRADED
+
+    @log_test
+    def test_silence_is_lost_link(self):
+        """Test the link is lost after half a second without state packets"""
+        link = LinkHealth()
+        last = regular_packets(link, 10)
+        assert link.status(now=last + 0.4) == STATUS_GOOD
+        assert link.status(now=last + 0.6) == STATUS_LOST
+        assert link.score(now=last + 0.6) == 0
+
+    @log_test
+    def test_slow_responses_lower_score(self):
+        """Test the round trip time is part of the score"""
+        link = LinkHealth()
+        last = regular_packets(link, 10)
+        assert link.score(rtt=0.5, now=last) == 90
+
+
+class TestHealthMonitor:
+    @log_test
+    def test_transitions(self):
+        """Test which status changes are reported"""
+        assert HealthMonitor.transition(STATUS_UNKNOWN, STATUS_GOOD) is None
+        assert HealthMonitor.transition(STATUS_GOOD, STATUS_DEGRADED) == EVENT_DEGRADED
+        assert HealthMonitor.transition(STATUS_DEGRADED, STATUS_LOST) == EVENT_LOST
+        assert HealthMonitor.transition(STATUS_LOST, STATUS_GOOD) == EVENT_RECOVERED
+
+    @log_test
+    def test_events_and_keepalive(self):
+        """Test listeners are notified and idle drones get a keepalive"""
+        with fake_drone() as drone:
+            tello = Tello("10.0.0.40")
+            link = tello.get_own_udp_object()['link']
+            monitor = HealthMonitor(tello, keepalive_idle=5.0)
+            events = []
+            monitor.add_listener(lambda host, event, health: events.append((host, event)))
+
+            last = regular_packets(link, 10, start=1000.0)
+            link.record_command(last)
+            monitor.check(now=last)
+            monitor.check(now=last + 1.0)
+            assert events == [("10.0.0.40", EVENT_LOST)]
+            assert drone.commands == []
+
+            now = regular_packets(link, LinkHealth.WINDOW + 1, start=last + 2.0)
+            monitor.check(now=now)
+            monitor._keepalive_thread.join(1)
+            assert events[-1] == ("10.0.0.40", EVENT_RECOVERED)
+            assert drone.commands == ["keepalive"]
+
+        tello_module.drones.pop("10.0.0.40", None)
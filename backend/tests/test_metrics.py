@@ -0,0 +1,87 @@
+import pytest
+
+from src.utils.Logger import Logger
+from src.main import app
+from src.utils.metrics import MetricsRegistry, render_prometheus
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+class TestMetrics:
+    @log_test
+    def test_counter_per_label(self, registry):
+        """Test counters keep one value per label combination"""
+        counter = registry.counter("packets_total", "Packets", ("stream",))
+
+        counter.inc(stream="a")
+        counter.inc(2, stream="a")
+        counter.inc(stream="b")
+
+        assert counter.get(stream="a") == 3
+        assert counter.get(stream="b") == 1
+        assert registry.counter("packets_total") is counter
+
+    @log_test
+    def test_wrong_labels_rejected(self, registry):
+        """Test metrics refuse unexpected labels"""
+        counter = registry.counter("packets_total", "Packets", ("stream",))
+
+        with pytest.raises(ValueError):
+            counter.inc(host="a")
+
+    @log_test
+    def test_histogram_quantiles(self, registry):
+        """Test histogram summaries"""
+        histogram = registry.histogram("decode_seconds", "Decode time", buckets=(0.01, 0.1, 1.0))
+
+        for value in (0.005, 0.05, 0.05, 0.5):
+            histogram.observe(value)
+
+        summary = histogram.get().to_dict()
+        assert summary["count"] == 4
+        assert summary["mean"] == pytest.approx(0.15125)
+        assert 0.01 <= summary["p50"] <= 0.1
+        assert 0.1 <= summary["p99"] <= 1.0
+
+    @log_test
+    def test_collect_snapshot(self, registry):
+        """Test collecting a JSON friendly snapshot filtered by prefix"""
+        registry.gauge("video_queue_depth", "Queue depth", ("queue",)).set(3, queue="frames")
+        registry.counter("command_total", "Commands").inc()
+
+        snapshot = registry.collect("video")
+
+        assert list(snapshot) == ["video_queue_depth"]
+        assert snapshot["video_queue_depth"]["samples"] == [{"labels": {"queue": "frames"}, "value": 3}]
+
+    @log_test
+    def test_render_prometheus(self, registry):
+        """Test the Prometheus text exposition format"""
+        registry.counter("tello_command_retries_total", "Retries", ("host", "verb")).inc(host="10.0.0.1", verb="cw")
+        registry.histogram("tello_command_duration_seconds", "RTT", ("verb",), buckets=(0.1, 1.0)).observe(0.5, verb="cw")
+
+        text = render_prometheus(registry)
+
+        assert "# TYPE tello_command_retries_total counter" in text
+        assert 'tello_command_retries_total{host="10.0.0.1",verb="cw"} 1' in text
+        assert 'tello_command_duration_seconds_bucket{verb="cw",le="0.1"} 0' in text
+        assert 'tello_command_duration_seconds_bucket{verb="cw",le="+Inf"} 1' in text
+        assert 'tello_command_duration_seconds_count{verb="cw"} 1' in text
+
+    @log_test
+    def test_metrics_endpoint(self):
+        """Test the /metrics endpoint reports HTTP route latency"""
+        client = app.test_client()
+
+        client.get("/tello/video/metrics")
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.mimetype == "text/plain"
+        assert 'route="/tello/video/metrics"' in response.get_data(as_text=True)
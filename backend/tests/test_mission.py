@@ -0,0 +1,209 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from src.models import TelloException
+from src.models import mission as mission_module
+from src.models.mission import (EVENT_MISSION_ABORTED, EVENT_MISSION_DONE, EVENT_STEP_DONE, STATUS_ABORTED,
+                                STATUS_DONE, STATUS_FAILED, STATUS_RUNNING, MissionError, MissionRunner,
+                                abort_missions, compile_mission, missions)
+from src.utils.Logger import Logger
+from src.utils.lazy_import import MissingModule
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+SQUARE = {
+    "name": "square",
+    "speed": 50,
+    "steps": [{"action": "takeoff"}] + [
+        step for _ in range(4) for step in ({"action": "move", "direction": "forward", "distance": 100},
+                                            {"action": "rotate", "direction": "cw", "angle": 90})
+    ] + [{"action": "land"}],
+}
+
+
+class StubTello:
+    """Acknowledges every command, a command can be held until released"""
+
+    def __init__(self, battery=100, host="192.168.10.1"):
+        self.address = (host, 8889)
+        self.battery = battery
+        self.commands = []
+        self.hold = None
+        self.fail = None
+
+    def get_battery(self):
+        return self.battery
+
+    def send_control_command(self, command):
+        self.commands.append(command)
+        if self.hold is not None:
+            self.hold.wait(2)
+        if command == self.fail:
+            raise TelloException("Command '{}' was unsuccessful".format(command))
+        return True
+
+    def takeoff(self):
+        self.send_control_command("takeoff")
+
+    def send_keepalive(self):
+        self.send_control_command("keepalive")
+
+    def land(self):
+        self.commands.append("land")
+
+
+class TestMission:
+
+    @log_test
+    def test_compile_square(self):
+        """Test that a mission compiles into SDK commands with a dead reckoned path"""
+        plan = compile_mission(SQUARE)
+
+        assert [step.command for step in plan.steps] == [
+            "speed 50", "takeoff"] + ["forward 100", "cw 90"] * 4 + ["land"]
+        x, y, z = plan.steps[3].position
+        assert (round(x), round(y), z) == (100, 0, 80)
+        x, y, z = plan.steps[5].position
+        assert (round(x), round(y)) == (100, -100)
+        x, y, z = plan.path()[-1]
+        assert (round(x), round(y), z) == (0, 0, 0)
+        assert plan.duration > 8 * 2
+        assert plan.required_battery > plan.battery > 0
+
+    @log_test
+    def test_compile_from_yaml(self):
+        """Test that a YAML mission is parsed"""
+        pytest.importorskip("yaml")
+        plan = compile_mission("name: hop\nsteps:\n  - action: takeoff\n  - action: hover\n    seconds: 1.5\n"
+                               "  - action: land\n")
+
+        assert plan.name == "hop"
+        assert [step.action for step in plan.steps] == ["speed", "takeoff", "hover", "land"]
+        assert plan.steps[2].command is None
+
+    @log_test
+    def test_unreadable_document(self):
+        """Test that a document that is neither JSON nor YAML, or YAML without PyYAML, is a MissionError"""
+        pytest.importorskip("yaml")
+        for text in ("{{{", "steps: ["):
+            with pytest.raises(MissionError) as error:
+                compile_mission(text)
+            assert "line 1" in error.value.errors[0]
+
+        with patch.object(mission_module, "yaml", MissingModule("yaml")), pytest.raises(MissionError) as error:
+            compile_mission("name: hop")
+        assert "PyYAML" in error.value.errors[0]
+
+    @log_test
+    def test_validation_reports_every_error(self):
+        """Test that validation collects all the errors of a mission before raising"""
+        mission = {"steps": [
+            {"action": "move", "direction": "forward", "distance": 100},
+            {"action": "takeoff"},
+            {"action": "move", "direction": "forward", "distance": 600},
+            {"action": "rotate", "direction": "up", "angle": 90},
+            {"action": "go", "x": 10, "y": 10, "z": 10, "speed": 50},
+            {"action": "move", "direction": "down", "distance": 200},
+            {"action": "teleport"},
+        ]}
+
+        with pytest.raises(MissionError) as error:
+            compile_mission(mission)
+
+        errors = error.value.errors
+        assert any(e.startswith("step 1:") and "flying" in e for e in errors)
+        assert any(e.startswith("step 3:") and "'distance'" in e for e in errors)
+        assert any(e.startswith("step 4:") and "direction" in e for e in errors)
+        assert any(e.startswith("step 5:") and "-20 and 20" in e for e in errors)
+        assert any(e.startswith("step 6:") and "below" in e for e in errors)
+        assert any(e.startswith("step 7:") and "teleport" in e for e in errors)
+        assert any("land" in e for e in errors)
+
+    @log_test
+    def test_runner_flies_plan(self):
+        """Test that the runner sends every command and reports progress"""
+        tello = StubTello()
+        runner = MissionRunner(tello, compile_mission(SQUARE))
+        events = []
+        runner.add_listener(events.append)
+
+        runner.run()
+
+        assert runner.status == STATUS_DONE
+        assert tello.commands == [step.command for step in runner.plan.steps]
+        done = [event for event in events if event["event"] == EVENT_STEP_DONE]
+        assert len(done) == len(runner.plan.steps) and done[-1]["progress"] == 1
+        assert events[-1]["event"] == EVENT_MISSION_DONE
+
+    @log_test
+    def test_runner_checks_battery(self):
+        """Test that the runner does not take off without enough battery"""
+        tello = StubTello(battery=5)
+        runner = MissionRunner(tello, compile_mission(SQUARE))
+
+        runner.run()
+
+        assert runner.status == STATUS_FAILED
+        assert "Battery" in runner.error
+        assert tello.commands == []
+
+    @log_test
+    def test_runner_abort_lands(self):
+        """Test that aborting stops after the current step and lands"""
+        tello = StubTello()
+        tello.hold = threading.Event()
+        runner = MissionRunner(tello, compile_mission(SQUARE))
+        events = []
+        runner.add_listener(events.append)
+
+        runner.start()
+        while len(tello.commands) < 3:
+            threading.Event().wait(0.01)
+        runner.abort()
+        tello.hold.set()
+        runner.worker.join(2)
+
+        assert runner.status == STATUS_ABORTED
+        assert tello.commands == ["speed 50", "takeoff", "forward 100", "land"]
+        assert events[-1]["event"] == EVENT_MISSION_ABORTED
+
+    @log_test
+    def test_runner_failure_lands(self):
+        """Test that a mission failing once the drone may be in the air lands it"""
+        tello = StubTello()
+        tello.fail = "takeoff"
+        runner = MissionRunner(tello, compile_mission(SQUARE))
+
+        runner.run()
+
+        assert runner.status == STATUS_FAILED
+        assert tello.commands == ["speed 50", "takeoff", "land"]
+
+    @log_test
+    def test_runner_keeps_hovering_drone_flying(self):
+        """Test that a long hover sends keepalives instead of letting the drone land on its own"""
+        tello = StubTello()
+        plan = compile_mission({"steps": [{"action": "takeoff"}, {"action": "hover", "seconds": 0.25},
+                                          {"action": "land"}]})
+
+        with patch.object(mission_module, "HOVER_KEEPALIVE_INTERVAL", 0.1):
+            MissionRunner(tello, plan).run()
+
+        assert tello.commands == ["speed 50", "takeoff", "keepalive", "keepalive", "land"]
+
+    @log_test
+    def test_abort_missions_of_one_drone(self):
+        """Test that aborting the missions of a host leaves the missions of other drones flying"""
+        runners = [MissionRunner(StubTello(host=host), compile_mission(SQUARE)) for host in ("10.0.0.1", "10.0.0.2")]
+        for runner in runners:
+            runner.status = STATUS_RUNNING
+            missions[runner.id] = runner
+
+        abort_missions(land=False, host="10.0.0.2")
+
+        assert [runner._aborted.is_set() for runner in runners] == [False, True]
+        for runner in runners:
+            del missions[runner.id]
@@ -0,0 +1,84 @@
+import threading
+
+from src.models.mission_pads import (EVENT_PAD_DETECTED, EVENT_PAD_LOST, EVENT_PAD_POSITION, NO_PAD,
+                                     MissionPadTracker)
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+def feed(tracker, mid, count=1, x=0, y=0, z=0):
+    for _ in range(count):
+        tracker.update({"mid": mid, "x": x, "y": y, "z": z})
+
+
+class TestMissionPadTracker:
+    @log_test
+    def test_detection_is_debounced(self):
+        """Test a pad is only detected after enough consecutive packets"""
+        tracker = MissionPadTracker(debounce=3)
+        events = []
+        tracker.add_listener(events.append)
+
+        feed(tracker, 4, count=2)
+        feed(tracker, NO_PAD)
+        feed(tracker, 4, count=2)
+        assert tracker.pad == NO_PAD
+        assert events == []
+
+        feed(tracker, 4, x=10, y=20, z=30)
+        assert tracker.pad == 4
+        assert [(e["event"], e["pad"], e["position"]) for e in events] == [(EVENT_PAD_DETECTED, 4, (10, 20, 30))]
+
+        feed(tracker, NO_PAD, count=3)
+        assert events[-1]["event"] == EVENT_PAD_LOST
+        assert events[-1]["pad"] == 4
+
+    @log_test
+    def test_position_updates(self):
+        """Test position events are only sent when the position moved"""
+        tracker = MissionPadTracker(debounce=1, position_threshold=2)
+        feed(tracker, 1, x=10)
+        feed(tracker, 1, x=11)
+        feed(tracker, 1, x=13)
+
+        events = tracker.events_since(0)
+        assert [e["event"] for e in events] == [EVENT_PAD_DETECTED, EVENT_PAD_POSITION]
+        assert events[-1]["position"] == (13, 0, 0)
+        assert tracker.events_since(events[0]["seq"]) == events[1:]
+
+    @log_test
+    def test_wait_for_pad(self):
+        """Test waiting for a specific pad wakes up once it is detected"""
+        tracker = MissionPadTracker(debounce=1)
+        assert tracker.wait_for_pad(timeout=0.01) is None
+
+        feed(tracker, 3)
+        assert tracker.wait_for_pad(timeout=0.01) == 3
+
+        threading.Timer(0.05, feed, (tracker, 1)).start()
+        assert tracker.wait_for_pad(1, timeout=2) == 1
+
+    @log_test
+    def test_packets_without_mission_pads(self):
+        """Test state packets of drones without mission pads are ignored"""
+        tracker = MissionPadTracker(debounce=1)
+        tracker.update({"bat": 80})
+        assert tracker.to_dict() == {"pad": NO_PAD, "position": None, "sequence": 0}
+
+    @log_test
+    def test_invalid_pad_ids_are_no_pad(self):
+        """Test ids outside 1-8, like -2 when detection is off, count as no pad"""
+        tracker = MissionPadTracker(debounce=1)
+        events = []
+        tracker.add_listener(events.append)
+
+        feed(tracker, -2, count=3)
+        feed(tracker, 0)
+        assert tracker.pad == NO_PAD and events == []
+        assert tracker.wait_for_pad(timeout=0.01) is None
+
+        feed(tracker, 8)
+        feed(tracker, -2)
+        assert [(e["event"], e["pad"]) for e in events] == [(EVENT_PAD_DETECTED, 8), (EVENT_PAD_LOST, 8)]
@@ -0,0 +1,95 @@
+import socket
+import time
+
+import pytest
+
+from src.models.network import TelloNetwork
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def network():
+    received = []
+    network = TelloNetwork(control_port=0, bind_host="127.0.0.1")
+    network.received = received
+    network.start(lambda host, drone, data: received.append(("response", host, data)),
+                  lambda host, drone, data: received.append(("state", host, data)))
+    yield network
+    network.close()
+
+
+def drone_socket(host):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((host, 0))
+    return sock
+
+
+class TestTelloNetwork:
+    @log_test
+    def test_routes_responses_by_host(self, network):
+        """Test responses are handed to the drone they came from, unknown hosts are ignored"""
+        network.register("127.0.0.1", dict)
+        network.register("127.0.0.2", dict)
+
+        for host in ("127.0.0.2", "127.0.0.1", "127.0.0.3"):
+            sock = drone_socket(host)
+            sock.sendto(host.encode(), ("127.0.0.1", network.control_port))
+            sock.close()
+
+        assert wait_until(lambda: len(network.received) == 2)
+        time.sleep(0.05)
+        assert sorted(network.received) == [("response", "127.0.0.1", b"127.0.0.1"),
+                                            ("response", "127.0.0.2", b"127.0.0.2")]
+
+    @log_test
+    def test_state_ports_per_drone(self, network):
+        """Test several state ports can be opened and receive packets of their drones"""
+        network.register("127.0.0.1", dict)
+        first_port = network.open_state_port(0)
+        second_port = network.open_state_port(0)
+        assert first_port != second_port
+        assert network.open_state_port(first_port) == first_port
+
+        sock = drone_socket("127.0.0.1")
+        sock.sendto(b"bat:80;", ("127.0.0.1", first_port))
+        sock.sendto(b"bat:70;", ("127.0.0.1", second_port))
+        sock.close()
+
+        assert wait_until(lambda: len(network.received) == 2)
+        assert sorted(network.received) == [("state", "127.0.0.1", b"bat:70;"), ("state", "127.0.0.1", b"bat:80;")]
+
+    @log_test
+    def test_register_keeps_entry(self, network):
+        """Test registering a known host returns its existing entry"""
+        entry = network.register("10.0.0.1", lambda: {"state": {}})
+        assert network.register("10.0.0.1", dict) is entry
+
+        network.unregister("10.0.0.1")
+        assert "10.0.0.1" not in network.drones
+
+    @log_test
+    def test_entry_kept_while_acquired(self, network):
+        """Test the entry of a drone is only dropped when its last user releases it"""
+        entry = network.acquire("10.0.0.2", dict)
+        assert network.acquire("10.0.0.2", dict) is entry
+
+        network.release("10.0.0.2")
+        assert network.drones["10.0.0.2"] is entry
+        network.release("10.0.0.2", unregister=False)
+        assert network.drones["10.0.0.2"] is entry
+
+        network.acquire("10.0.0.2", dict)
+        network.release("10.0.0.2")
+        assert "10.0.0.2" not in network.drones
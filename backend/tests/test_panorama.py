@@ -0,0 +1,135 @@
+import threading
+
+import numpy as np
+import pytest
+
+from src.models import FrameBroadcaster
+from src.models.panorama import (MODE_FULL, MODE_HALF, STATUS_DONE, STATUS_FAILED, PanoramaJob,
+                                 angle_difference)
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+class StubFrameRead:
+    """Publishes a frame every 10 ms until stopped"""
+
+    def __init__(self):
+        self.broadcaster = FrameBroadcaster(8)
+        self.stopped = threading.Event()
+        threading.Thread(target=self.publish, daemon=True).start()
+
+    def publish(self):
+        while not self.stopped.wait(0.01):
+            self.broadcaster.publish(np.zeros((2, 2, 3), dtype=np.uint8))
+
+    def subscribe(self):
+        return self.broadcaster.subscribe()
+
+    def stop(self):
+        self.stopped.set()
+
+
+class StubTello:
+    """Turns instantly, the yaw follows the rotations"""
+
+    def __init__(self):
+        self.yaw = 0
+        self.stream_on = False
+        self.rotations = []
+        self.frame_read = StubFrameRead()
+        self.background_frame_read = None
+
+    def streamon(self):
+        self.stream_on = True
+
+    def streamoff(self):
+        self.stream_on = False
+
+    def get_frame_read(self):
+        self.background_frame_read = self.frame_read
+        return self.frame_read
+
+    def get_yaw(self):
+        return self.yaw
+
+    def wait_until_stable(self, timeout=5.0):
+        return True
+
+    def rotate_clockwise(self, x):
+        self.rotations.append(x)
+        self.yaw = (self.yaw + x + 180) % 360 - 180
+
+    def rotate_counter_clockwise(self, x):
+        self.rotations.append(-x)
+        self.yaw = (self.yaw - x + 180) % 360 - 180
+
+
+@pytest.fixture
+def tello():
+    tello = StubTello()
+    yield tello
+    tello.frame_read.stopped.set()
+
+
+def run_job(job):
+    job.SETTLE_POLL_INTERVAL = 0.01
+    job.start()
+    job.worker.join(5)
+    return job
+
+
+class TestPanoramaJob:
+    @log_test
+    def test_angle_difference(self):
+        """Test heading differences wrap around"""
+        assert angle_difference(170, -170) == -20
+        assert angle_difference(-170, 170) == 20
+
+    @log_test
+    def test_full_panorama(self, tello):
+        """Test a full panorama turns 360 degrees and captures a frame per heading"""
+        job = run_job(PanoramaJob(tello, MODE_FULL, stitcher=lambda frames: len(frames)))
+
+        assert job.status == STATUS_DONE, job.error
+        assert tello.rotations == [80, 80, 80, 80, 40]
+        assert job.headings == [0, 80, 160, -120, -40]
+        assert job.panorama == 5
+
+    @log_test
+    def test_half_panorama_counter_clockwise(self, tello):
+        """Test the half panorama turns back to where it started"""
+        job = run_job(PanoramaJob(tello, MODE_HALF, "ccw", stitcher=lambda frames: len(frames)))
+
+        assert job.status == STATUS_DONE, job.error
+        assert tello.rotations == [90, -60, -60, -60, 90]
+        assert tello.yaw == 0
+
+    @log_test
+    def test_stitching_error(self, tello):
+        """Test a failing stitcher fails the job with its error"""
+        def stitcher(frames):
+            raise ValueError("not enough overlap")
+
+        job = run_job(PanoramaJob(tello, MODE_HALF, stitcher=stitcher))
+        assert job.status == STATUS_FAILED
+        assert job.to_dict()["error"] == "not enough overlap"
+
+    @log_test
+    def test_video_started_by_the_job_is_stopped(self, tello):
+        """Test the job stops the frame reader and the stream it started, and leaves running ones alone"""
+        job = run_job(PanoramaJob(tello, MODE_HALF, stitcher=lambda frames: len(frames)))
+
+        assert job.status == STATUS_DONE, job.error
+        assert tello.frame_read.stopped.is_set()
+        assert tello.background_frame_read is None and not tello.stream_on
+
+        tello.frame_read = StubFrameRead()
+        tello.streamon()
+        tello.get_frame_read()
+        job = run_job(PanoramaJob(tello, MODE_HALF, stitcher=lambda frames: len(frames)))
+
+        assert job.status == STATUS_DONE, job.error
+        assert not tello.frame_read.stopped.is_set()
+        assert tello.background_frame_read is tello.frame_read and tello.stream_on
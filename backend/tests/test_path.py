@@ -0,0 +1,58 @@
+from src.models.mission import compile_mission
+from src.models.path import MAX_DISTANCE, circumradius, optimize_path
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+class TestPath:
+
+    @log_test
+    def test_merges_collinear_legs(self):
+        """Test that legs going the same way become one go command"""
+        plan = optimize_path([(100, 0, 0), (200, 0, 0), (300, 0, 0), (300, 0, 100)], curves=False)
+
+        assert [command.to_command() for command in plan.commands] == ["go 300 0 0 50", "go 0 0 100 50"]
+        assert plan.naive_commands == 4
+        assert plan.duration < plan.naive_duration
+
+    @log_test
+    def test_splits_long_and_skips_short_legs(self):
+        """Test that legs are fitted to the 20-500 cm range of the SDK"""
+        plan = optimize_path([(1200, 0, 0), (1210, 5, 0), (1210, 5, 100)], curves=False)
+
+        ends = [command.end for command in plan.commands]
+        assert ends == [(400, 0, 0), (400, 0, 0), (400, 0, 0), (10, 5, 100)]
+        assert all(abs(c) <= MAX_DISTANCE for end in ends for c in end)
+        assert len(plan.warnings) == 1
+
+    @log_test
+    def test_gentle_turn_is_a_curve(self):
+        """Test that a gentle turn within the radius limits is flown as one curve"""
+        plan = optimize_path([(300, 0, 0), (400, 50, 0)])
+
+        assert [command.to_command() for command in plan.commands] == ["curve 300 0 0 400 50 0 50"]
+        assert 50 <= circumradius((300, 0, 0), (100, 50, 0)) <= 1000
+        assert plan.to_dict()["after"]["commands"] == 1
+
+    @log_test
+    def test_sharp_turn_stops(self):
+        """Test that a corner sharper than max_turn is flown with two go commands"""
+        plan = optimize_path([(100, 0, 0), (100, 100, 0)], max_turn=60)
+
+        assert [command.action for command in plan.commands] == ["go", "go"]
+
+    @log_test
+    def test_mission_waypoints_step(self):
+        """Test that a waypoints step compiles into the optimized commands"""
+        plan = compile_mission({"steps": [
+            {"action": "takeoff"},
+            {"action": "waypoints", "points": [[100, 0, 0], [200, 0, 0], [200, 0, 100]], "curves": False},
+            {"action": "land"},
+        ]})
+
+        assert [step.command for step in plan.steps] == [
+            "speed 50", "takeoff", "go 200 0 0 50", "go 0 0 100 50", "land"]
+        x, y, z = plan.steps[3].position
+        assert (round(x), round(y), round(z)) == (200, 0, 180)
@@ -0,0 +1,122 @@
+import pytest
+
+from src.main import app
+from src.models import Tello
+from src.models import tello as tello_module
+from src.models.pose import PoseEstimator
+from src.models.telemetry import TelemetryHistory
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+from tests.fake_drone import fake_drone
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+def feed(history, start, seconds, rate=10, **state):
+    """Append `seconds` of identical state packets, returns the time after the last one"""
+    samples = int(seconds * rate)
+    for i in range(samples):
+        history.append(dict({"yaw": 0, "h": 80, "mid": -1}, **state), timestamp=start + i / rate)
+    return start + samples / rate
+
+
+class TestPose:
+
+    @log_test
+    def test_integrates_velocity(self):
+        """Test that flying forward at 50 cm/s for 4 seconds moves the pose about 200 cm forward"""
+        history = TelemetryHistory()
+        estimator = PoseEstimator(history)
+        t = feed(history, 0, 1, vgx=0, vgy=0, vgz=0)
+        t = feed(history, t, 4, vgx=5, vgy=0, vgz=0)
+        feed(history, t, 1, vgx=0, vgy=0, vgz=0)
+
+        pose = estimator.get_pose()
+
+        assert pose["x"] == pytest.approx(200, abs=25)
+        assert pose["y"] == pytest.approx(0, abs=1)
+        assert pose["z"] == 80
+        assert pose["velocity"][:2] == [0, 0]
+
+    @log_test
+    def test_streaming_matches_batch(self):
+        """Test that integrating packet by packet gives the same pose as one batch"""
+        batch_history, stream_history = TelemetryHistory(), TelemetryHistory()
+        batch, stream = PoseEstimator(batch_history), PoseEstimator(stream_history)
+
+        t = 0
+        for vgx, vgy in [(0, 0), (3, 0), (3, 2), (0, -4), (0, 0)]:
+            for i in range(10):
+                state = {"yaw": 0, "h": 80, "vgx": vgx, "vgy": vgy, "vgz": 0, "agx": 5, "agy": -3}
+                batch_history.append(state, timestamp=t)
+                stream_history.append(state, timestamp=t)
+                stream.update()
+                t += 0.1
+
+        assert stream.get_pose()["x"] == pytest.approx(batch.get_pose()["x"], abs=0.5)
+        assert stream.get_pose()["y"] == pytest.approx(batch.get_pose()["y"], abs=0.5)
+
+    @log_test
+    def test_heading_rotates_velocity(self):
+        """Test that after turning 90 degrees clockwise flying forward moves the pose to the right"""
+        history = TelemetryHistory()
+        estimator = PoseEstimator(history)
+        t = feed(history, 0, 1, vgx=0, vgy=0, vgz=0)
+        feed(history, t, 2, yaw=90, vgx=5, vgy=0, vgz=0)
+
+        pose = estimator.get_pose()
+
+        assert pose["heading"] == 90
+        assert pose["x"] == pytest.approx(0, abs=1)
+        assert pose["y"] < -70
+
+    @log_test
+    def test_learns_accelerometer_bias(self):
+        """Test that a constant accelerometer offset while hovering does not make the pose drift"""
+        history = TelemetryHistory()
+        estimator = PoseEstimator(history)
+        feed(history, 0, 20, vgx=0, vgy=0, vgz=0, agx=30, agy=-20)
+
+        pose = estimator.get_pose()
+        assert estimator.bias[0] > 0 and estimator.bias[1] < 0
+        assert abs(pose["x"]) < 1 and abs(pose["y"]) < 1
+
+    @log_test
+    def test_mission_pad_fix(self):
+        """Test that seeing a known pad again removes the accumulated drift"""
+        history = TelemetryHistory()
+        estimator = PoseEstimator(history, pads={1: (100, 0)})
+        t = feed(history, 0, 2, vgx=3, vgy=0, vgz=0)
+        feed(history, t, 1, vgx=0, vgy=0, vgz=0, mid=1, x=-10, y=5, z=80)
+
+        pose = estimator.get_pose()
+
+        assert (pose["x"], pose["y"]) == (90, 5)
+        assert pose["fix"]["pad"] == 1
+
+
+class TestPoseRoutes:
+
+    @log_test
+    def test_pose_survives_requests(self):
+        """Test that the per request Tello instances keep the shared pose of the drone"""
+        host = Tello.TELLO_IP
+        client = app.test_client()
+        packet = b"mid:-1;x:0;y:0;z:0;pitch:0;roll:0;yaw:0;vgx:5;vgy:0;vgz:0;templ:60;temph:62;tof:90;h:80;" \
+                 b"bat:90;baro:0.0;time:5;agx:0.0;agy:0.0;agz:-1000.0;\r\n"
+
+        with fake_drone():
+            client.post("/tello/pose/reset")
+            for _ in range(5):
+                Tello.handle_state_packet(host, tello_module.drones[host], packet)
+            first = client.get("/tello/pose").get_json()["message"]
+
+            assert host in tello_module.drones
+            for _ in range(5):
+                Tello.handle_state_packet(host, tello_module.drones[host], packet)
+            second = client.get("/tello/pose").get_json()["message"]
+
+        assert first["samples"] == 5
+        assert second["samples"] == 10
+        assert host in tello_module.drones
+        tello_module.drones.pop(host, None)
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from src.models import CommandCancelled, Tello, TelloException
+from src.models import tello as tello_module
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+from tests.fake_drone import fake_drone
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+def run_in_thread(function, *args):
+    """Run function on a thread, returns the thread and a list receiving its exception"""
+    errors = []
+
+    def target():
+        try:
+            function(*args)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread, errors
+
+
+def wait_for(condition, timeout=1.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+class TestPriorityCommands:
+
+    @log_test
+    def test_in_flight_command_is_cancelled(self):
+        """Test stop wakes up and cancels a motion command waiting for its response"""
+        with fake_drone(lambda command: None if command == "forward 100" else "ok") as drone:
+            tello = Tello("10.0.0.70")
+            thread, errors = run_in_thread(tello.move_forward, 100)
+            assert wait_for(lambda: "forward 100" in drone.commands)
+
+            tello.stop()
+            thread.join(1)
+
+            assert not thread.is_alive()
+            assert isinstance(errors[0], CommandCancelled)
+            assert wait_for(lambda: drone.commands.count("stop") == Tello.PRIORITY_REPEAT)
+            assert tello.get_outstanding_commands()[0]["abandoned_at"] is not None
+            assert tello_module.cancelled_commands.get(host="10.0.0.70", verb="forward") == 1
+
+        tello_module.drones.pop("10.0.0.70", None)
+
+    @log_test
+    def test_queued_command_is_not_sent(self):
+        """Test a command waiting for the command lock is cancelled by emergency and never sent"""
+        with fake_drone() as drone:
+            tello = Tello("10.0.0.71")
+            lock = tello.get_own_udp_object()["command_lock"]
+            lock.acquire()
+            thread, errors = run_in_thread(tello.rotate_clockwise, 90)
+            time.sleep(0.05)
+
+            started = time.perf_counter()
+            tello.emergency()
+            elapsed = time.perf_counter() - started
+            lock.release()
+            thread.join(1)
+
+            assert elapsed < Tello.TIME_BTW_COMMANDS
+            assert isinstance(errors[0], CommandCancelled)
+            assert drone.commands[0] == "emergency"
+            assert "cw 90" not in drone.commands
+            assert not tello.is_flying
+
+            tello.rotate_counter_clockwise(90)
+            assert "ccw 90" in drone.commands
+
+        tello_module.drones.pop("10.0.0.71", None)
+
+    @log_test
+    def test_only_priority_commands(self):
+        """Test the priority lane refuses other commands"""
+        with pytest.raises(TelloException):
+            Tello("10.0.0.72").send_priority_command("forward 20")
+        tello_module.drones.pop("10.0.0.72", None)
+
+    @log_test
+    def test_priority_replies_are_not_taken_by_next_command(self):
+        """Test the replies to stop and its copies are attributed to them, not to the next command"""
+        with fake_drone(lambda command: "ok" if command == "stop" else None) as drone:
+            tello = Tello("10.0.0.73")
+            late = tello_module.late_responses.get(host="10.0.0.73", verb="stop")
+
+            tello.send_priority_command("stop")
+            with pytest.raises(TelloException):
+                tello.send_control_command("forward 50", timeout=0.2)
+
+            assert drone.commands.count("stop") == Tello.PRIORITY_REPEAT
+            assert "forward 50" in drone.commands
+            assert tello_module.late_responses.get(host="10.0.0.73", verb="stop") == late + Tello.PRIORITY_REPEAT
+
+        tello_module.drones.pop("10.0.0.73", None)
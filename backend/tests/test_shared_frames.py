@@ -0,0 +1,66 @@
+import numpy as np
+
+from src.models import FrameBroadcaster
+from src.models.shared_frames import SharedFrameRing, attach_frame
+from src.models.vision import FORMAT_GRAY, VisionPipeline, VisionStage
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+from tests.test_vision import StubFrameRead, make_image
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+class MeanStage(VisionStage):
+    """Picklable stage for the process pool"""
+    name = "mean"
+    resolution = (4, 3)
+    image_format = FORMAT_GRAY
+
+    def process(self, image, metadata):
+        return [float(image.mean()), list(image.shape), image.flags.owndata]
+
+
+class TestSharedFrameRing:
+    @log_test
+    def test_write_and_attach(self):
+        """Test a frame written to the ring can be read back through its reference"""
+        ring = SharedFrameRing((6, 8, 3), slots=2)
+        try:
+            image = make_image()
+            ref = ring.write(image)
+            frame = attach_frame(ref)
+
+            assert ref.shape == (6, 8, 3)
+            np.testing.assert_array_equal(frame, image)
+            assert not frame.flags.owndata
+            del frame
+        finally:
+            ring.close()
+
+    @log_test
+    def test_busy_slots(self):
+        """Test slots are only reused after they were released"""
+        ring = SharedFrameRing((2, 2), slots=2)
+        try:
+            first = ring.write(np.zeros((2, 2), dtype=np.uint8))
+            second = ring.write(np.ones((2, 2), dtype=np.uint8))
+            assert {first.slot, second.slot} == {0, 1}
+            assert ring.write(np.ones((2, 2), dtype=np.uint8), timeout=0.05) is None
+
+            ring.release(first)
+            assert ring.write(np.ones((2, 2), dtype=np.uint8), timeout=0.05).slot == first.slot
+        finally:
+            ring.close()
+
+
+class TestProcessPipeline:
+    @log_test
+    def test_stages_read_shared_frames(self):
+        """Test stages in worker processes get their input from shared memory"""
+        pipeline = VisionPipeline(StubFrameRead(), [MeanStage()], workers=1, use_processes=True)
+        try:
+            frame = FrameBroadcaster(1).publish(make_image())
+            assert pipeline.process_frame(frame) == {"mean": [76.0, [3, 4], False]}
+            assert all(not any(ring.busy) for ring in pipeline.rings.values())
+        finally:
+            pipeline.stop()
@@ -0,0 +1,68 @@
+from src.main import app, socketio
+from src.models import tello as tello_module
+from src.models.mission_pads import EVENT_PAD_DETECTED
+from src.utils.Logger import Logger
+from src.utils.telemetry_codec import FRAME_FULL
+from tests.decorator_utlis import log_test
+from tests.fake_drone import fake_drone
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+HOST = "192.168.10.1"
+# Not imported from the socket routes on purpose, the app alone must register their handlers
+TELLO_NAMESPACE = "/tello"
+
+
+def received(client, name):
+    return [event["args"][0] for event in client.get_received(TELLO_NAMESPACE) if event["name"] == name]
+
+
+class TestTelloSocketRoutes:
+    @log_test
+    def test_telemetry_push_through_app(self):
+        """Test the Tello namespace served by the app connects the drone and pushes telemetry frames"""
+        with fake_drone() as drone:
+            tello_module.drones[HOST] = tello_module.Tello.create_drone_entry()
+            tello_module.drones[HOST]["state"] = {"bat": 80, "h": 50}
+
+            client = socketio.test_client(app, namespace=TELLO_NAMESPACE)
+            assert client.is_connected(TELLO_NAMESPACE)
+            assert received(client, "connection_status")[0]["status"] == "success"
+
+            client.emit("subscribe_telemetry", {"rate": 20}, namespace=TELLO_NAMESPACE)
+            socketio.sleep(0.2)
+            events = client.get_received(TELLO_NAMESPACE)
+            client.emit("unsubscribe_telemetry", namespace=TELLO_NAMESPACE)
+            client.disconnect(namespace=TELLO_NAMESPACE)
+
+            assert [e["args"][0]["status"] for e in events if e["name"] == "telemetry_status"] == ["success"]
+            frames = [e["args"][0] for e in events if e["name"] == "telemetry_frame"]
+            assert frames and frames[0]["t"] == FRAME_FULL
+            assert drone.commands[:2] == ["command", "takeoff"]
+
+        tello_module.drones.pop(HOST, None)
+
+    @log_test
+    def test_mission_pad_events_are_pushed(self):
+        """Test mission pad events reach a subscribed client as the tracker records them"""
+        with fake_drone():
+            tello_module.drones[HOST] = tello_module.Tello.create_drone_entry()
+            tello_module.drones[HOST]["state"] = {"bat": 80, "h": 50}
+            tracker = tello_module.drones[HOST]["mission_pads"]
+
+            client = socketio.test_client(app, namespace=TELLO_NAMESPACE)
+            client.emit("subscribe_mission_pads", namespace=TELLO_NAMESPACE)
+            assert received(client, "mission_pad_status")[0]["status"] == "success"
+            for _ in range(tracker.debounce):
+                tracker.update({"mid": 3, "x": 10, "y": 0, "z": 90})
+            events = received(client, "mission_pad")
+
+            client.emit("unsubscribe_mission_pads", namespace=TELLO_NAMESPACE)
+            tracker.update({"mid": 3, "x": 40, "y": 0, "z": 90})
+            assert received(client, "mission_pad") == []
+            client.disconnect(namespace=TELLO_NAMESPACE)
+
+            assert [(event["event"], event["pad"]) for event in events] == [(EVENT_PAD_DETECTED, 3)]
+            assert tracker.listeners == []
+
+        tello_module.drones.pop(HOST, None)
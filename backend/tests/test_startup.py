@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cold start budget of `import src.main`, in seconds. Generous on purpose, the
+# import takes about a quarter of a second on a developer machine.
+MAIN_IMPORT_BUDGET = 2.0
+
+IMPORT_MAIN = """
+import time
+started = time.perf_counter()
+import src.main
+duration = time.perf_counter() - started
+
+from src.models import Tello
+from src.models.tello import network
+from src.utils.lazy_import import is_loaded
+tello = Tello()
+print(duration, is_loaded("av"), is_loaded("numpy"), network.started)
+"""
+
+
+def run_python(code, *options):
+    return subprocess.run([sys.executable, *options, "-c", code], cwd=BACKEND_DIR,
+                          capture_output=True, text=True, timeout=60)
+
+
+class TestStartup:
+    @log_test
+    def test_main_import_is_lightweight(self):
+        """Test importing the app and creating a Tello loads neither PyAV nor numpy and binds no socket"""
+        result = run_python(IMPORT_MAIN)
+        assert result.returncode == 0, result.stderr
+
+        duration, av_loaded, numpy_loaded, network_started = result.stdout.split()[-4:]
+        logger.info(f"Cold import of src.main took {float(duration):.3f} seconds")
+        assert (av_loaded, numpy_loaded, network_started) == ("False", "False", "False")
+        assert float(duration) < MAIN_IMPORT_BUDGET
+
+    @log_test
+    def test_slowest_imports(self):
+        """Benchmark: log the slowest modules imported by src.main (python -X importtime)"""
+        result = run_python("import src.main", "-X", "importtime")
+        assert result.returncode == 0, result.stderr
+
+        timings = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, module = line.split("|")
+            timings.append((int(cumulative), module.strip()))
+
+        for cumulative, module in sorted(timings, reverse=True)[:10]:
+            logger.info(f"{module}: {cumulative / 1e6:.3f} seconds")
+        assert timings
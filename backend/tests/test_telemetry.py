@@ -0,0 +1,138 @@
+import threading
+
+import pytest
+
+from src.models.telemetry import TelemetryHistory, compute_derived, is_stable
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+def make_state(**overrides):
+    state = {
+        "vgx": 3, "vgy": 4, "vgz": 0,
+        "agx": 0.0, "agy": 0.0, "agz": -1000.0,
+        "templ": 60, "temph": 62,
+        "h": 100, "bat": 80,
+    }
+    state.update(overrides)
+    return state
+
+
+class TestTelemetryHistory:
+    @log_test
+    def test_ring_keeps_latest_samples(self):
+        """Test the history wraps around and stays in chronological order"""
+        history = TelemetryHistory(capacity=3)
+        for i in range(5):
+            history.append(make_state(h=i), timestamp=float(i))
+
+        assert len(history) == 3
+        assert list(history.column("h")) == [2, 3, 4]
+        assert list(history.column("timestamp", last=2)) == [3, 4]
+
+    @log_test
+    def test_derived_is_cached_per_sample(self):
+        """Test derived metrics are only recomputed when a new sample arrives"""
+        history = TelemetryHistory()
+        history.append(make_state(), timestamp=0.0)
+
+        first = history.derived()
+        assert history.derived() is first
+
+        history.append(make_state(), timestamp=1.0)
+        assert history.derived() is not first
+
+
+class TestComputeDerived:
+    @log_test
+    def test_magnitudes_and_temperature(self):
+        """Test speed, acceleration and temperature are derived from the latest sample"""
+        history = TelemetryHistory()
+        history.append(make_state(), timestamp=0.0)
+
+        derived = compute_derived(history.to_array())
+
+        assert derived["total_speed"] == pytest.approx(5.0)
+        assert derived["total_acceleration"] == pytest.approx(1000.0)
+        assert derived["average_temperature"] == pytest.approx(61.0)
+
+    @log_test
+    def test_filtered_height(self):
+        """Test the EWMA altitude filter matches the recursive definition"""
+        history = TelemetryHistory()
+        heights = [100, 120, 80, 110]
+        for i, height in enumerate(heights):
+            history.append(make_state(h=height), timestamp=float(i))
+
+        expected = heights[0]
+        for height in heights[1:]:
+            expected = 0.2 * height + 0.8 * expected
+
+        assert compute_derived(history.to_array(), ewma_alpha=0.2)["filtered_height"] == pytest.approx(expected)
+
+    @log_test
+    def test_battery_drain(self):
+        """Test the battery drain rate and time to empty estimate"""
+        history = TelemetryHistory()
+        for i in range(10):
+            history.append(make_state(bat=90 - i), timestamp=float(i * 6))
+
+        derived = compute_derived(history.to_array())
+
+        assert derived["battery_drain_rate"] == pytest.approx(10.0)
+        assert derived["time_to_empty"] == pytest.approx(81 * 6)
+
+    @log_test
+    def test_empty_history(self):
+        """Test an empty history has no derived metrics"""
+        assert compute_derived(TelemetryHistory().to_array()) == {}
+
+
+def hover_history(count=10, interval=0.1, **overrides):
+    history = TelemetryHistory()
+    for i in range(count):
+        history.append(make_state(vgx=0, vgy=0, pitch=0, roll=0, yaw=90, **overrides), timestamp=i * interval)
+    return history
+
+
+class TestIsStable:
+    @log_test
+    def test_hovering_drone_is_stable(self):
+        """Test a drone without speed and attitude changes is stable"""
+        assert is_stable(hover_history().to_array())
+
+    @log_test
+    def test_moving_or_turning_drone_is_not_stable(self):
+        """Test speed or attitude changes within the window make the drone unstable"""
+        history = hover_history()
+        history.append(make_state(vgx=0, vgy=0, pitch=0, roll=0, yaw=95), timestamp=1.0)
+        assert not is_stable(history.to_array())
+
+        history = hover_history()
+        history.append(make_state(vgx=5, vgy=0, pitch=0, roll=0, yaw=90), timestamp=1.0)
+        assert not is_stable(history.to_array())
+
+    @log_test
+    def test_yaw_wraps_around(self):
+        """Test crossing the +-180 degrees boundary is a small change"""
+        history = TelemetryHistory()
+        for i, yaw in enumerate([179, 179, -180, -180, -180, -180, -180]):
+            history.append(make_state(vgx=0, vgy=0, pitch=0, roll=0, yaw=yaw), timestamp=i * 0.1)
+        assert is_stable(history.to_array(), max_attitude_rate=10)
+
+    @log_test
+    def test_window_must_be_covered_and_fresh(self):
+        """Test too short or too old histories are not taken as stable"""
+        assert not is_stable(hover_history(count=3).to_array())
+        assert not is_stable(hover_history().to_array(), now=5.0)
+
+    @log_test
+    def test_wait_for_sample(self):
+        """Test waiting for a new sample wakes up when one is appended"""
+        history = hover_history(count=1)
+        assert not history.wait_for_sample(history.version, timeout=0.01)
+
+        threading.Timer(0.05, history.append, (make_state(),)).start()
+        assert history.wait_for_sample(history.version, timeout=2)
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from src.utils.Logger import Logger
+from src.utils.telemetry_codec import FRAME_DELTA, FRAME_FULL, TelemetryDecoder, TelemetryEncoder
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+class TestTelemetryCodec:
+    @log_test
+    def test_first_frame_is_full_snapshot(self):
+        """Test the first frame carries every field and the key map"""
+        encoder = TelemetryEncoder()
+
+        frame = encoder.encode({"bat": 80, "h": 100, "received_at": datetime(2024, 1, 1)}, {"total_speed": 1.234})
+
+        assert frame["t"] == FRAME_FULL
+        assert frame["v"] == {"b": 80, "h": 100, "ra": datetime(2024, 1, 1).timestamp(), "ds": 1.23}
+        assert frame["k"]["bat"] == "b"
+
+    @log_test
+    def test_delta_only_contains_changes(self):
+        """Test deltas only send changed and removed fields"""
+        encoder = TelemetryEncoder()
+        encoder.encode({"bat": 80, "h": 100, "mid": 1})
+
+        frame = encoder.encode({"bat": 80, "h": 110})
+
+        assert frame["t"] == FRAME_DELTA
+        assert frame["v"] == {"h": 110, "m": None}
+        assert encoder.encode({"bat": 80, "h": 110}) is None
+
+    @log_test
+    def test_periodic_and_requested_snapshots(self):
+        """Test full snapshots are sent periodically and after a resync"""
+        encoder = TelemetryEncoder(full_snapshot_interval=2)
+        types = [encoder.encode({"h": h})["t"] for h in range(4)]
+        assert types == [FRAME_FULL, FRAME_DELTA, FRAME_FULL, FRAME_DELTA]
+
+        encoder.resync()
+        assert encoder.encode({"h": 10})["t"] == FRAME_FULL
+
+    @log_test
+    def test_decoder_round_trip_and_gap_detection(self):
+        """Test the decoder rebuilds the state and detects missed frames"""
+        encoder = TelemetryEncoder()
+        decoder = TelemetryDecoder()
+
+        decoder.decode(encoder.encode({"bat": 80, "h": 100}))
+        assert decoder.decode(encoder.encode({"bat": 79, "h": 100})) == {"bat": 79, "h": 100}
+
+        encoder.encode({"bat": 78, "h": 100})  # lost on the way
+        decoder.decode(encoder.encode({"bat": 78, "h": 90}))
+        assert decoder.needs_resync
+
+        encoder.resync()
+        assert decoder.decode(encoder.encode({"bat": 78, "h": 90})) == {"bat": 78, "h": 90}
+        assert not decoder.needs_resync
@@ -0,0 +1,162 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models import Tello
+from src.models import tello as tello_module
+from src.models.rtt import RttEstimator
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+from tests.fake_drone import fake_drone
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+@pytest.fixture(autouse=True)
+def reset_rtt_estimators():
+    tello_module.rtt_estimators.clear()
+    yield
+    tello_module.rtt_estimators.clear()
+
+
+class TestRttEstimator:
+    @log_test
+    def test_initial_timeout(self):
+        """Test the timeout before any sample"""
+        assert RttEstimator(initial_timeout=1.0).timeout == 1.0
+
+    @log_test
+    def test_timeout_follows_samples(self):
+        """Test SRTT/RTTVAR updates and the timeout lower bound"""
+        estimator = RttEstimator(min_timeout=0.01)
+        estimator.observe(0.1)
+
+        assert estimator.srtt == pytest.approx(0.1)
+        assert estimator.rttvar == pytest.approx(0.05)
+        assert estimator.timeout == pytest.approx(0.3)
+
+        estimator.observe(0.1)
+        assert estimator.timeout < 0.3
+        assert RttEstimator(min_timeout=0.25).timeout >= 0.25
+
+    @log_test
+    def test_backoff(self):
+        """Test the timeout doubles on timeouts, up to the maximum"""
+        estimator = RttEstimator(initial_timeout=1.0, max_timeout=3.0)
+
+        estimator.backoff()
+        assert estimator.timeout == 2.0
+        estimator.backoff()
+        assert estimator.timeout == 3.0
+
+        estimator.observe(0.1)
+        assert estimator.timeout < 1.0
+
+
+class TestTelloCommands:
+    @log_test
+    def test_command_class(self):
+        """Test commands are classified by their expected response time"""
+        assert Tello.command_class("battery?") == Tello.COMMAND_CLASS_QUERY
+        assert Tello.command_class("forward 50") == Tello.COMMAND_CLASS_MOTION
+        assert Tello.command_class("takeoff") == Tello.COMMAND_CLASS_MOTION
+        assert Tello.command_class("streamon") == Tello.COMMAND_CLASS_CONTROL
+
+    @log_test
+    def test_lost_query_is_retransmitted_quickly(self):
+        """Test a lost query costs the adaptive timeout instead of RESPONSE_TIMEOUT"""
+        attempts = []
+
+        def responder(command):
+            attempts.append(command)
+            return None if len(attempts) == 1 else "87"
+
+        with fake_drone(responder):
+            tello = Tello("10.0.0.11")
+            started = time.time()
+            battery = tello.query_battery()
+
+        assert battery == 87
+        assert attempts == ["battery?", "battery?"]
+        assert time.time() - started < Tello.INITIAL_RESPONSE_TIMEOUT + 1
+        assert tello.get_rtt_stats()[Tello.COMMAND_CLASS_QUERY]["samples"] == 0
+
+    @log_test
+    def test_round_trips_are_sampled(self):
+        """Test answered commands update the estimator of their class"""
+        with fake_drone():
+            tello = Tello("10.0.0.12")
+            tello.send_control_command("streamon")
+            tello.move("up", 20)
+
+        stats = tello.get_rtt_stats()
+        assert stats[Tello.COMMAND_CLASS_CONTROL]["samples"] == 1
+        assert Tello.COMMAND_CLASS_MOTION not in stats
+        assert tello.get_command_timeout("forward 20") == Tello.RESPONSE_TIMEOUT
+
+    @log_test
+    def test_stale_response_is_not_taken_for_next_command(self):
+        """Test a late 'ok' to a timed out command is discarded before the next command"""
+        def responder(command):
+            return None if command == "streamon" else "87"
+
+        with fake_drone(responder):
+            tello = Tello("10.0.0.13")
+            response = tello.send_command_with_return("streamon", timeout=0.05)
+            assert Tello.is_timeout_response(response)
+            assert tello.get_outstanding_commands()[0]["command"] == "streamon"
+
+            drone = tello.get_own_udp_object()
+            drone["responses"].append(b"ok")
+
+            assert tello.query_battery() == 87
+            assert tello.get_outstanding_commands() == []
+            assert tello_module.late_responses.get(host="10.0.0.13", verb="streamon") == 1
+
+    @log_test
+    def test_implausible_response_is_skipped(self):
+        """Test an 'ok' arriving while a query waits is attributed to the abandoned command"""
+        def responder(command):
+            if command == "speed?":
+                tello_module.drones["10.0.0.14"]["responses"].append(b"ok")
+                return "50"
+            return None
+
+        with fake_drone(responder):
+            tello = Tello("10.0.0.14")
+            tello.send_command_with_return("mon", timeout=0.05)
+
+            assert tello.query_speed() == 50
+            assert tello_module.late_responses.get(host="10.0.0.14", verb="mon") == 1
+
+    @log_test
+    def test_query_answered_from_fresh_state(self):
+        """Test query_* methods use a fresh state packet instead of a round trip"""
+        with fake_drone(lambda command: "55") as drone:
+            tello = Tello("10.0.0.15")
+            tello.get_own_udp_object()["state"] = {
+                "bat": 90, "pitch": 1, "roll": 2, "yaw": 3, "received_at": datetime.now()}
+
+            assert tello.query_battery() == 90
+            assert tello.query_attitude() == {"pitch": 1, "roll": 2, "yaw": 3}
+            assert drone.commands == []
+
+            assert tello.query_battery(max_age=0) == 55
+            assert tello.query_height() == 55
+            assert drone.commands == ["battery?", "height?"]
+
+        stats = tello.get_query_cache_stats()
+        assert stats["bat"] == {"hit": 1, "miss": 1}
+        assert stats["h"] == {"hit": 0, "miss": 1}
+
+    @log_test
+    def test_stale_state_is_not_used(self):
+        """Test an old state packet falls back to the UDP query"""
+        with fake_drone(lambda command: "55") as drone:
+            tello = Tello("10.0.0.16")
+            tello.get_own_udp_object()["state"] = {
+                "bat": 90, "received_at": datetime.now() - timedelta(seconds=60)}
+
+            assert tello.query_battery() == 55
+            assert drone.commands == ["battery?"]
@@ -0,0 +1,62 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from src.main import app
+from src.utils import tracing
+from src.utils.Logger import Logger
+from src.utils.tracing import Tracer
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+@pytest.fixture
+def test_client():
+    """Create a test client for the Flask app"""
+    app.config['TESTING'] = True
+    return app.test_client()
+
+
+class TestTracing:
+    @log_test
+    def test_spans_between_events(self):
+        """Test spans are computed between consecutive events"""
+        tracer = Tracer()
+        trace = tracer.start("POST /tello/move")
+        tracing.mark("request_received")
+        tracing.mark("command_sent", command_id=1)
+        tracer.finish(trace, status=200)
+
+        exported = tracer.export()[0]
+        assert [span["name"] for span in exported["spans"]] == [
+            "start->request_received", "request_received->command_sent"]
+        assert exported["events"][1]["attributes"] == {"command_id": 1}
+        assert tracing.current_trace() is None
+        assert tracer.summary()["POST /tello/move"]["total"]["count"] == 1
+
+    @log_test
+    def test_mark_without_trace(self):
+        """Test marking outside a traced request is a no-op"""
+        tracing.mark("command_sent")
+
+        assert tracing.current_trace() is None
+
+    @log_test
+    def test_route_is_traced(self, test_client):
+        """Test HTTP requests are traced from request to serialized response"""
+        mock_tello = Mock()
+        mock_tello.move.side_effect = lambda direction, distance: tracing.mark("command_sent")
+
+        with patch('src.routes.http.tello.get_tello', return_value=mock_tello):
+            response = test_client.post("/tello/move", json={"direction": "up"}, headers={"X-Trace-Id": "abc123"})
+
+        assert response.headers["X-Trace-Id"] == "abc123"
+
+        traces = test_client.get("/traces?name=POST /tello/move").get_json()["traces"]
+        trace = next(trace for trace in traces if trace["trace_id"] == "abc123")
+        assert [event["name"] for event in trace["events"]] == [
+            "request_received", "command_sent", "response_serialized"]
+
+        summary = test_client.get("/traces/summary").get_json()["summary"]
+        assert "command_sent->response_serialized" in summary["POST /tello/move"]
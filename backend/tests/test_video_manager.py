@@ -0,0 +1,93 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.models import TelloException, VideoManager
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+class StubTello:
+    """Records the video configuration instead of talking to a drone"""
+
+    def __init__(self, host, video_port=11111):
+        self.address = (host, 8889)
+        self.video_streaming_udp_port = video_port
+        self.stream_on = False
+        self.port_changes = []
+        self.reader = MagicMock()
+
+    def change_vs_udp(self, port):
+        self.port_changes.append(port)
+        self.video_streaming_udp_port = port
+
+    def streamon(self):
+        self.stream_on = True
+
+    def streamoff(self):
+        self.stream_on = False
+        self.reader.stop()
+
+    def get_frame_read(self, **options):
+        return self.reader
+
+
+class TestVideoManager:
+    @log_test
+    def test_allocates_a_port_per_drone(self):
+        """Test every drone streams to its own port and freed ports are reused"""
+        manager = VideoManager(base_port=11111, max_streams=2)
+        first, second = StubTello("10.0.0.1"), StubTello("10.0.0.2")
+
+        manager.add(first)
+        manager.add(second)
+        assert first.video_streaming_udp_port == 11111
+        assert second.video_streaming_udp_port == 11112
+        assert first.stream_on and second.stream_on
+
+        with pytest.raises(TelloException):
+            manager.add(StubTello("10.0.0.3"))
+
+        manager.remove("10.0.0.1")
+        assert not first.stream_on
+        third = StubTello("10.0.0.3")
+        manager.add(third)
+        assert third.video_streaming_udp_port == 11111
+
+    @log_test
+    def test_reconfigures_running_stream(self):
+        """Test a drone already streaming to a taken port is moved to a free one"""
+        manager = VideoManager(base_port=11111)
+        manager.add(StubTello("10.0.0.1"))
+
+        streaming = StubTello("10.0.0.2")
+        streaming.stream_on = True
+        manager.add(streaming)
+        assert streaming.port_changes == [11112]
+
+    @log_test
+    def test_frame_rate_budget(self):
+        """Test the fps budget is shared equally, or mostly given to the focused drone"""
+        manager = VideoManager(total_fps=40, focus_share=0.5)
+        drones = [StubTello("10.0.0.{}".format(i)) for i in range(1, 4)]
+        for drone in drones:
+            manager.add(drone)
+
+        assert manager.compute_target_fps() == {d.address[0]: pytest.approx(40 / 3) for d in drones}
+
+        manager.focus("10.0.0.2")
+        assert manager.compute_target_fps() == {"10.0.0.1": 10, "10.0.0.2": 20, "10.0.0.3": 10}
+        drones[1].reader.set_target_fps.assert_called_with(20)
+
+        manager.remove("10.0.0.2")
+        assert manager.focused is None
+        assert manager.compute_target_fps() == {"10.0.0.1": 20, "10.0.0.3": 20}
+
+    @log_test
+    def test_single_stream_is_capped(self):
+        """Test a single stream never gets more than the drone's frame rate"""
+        manager = VideoManager(total_fps=120)
+        manager.add(StubTello("10.0.0.1"))
+        assert manager.compute_target_fps() == {"10.0.0.1": VideoManager.MAX_STREAM_FPS}
@@ -0,0 +1,90 @@
+import threading
+
+import numpy as np
+
+from src.models import FrameBroadcaster
+from src.models.vision import FORMAT_BGR, FORMAT_GRAY, FunctionStage, VisionPipeline, prepare_image
+from src.utils.Logger import Logger
+from tests.decorator_utlis import log_test
+
+logger = Logger.get_logger("TestLogger", log_file="test.log")
+
+
+class StubFrameRead:
+    """Stands in for BackgroundFrameRead, frames are published on its broadcaster"""
+
+    def __init__(self):
+        self.broadcaster = FrameBroadcaster(8)
+
+    def subscribe(self, from_latest=True):
+        return self.broadcaster.subscribe(from_latest)
+
+
+def make_image(width=8, height=6):
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[..., 0] = 255
+    return image
+
+
+class TestPrepareImage:
+    @log_test
+    def test_resolution_and_formats(self):
+        """Test frames are downscaled and converted to the requested format"""
+        image = make_image()
+
+        assert prepare_image(image) is image
+        assert prepare_image(image, (4, 3)).shape == (3, 4, 3)
+        assert prepare_image(image, image_format=FORMAT_BGR)[0, 0].tolist() == [0, 0, 255]
+
+        gray = prepare_image(image, (4, 3), FORMAT_GRAY)
+        assert gray.shape == (3, 4)
+        assert gray.dtype == np.uint8
+        assert gray[0, 0] == 76
+
+
+class TestVisionPipeline:
+    @log_test
+    def test_results_are_attached_and_published(self):
+        """Test every stage runs on the frame and results reach metadata, listeners and get_results"""
+        frame_read = StubFrameRead()
+        inputs = []
+
+        def mean_brightness(image, metadata):
+            inputs.append(image)
+            return float(image.mean())
+
+        def shape(image, metadata):
+            inputs.append(image)
+            return list(image.shape)
+
+        stages = [
+            FunctionStage("brightness", mean_brightness, resolution=(4, 3), image_format=FORMAT_GRAY),
+            FunctionStage("shape", shape, resolution=(4, 3), image_format=FORMAT_GRAY),
+        ]
+        pipeline = VisionPipeline(frame_read, stages)
+        processed = threading.Event()
+        pipeline.add_listener(lambda frame, results: processed.set())
+        pipeline.start()
+        try:
+            frame = frame_read.broadcaster.publish(make_image())
+            assert processed.wait(2)
+        finally:
+            pipeline.stop()
+
+        assert frame.metadata["vision"] == {"brightness": 76.0, "shape": [3, 4]}
+        assert pipeline.get_results() == frame.metadata["vision"]
+        # Both stages asked for the same input, it was converted once
+        assert inputs[0] is inputs[1]
+
+    @log_test
+    def test_failing_stage(self):
+        """Test a failing stage reports None without stopping the other stages"""
+        def broken(image, metadata):
+            raise ValueError("broken")
+
+        pipeline = VisionPipeline(StubFrameRead(), [FunctionStage("broken", broken),
+                                                    FunctionStage("ok", lambda image, metadata: True)])
+        frame = FrameBroadcaster(1).publish(make_image())
+        assert pipeline.process_frame(frame) == {"broken": None, "ok": True}
+        assert pipeline.get_results(max_age=-1) == {}
+        pipeline.stop()